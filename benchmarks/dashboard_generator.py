@@ -0,0 +1,109 @@
+"""合成 Grafana Dashboard 生成器（用于基准测试）"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+def generate_dashboard(title: str = "Bench Dashboard", rows: int = 5, panels_per_row: int = 8,
+                       variables: int = 4, targets_per_panel: int = 2, uid: str = None) -> Dict[str, Any]:
+    """
+    生成一个合成 dashboard
+
+    Args:
+        title: dashboard 标题
+        rows: row 数量（奇数 row 为 collapsed，panels 嵌套在 row 内）
+        panels_per_row: 每个 row 下的 panel 数量
+        variables: query 类型变量数量（第一个之后的变量引用前一个变量，形成链式依赖）
+        targets_per_panel: 每个 panel 的 target 数量
+        uid: dashboard uid（可选）
+
+    Returns:
+        Grafana dashboard JSON 字典
+    """
+    template_vars = []
+    for i in range(variables):
+        label = f"label_{i}"
+        if i == 0:
+            query = f"label_values(bench_metric_0_total, {label})"
+        else:
+            query = f'label_values(bench_metric_0_total{{label_{i - 1}=~"$var_{i - 1}"}}, {label})'
+        template_vars.append({
+            "name": f"var_{i}",
+            "label": f"Variable {i}",
+            "type": "query",
+            "query": query,
+            "current": {"text": "All", "value": "$__all"},
+        })
+
+    panels: List[Dict[str, Any]] = []
+    panel_id = 1
+    metric_idx = 0
+    for row in range(rows):
+        collapsed = row % 2 == 1
+        row_panels = []
+        for p in range(panels_per_row):
+            targets = []
+            for t in range(targets_per_panel):
+                metric = f"bench_metric_{metric_idx % 50}_total"
+                metric_idx += 1
+                selector = ", ".join(f'label_{v}=~"$var_{v}"' for v in range(variables))
+                targets.append({
+                    "refId": chr(ord("A") + t),
+                    "expr": f"sum(rate({metric}{{{selector}}}[5m])) by (instance)",
+                })
+            row_panels.append({
+                "id": panel_id,
+                "type": "timeseries",
+                "title": f"Row {row} Panel {p}",
+                "description": f"Synthetic panel {p} in row {row}",
+                "gridPos": {"h": 8, "w": 12, "x": (p % 2) * 12, "y": row * 10 + p},
+                "targets": targets,
+                # 模拟真实 dashboard 中大量与指标无关的样式配置
+                "fieldConfig": {"defaults": {"unit": "short", "custom": {"lineWidth": 1, "fillOpacity": 10}}},
+                "options": {"legend": {"displayMode": "table", "placement": "bottom"}},
+            })
+            panel_id += 1
+        row_panel = {"id": panel_id, "type": "row", "title": f"Row {row}", "collapsed": collapsed}
+        panel_id += 1
+        if collapsed:
+            row_panel["panels"] = row_panels
+            panels.append(row_panel)
+        else:
+            row_panel["panels"] = []
+            panels.append(row_panel)
+            panels.extend(row_panels)
+
+    dashboard = {
+        "title": title,
+        "description": f"Synthetic dashboard with {rows} rows and {rows * panels_per_row} panels",
+        "panels": panels,
+        "templating": {"list": template_vars},
+        "schemaVersion": 39,
+    }
+    if uid:
+        dashboard["uid"] = uid
+    return dashboard
+
+
+def write_dashboards(directory: str, count: int = 1, **kwargs) -> List[Path]:
+    """
+    生成 count 个 dashboard 并写入目录
+
+    Args:
+        directory: 输出目录
+        count: dashboard 数量
+        **kwargs: 透传给 generate_dashboard 的参数
+
+    Returns:
+        写入的文件路径列表
+    """
+    out_dir = Path(directory)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        dashboard = generate_dashboard(title=f"Bench Dashboard {i}", uid=f"bench-{i}", **kwargs)
+        path = out_dir / f"bench-{i}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(dashboard, f, indent=2)
+        paths.append(path)
+    return paths
@@ -0,0 +1,292 @@
+"""本地 Mock Prometheus HTTP API（用于基准测试，不依赖真实 Prometheus）"""
+import json
+import math
+import random
+import re
+import threading
+import time
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from src.remote_read import RawSeries, encode_chunked_frame, parse_read_request
+
+
+@dataclass
+class MockPrometheusConfig:
+    """Mock Prometheus 配置"""
+    latency: float = 0.0  # 每个请求的固定延迟（秒）
+    latency_jitter: float = 0.0  # 在固定延迟基础上叠加的随机延迟上限（秒）
+    series_count: int = 10  # 每个查询返回的时间序列数
+    max_samples: int = 11000  # 范围查询每条序列最多返回的采样点数（与 Prometheus 默认上限一致）
+    label_values_count: int = 20  # label values 接口返回的候选值个数
+    metric_names: List[str] = field(default_factory=lambda: [f"bench_metric_{i}_total" for i in range(50)])
+    scrape_interval: float = 15.0  # remote-read 返回的原始样本间隔（秒）
+    seed: int = 42
+
+
+def _parse_time(value: Optional[str], default: float) -> float:
+    """解析 Unix 时间戳或 RFC3339 时间"""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _parse_duration(value: str) -> float:
+    """解析 Prometheus 步长（如 "15s"、"1m" 或纯秒数）"""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+    total = 0.0
+    for num, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)", value):
+        total += float(num) * units[unit]
+    if total <= 0:
+        raise ValueError(f"无效的 step: {value}")
+    return total
+
+
+class _MockState:
+    """Mock 服务运行期状态（请求计数等）"""
+
+    def __init__(self, config: MockPrometheusConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.request_counts: Dict[str, int] = {}
+        self.rng = random.Random(config.seed)
+
+    def count(self, path: str):
+        with self.lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def delay(self):
+        latency = self.config.latency
+        if self.config.latency_jitter > 0:
+            with self.lock:
+                latency += self.rng.uniform(0, self.config.latency_jitter)
+        if latency > 0:
+            time.sleep(latency)
+
+    def metric_name(self, query: str) -> str:
+        match = re.search(r"[a-zA-Z_:][a-zA-Z0-9_:]*(?=\s*[{\[])", query)
+        if match:
+            return match.group(0)
+        return self.config.metric_names[0] if self.config.metric_names else "bench_metric"
+
+    def series_labels(self, query: str) -> List[Dict[str, str]]:
+        name = self.metric_name(query)
+        return [
+            {
+                "__name__": name,
+                "instance": f"host-{i}:9100",
+                "cluster": f"cluster-{i % 3}",
+                "namespace": f"namespace-{i % 7}",
+            }
+            for i in range(self.config.series_count)
+        ]
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """处理 Prometheus HTTP API 请求"""
+
+    server_version = "MockPrometheus/0.1"
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写出，关闭 Nagle 避免与客户端 delayed ACK 叠加出 40ms 延迟
+    disable_nagle_algorithm = True
+
+    @property
+    def state(self) -> _MockState:
+        return self.server.state
+
+    def log_message(self, format, *args):  # noqa: A002 - 覆盖基类签名
+        # 静默访问日志，避免污染基准测试输出
+        pass
+
+    def _params(self) -> Dict[str, str]:
+        parsed = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8")
+            params.update({k: v[-1] for k, v in parse_qs(body).items()})
+        return params
+
+    def _send_json(self, payload: Any, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已中断请求（例如对冲请求中落败的一方）
+            self.close_connection = True
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        path = urlparse(self.path).path
+        if path == "/api/v1/read":
+            self.state.count(path)
+            self.state.delay()
+            self._remote_read()
+            return
+        params = self._params()
+        self.state.count(path)
+        self.state.delay()
+        try:
+            if path == "/api/v1/query":
+                payload = self._instant_query(params)
+            elif path == "/api/v1/query_range":
+                payload = self._range_query(params)
+            elif path == "/api/v1/series":
+                payload = {"status": "success", "data": self.state.series_labels(params.get("match[]", ""))}
+            elif path == "/api/v1/labels":
+                payload = {"status": "success", "data": ["__name__", "cluster", "instance", "namespace"]}
+            elif path == "/api/v1/metadata":
+                payload = {"status": "success", "data": {
+                    name: [{"type": "counter", "unit": "", "help": f"Synthetic counter {name}"}]
+                    for name in self.state.config.metric_names
+                }}
+            elif path.startswith("/api/v1/label/") and path.endswith("/values"):
+                payload = self._label_values(path.split("/")[4], params)
+            else:
+                self._send_json({"status": "error", "errorType": "not_found", "error": path}, 404)
+                return
+        except ValueError as e:
+            self._send_json({"status": "error", "errorType": "bad_data", "error": str(e)}, 400)
+            return
+        self._send_json(payload)
+
+    def _instant_query(self, params: Dict[str, str]) -> Dict[str, Any]:
+        query = params.get("query", "")
+        if not query:
+            raise ValueError("query 参数缺失")
+        ts = _parse_time(params.get("time"), time.time())
+        result = [
+            {"metric": labels, "value": [ts, str(_sample_value(idx, ts))]}
+            for idx, labels in enumerate(self.state.series_labels(query))
+        ]
+        return {"status": "success", "data": {"resultType": "vector", "result": result}}
+
+    def _range_query(self, params: Dict[str, str]) -> Dict[str, Any]:
+        query = params.get("query", "")
+        if not query:
+            raise ValueError("query 参数缺失")
+        now = time.time()
+        start = _parse_time(params.get("start"), now - 3600)
+        end = _parse_time(params.get("end"), now)
+        step = _parse_duration(params.get("step", "60"))
+        if end < start:
+            raise ValueError("end 早于 start")
+        points = int((end - start) // step) + 1
+        if points > self.state.config.max_samples:
+            raise ValueError(
+                "exceeded maximum resolution of 11,000 points per timeseries. "
+                "Try decreasing the query resolution (?step=XX)"
+            )
+        result = []
+        for idx, labels in enumerate(self.state.series_labels(query)):
+            values = [
+                [start + i * step, str(_sample_value(idx, start + i * step))]
+                for i in range(points)
+            ]
+            result.append({"metric": labels, "values": values})
+        return {"status": "success", "data": {"resultType": "matrix", "result": result}}
+
+    def _remote_read(self):
+        """remote-read：返回流式 XOR chunk 响应（每个查询一帧）"""
+        length = int(self.headers.get("Content-Length") or 0)
+        queries = parse_read_request(self.rfile.read(length))
+        body = b""
+        interval_ms = int(self.state.config.scrape_interval * 1000)
+        for start_ms, end_ms, matchers in queries:
+            name = next((value for _, label, value in matchers if label == "__name__"), "")
+            first = -(-start_ms // interval_ms) * interval_ms
+            timestamps = list(range(first, end_ms + 1, interval_ms))
+            series = [
+                RawSeries(labels, array("q", timestamps),
+                          array("d", (_sample_value(idx, ts / 1000) for ts in timestamps)))
+                for idx, labels in enumerate(self.state.series_labels(name + "{}"))
+            ]
+            body += encode_chunked_frame(series)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-streamed-protobuf; proto=prometheus.ChunkedReadResponse")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _label_values(self, label: str, params: Dict[str, str]) -> Dict[str, Any]:
+        if label == "__name__":
+            return {"status": "success", "data": list(self.state.config.metric_names)}
+        count = self.state.config.label_values_count
+        return {"status": "success", "data": [f"{label}-{i}" for i in range(count)]}
+
+
+def _sample_value(series_idx: int, ts: float) -> float:
+    """生成确定性的采样值（按序列编号错开相位的正弦波）"""
+    return round(100 + 50 * math.sin(ts / 600 + series_idx), 6)
+
+
+class MockPrometheus:
+    """
+    在后台线程中运行的 Mock Prometheus 服务
+
+    Example:
+        with MockPrometheus(MockPrometheusConfig(latency=0.01)) as mock:
+            client = PrometheusClient(mock.url)
+    """
+
+    def __init__(self, config: Optional[MockPrometheusConfig] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockPrometheusConfig()
+        self._httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.state = _MockState(self.config)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._httpd.server_address[:2]
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    @property
+    def request_counts(self) -> Dict[str, int]:
+        with self._httpd.state.lock:
+            return dict(self._httpd.state.request_counts)
+
+    def start(self) -> "MockPrometheus":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockPrometheus":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+基准测试入口
+
+启动本地 Mock Prometheus，生成合成 dashboard，然后测量：
+- 启动耗时（PrometheusServer 初始化）
+- Resource 读取耗时（list_resources / read_resource）
+- Tool 在不同并发度下的吞吐与延迟分位数
+
+结果以 JSON 写入文件，便于跨 commit 对比回归。
+
+用法:
+    python -m benchmarks.run_benchmarks --output bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import yaml
+
+# 添加项目根目录到 Python 路径，支持直接运行
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from mcp import types
+
+from benchmarks.dashboard_generator import write_dashboards
+from benchmarks.mock_prometheus import MockPrometheus, MockPrometheusConfig
+from src.server import PrometheusServer
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """计算延迟样本（秒）的统计信息，输出单位为毫秒"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        idx = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[idx] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "min_ms": ordered[0] * 1000,
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def git_commit() -> str:
+    """当前 git commit（用于结果对比）"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=project_root,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def write_config(workdir: Path, prometheus_url: str, dashboard_paths: List[Path]) -> Path:
+    """生成基准测试使用的 config.yaml"""
+    config = {
+        "prometheus": {"url": prometheus_url, "timeout": 30},
+        "dashboards": [
+            {"name": path.stem, "path": str(path)} for path in dashboard_paths
+        ],
+        "logging": {"level": "WARNING", "file": None},
+    }
+    config_path = workdir / "config.yaml"
+    with open(config_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f)
+    return config_path
+
+
+def bench_startup(config_path: Path, repeat: int) -> Dict[str, Any]:
+    """测量 PrometheusServer 初始化耗时"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        PrometheusServer(str(config_path))
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+async def _timed(func: Callable[[], Awaitable[Any]]) -> float:
+    started = time.perf_counter()
+    await func()
+    return time.perf_counter() - started
+
+
+async def bench_resources(server: PrometheusServer, repeat: int) -> Dict[str, Any]:
+    """测量 list_resources 与 read_resource 的耗时"""
+    handlers = server.server.request_handlers
+    list_handler = handlers[types.ListResourcesRequest]
+    read_handler = handlers[types.ReadResourceRequest]
+
+    list_samples = []
+    for _ in range(repeat):
+        list_samples.append(await _timed(
+            lambda: list_handler(types.ListResourcesRequest(method="resources/list"))
+        ))
+
+    by_kind: Dict[str, List[float]] = {}
+    sizes: Dict[str, int] = {}
+    uris = list(server.variables_resources) + list(server.metrics_resources)
+    for _ in range(repeat):
+        for uri in uris:
+            kind = uri.rsplit("/", 1)[-1]
+            request = types.ReadResourceRequest(
+                method="resources/read",
+                params=types.ReadResourceRequestParams(uri=uri),
+            )
+            started = time.perf_counter()
+            result = await read_handler(request)
+            by_kind.setdefault(kind, []).append(time.perf_counter() - started)
+            sizes[kind] = max(sizes.get(kind, 0), len(result.root.contents[0].text))
+
+    return {
+        "list_resources": summarize(list_samples),
+        "read_resource": {
+            kind: {**summarize(samples), "max_bytes": sizes.get(kind, 0)}
+            for kind, samples in by_kind.items()
+        },
+    }
+
+
+async def bench_tool(server: PrometheusServer, name: str, arguments: Dict[str, Any],
+                     concurrency: int, total: int) -> Dict[str, Any]:
+    """在给定并发度下重复调用 tool，统计吞吐与延迟"""
+    handler = server.server.request_handlers[types.CallToolRequest]
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        request = types.CallToolRequest(
+            method="tools/call",
+            params=types.CallToolRequestParams(name=name, arguments=arguments),
+        )
+        async with semaphore:
+            started = time.perf_counter()
+            result = await handler(request)
+            samples.append(time.perf_counter() - started)
+            if result.root.isError:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    wall = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "wall_s": wall,
+        "throughput_rps": total / wall if wall > 0 else 0.0,
+        "latency": summarize(samples),
+    }
+
+
+async def bench_tools(server: PrometheusServer, concurrency_levels: List[int],
+                      total: int) -> Dict[str, Any]:
+    """测量各 tool 在不同并发度下的表现"""
+    # 先刷新 tool 定义缓存，避免首个请求计入 list_tools 开销
+    await server.server.request_handlers[types.ListToolsRequest](
+        types.ListToolsRequest(method="tools/list")
+    )
+    now = int(time.time())
+    cases = {
+        "prometheus_query": {"query": 'sum(rate(bench_metric_1_total{cluster="cluster-0"}[5m])) by (instance)'},
+        "prometheus_range_query": {
+            "query": "rate(bench_metric_2_total[5m])",
+            "start": str(now - 6 * 3600),
+            "end": str(now),
+            "step": "1m",
+        },
+    }
+    results: Dict[str, Any] = {}
+    for name, arguments in cases.items():
+        results[name] = [
+            await bench_tool(server, name, arguments, level, total)
+            for level in concurrency_levels
+        ]
+    return results
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """执行全部基准测试并返回结果"""
+    mock_config = MockPrometheusConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        series_count=args.series,
+        label_values_count=args.label_values,
+    )
+    with MockPrometheus(mock_config) as mock, tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        dashboard_paths = write_dashboards(
+            str(workdir / "dashboards"),
+            count=args.dashboards,
+            rows=args.rows,
+            panels_per_row=args.panels_per_row,
+            variables=args.variables,
+            targets_per_panel=args.targets_per_panel,
+        )
+        config_path = write_config(workdir, mock.url, dashboard_paths)
+
+        startup = bench_startup(config_path, args.repeat)
+        server = PrometheusServer(str(config_path))
+
+        async def run_async():
+            return {
+                "resources": await bench_resources(server, args.repeat),
+                "tools": await bench_tools(server, args.concurrency, args.requests),
+            }
+
+        async_results = asyncio.run(run_async())
+        upstream_requests = mock.request_counts
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "params": vars(args),
+        },
+        "results": {
+            "startup": startup,
+            **async_results,
+            "upstream_requests": upstream_requests,
+        },
+    }
+
+
+def main():
+    """主入口函数"""
+    parser = argparse.ArgumentParser(description="Dash2Insight-MCP 基准测试")
+    parser.add_argument("--output", "-o", default="bench_results.json", help="结果 JSON 输出路径")
+    parser.add_argument("--dashboards", type=int, default=5, help="合成 dashboard 数量")
+    parser.add_argument("--rows", type=int, default=6, help="每个 dashboard 的 row 数量")
+    parser.add_argument("--panels-per-row", type=int, default=8, help="每个 row 的 panel 数量")
+    parser.add_argument("--variables", type=int, default=4, help="每个 dashboard 的变量数量")
+    parser.add_argument("--targets-per-panel", type=int, default=2, help="每个 panel 的 target 数量")
+    parser.add_argument("--series", type=int, default=50, help="Mock 每个查询返回的序列数")
+    parser.add_argument("--label-values", type=int, default=20, help="Mock label values 候选值个数")
+    parser.add_argument("--latency", type=float, default=0.005, help="Mock 固定延迟（秒）")
+    parser.add_argument("--latency-jitter", type=float, default=0.005, help="Mock 随机延迟上限（秒）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="tool 调用并发度")
+    parser.add_argument("--requests", type=int, default=100, help="每个并发度下的 tool 调用总次数")
+    parser.add_argument("--repeat", type=int, default=3, help="启动与 resource 读取的重复次数")
+    args = parser.parse_args()
+
+    # 基准测试期间只保留警告以上日志
+    logging.getLogger("dash2insight-mcp").setLevel(logging.WARNING)
+
+    results = run(args)
+    output = Path(args.output)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"基准测试结果已写入: {output.resolve()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+准入控制：限制发往 Prometheus 的并发，按优先级排队，并对会话限速
+
+- 全局并发上限 + 按 API 路径的并发上限
+- 排队按优先级（交互式即时查询 > 范围查询 > 变量刷新等后台请求）和到达顺序出队
+- 排队超过 queue_timeout 返回 ServerBusyError，而不是把压力继续推给 Prometheus
+- 排队中的调用被取消或超过截止时间时立即放弃排队（RequestCancelled），不占用工作线程和名额
+- 每个 MCP 会话一个令牌桶，限制 tool 调用频率
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from .logger import get_logger
+
+logger = get_logger("admission")
+
+# 优先级，数值越小越优先
+PRIORITY_INTERACTIVE = 0
+PRIORITY_RANGE = 1
+PRIORITY_BACKGROUND = 2
+
+# 未显式指定优先级时按 API 路径推断
+_PATH_PRIORITIES = {
+    "/api/v1/query": PRIORITY_INTERACTIVE,
+    "/api/v1/query_range": PRIORITY_RANGE,
+    "/api/v1/read": PRIORITY_RANGE,
+}
+
+# 当前线程的请求优先级
+_local = threading.local()
+
+
+class RequestCancelled(Exception):
+    """调用方已取消，或已超过本次调用的截止时间"""
+
+
+class ServerBusyError(RuntimeError):
+    """服务繁忙：排队超时或超过会话限速"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """在作用域内发出的 Prometheus 请求使用指定优先级（线程内有效）"""
+    previous = getattr(_local, "priority", None)
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def endpoint_for(path: str) -> str:
+    """API 路径归一化为准入控制的 endpoint（各 label 的 values 接口共用一个 endpoint）"""
+    if path.startswith("/api/v1/label/") and path.endswith("/values"):
+        return "/api/v1/label/values"
+    return path
+
+
+def current_priority(path: str) -> int:
+    """当前线程的请求优先级；未指定时按 API 路径推断"""
+    priority = getattr(_local, "priority", None)
+    if priority is not None:
+        return priority
+    return _PATH_PRIORITIES.get(path, PRIORITY_BACKGROUND)
+
+
+class TokenBucket:
+    """令牌桶限速"""
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        尝试取一个令牌
+
+        Returns:
+            0 表示成功；否则为需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+class _Waiter:
+    __slots__ = ("endpoint", "event", "granted", "abandoned")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.event = threading.Event()
+        self.granted = False
+        self.abandoned = False
+
+
+class AdmissionController:
+    """
+    发往 Prometheus 的请求准入控制
+
+    所有 datasource 的客户端共享同一个实例，从而对整个 server 的上游并发设定硬上限。
+    """
+
+    # 空闲会话令牌桶的清理阈值（秒）
+    SESSION_IDLE_TTL = 3600
+    # 排队期间检查取消令牌的间隔（秒）
+    CANCEL_POLL_INTERVAL = 0.05
+
+    def __init__(self, max_concurrency: int = 16, endpoint_limits: Optional[Dict[str, int]] = None,
+                 queue_timeout: float = 10, session_rate: float = 5, session_burst: float = 20):
+        """
+        初始化准入控制
+
+        Args:
+            max_concurrency: 全局最大并发请求数
+            endpoint_limits: 按 API 路径的并发上限，例如 {"/api/v1/query_range": 8}
+            queue_timeout: 排队等待上限（秒）
+            session_rate: 每个会话每秒允许的 tool 调用数（<= 0 表示不限速）
+            session_burst: 每个会话允许的突发 tool 调用数
+        """
+        self.max_concurrency = max_concurrency
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self.queue_timeout = queue_timeout
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self._lock = threading.Lock()
+        self._active = 0
+        self._active_by_endpoint: Dict[str, int] = {}
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._sessions: Dict[str, TokenBucket] = {}
+
+    def _has_capacity(self, endpoint: str) -> bool:
+        if self._active >= self.max_concurrency:
+            return False
+        limit = self.endpoint_limits.get(endpoint)
+        return limit is None or self._active_by_endpoint.get(endpoint, 0) < limit
+
+    def _grant(self, endpoint: str):
+        self._active += 1
+        self._active_by_endpoint[endpoint] = self._active_by_endpoint.get(endpoint, 0) + 1
+
+    def _dispatch(self):
+        """把空出的名额分配给排队中优先级最高、且所属路径仍有余量的请求（需持有锁）"""
+        skipped = []
+        while self._queue and self._active < self.max_concurrency:
+            entry = heapq.heappop(self._queue)
+            waiter = entry[2]
+            if waiter.abandoned:
+                continue
+            if not self._has_capacity(waiter.endpoint):
+                skipped.append(entry)
+                continue
+            self._grant(waiter.endpoint)
+            waiter.granted = True
+            waiter.event.set()
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+
+    def acquire(self, endpoint: str, priority: int, timeout: Optional[float] = None, token=None,
+                deadline: Optional[float] = None):
+        """
+        获取一个并发名额
+
+        Args:
+            endpoint: Prometheus API 路径
+            priority: 优先级
+            timeout: 排队等待上限（秒），默认 queue_timeout
+            token: 调用的取消令牌（有 cancelled 属性），取消后立即放弃排队
+            deadline: 调用的截止时间（time.monotonic() 时刻），排队不超过截止时间
+
+        Raises:
+            ServerBusyError: 排队超时
+            RequestCancelled: 排队期间调用被取消或超过截止时间
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        if token is not None and token.cancelled:
+            raise RequestCancelled("请求已取消")
+        with self._lock:
+            if not self._queue and self._has_capacity(endpoint):
+                self._grant(endpoint)
+                return
+            waiter = _Waiter(endpoint)
+            heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+            # 排在前面的请求可能只是被各自路径的上限挡住，本请求仍可能立即获得名额
+            self._dispatch()
+            if waiter.granted:
+                return
+            queued = len(self._queue)
+        logger.debug(f"请求排队: endpoint={endpoint}, priority={priority}, 队列长度={queued}")
+        now = time.monotonic()
+        queue_deadline = now + timeout
+        if deadline is not None:
+            queue_deadline = min(queue_deadline, deadline)
+        while True:
+            remaining = queue_deadline - now
+            if remaining > 0:
+                # 有取消令牌时分段等待，以便及时发现取消
+                wait = remaining if token is None else min(remaining, self.CANCEL_POLL_INTERVAL)
+                if waiter.event.wait(wait):
+                    return
+            cancelled = token is not None and token.cancelled
+            now = time.monotonic()
+            if cancelled or now >= queue_deadline:
+                break
+        with self._lock:
+            if waiter.granted:
+                if not cancelled:
+                    return
+                # 取消与分配同时发生：归还名额，留给仍在等待的请求
+                self._release(endpoint)
+            waiter.abandoned = True
+        if cancelled:
+            logger.debug(f"排队中的请求已取消: endpoint={endpoint}")
+            raise RequestCancelled("请求已取消")
+        if deadline is not None and now >= deadline:
+            raise RequestCancelled("已超过调用截止时间")
+        raise ServerBusyError(
+            f"服务繁忙：{endpoint} 排队超过 {timeout:g} 秒，请稍后重试",
+            retry_after=timeout
+        )
+
+    def try_acquire(self, endpoint: str) -> bool:
+        """不排队地获取一个并发名额（没有空闲名额或已有请求排队时返回 False）"""
+        with self._lock:
+            if self._queue or not self._has_capacity(endpoint):
+                return False
+            self._grant(endpoint)
+            return True
+
+    def _release(self, endpoint: str):
+        """归还并发名额（需持有锁）"""
+        self._active -= 1
+        self._active_by_endpoint[endpoint] -= 1
+        self._dispatch()
+
+    def release(self, endpoint: str):
+        """归还并发名额"""
+        with self._lock:
+            self._release(endpoint)
+
+    @contextmanager
+    def admit(self, endpoint: str, priority: Optional[int] = None, token=None,
+              deadline: Optional[float] = None) -> Iterator[None]:
+        """
+        在准入控制下执行一次上游请求
+
+        Args:
+            endpoint: Prometheus API 路径
+            priority: 优先级；默认取 request_priority() 设定值或按路径推断
+            token: 调用的取消令牌
+            deadline: 调用的截止时间
+        """
+        self.acquire(endpoint, current_priority(endpoint) if priority is None else priority,
+                     token=token, deadline=deadline)
+        try:
+            yield
+        finally:
+            self.release(endpoint)
+
+    def check_session(self, session_id: Optional[str]):
+        """
+        会话限速检查（每次 tool 调用消耗一个令牌）
+
+        Raises:
+            ServerBusyError: 超过会话限速
+        """
+        if session_id is None or self.session_rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._sessions.get(session_id)
+            if bucket is None:
+                if len(self._sessions) > 1024:
+                    self._sessions = {
+                        key: value for key, value in self._sessions.items()
+                        if now - value.updated < self.SESSION_IDLE_TTL
+                    }
+                bucket = self._sessions[session_id] = TokenBucket(self.session_rate, self.session_burst)
+        wait = bucket.try_acquire()
+        if wait > 0:
+            raise ServerBusyError(
+                f"服务繁忙：当前会话请求过于频繁，请 {wait:.1f} 秒后重试",
+                retry_after=wait
+            )
+
+    def stats(self) -> Dict[str, object]:
+        """当前并发与排队情况"""
+        with self._lock:
+            return {
+                "active": self._active,
+                "active_by_endpoint": {k: v for k, v in self._active_by_endpoint.items() if v},
+                "queued": sum(1 for entry in self._queue if not entry[2].abandoned),
+            }
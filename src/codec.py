@@ -0,0 +1,128 @@
+"""
+JSON 编解码
+
+安装了 orjson 时使用 orjson，否则回退到标准库 json。输出默认带缩进，
+configure(compact=True) 后改为紧凑格式（无缩进），体积和编码开销都更小。
+"""
+import json
+from typing import Any, Optional, Union
+
+try:  # 可选依赖
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - 取决于环境
+    _orjson = None
+
+from .logger import get_logger
+
+logger = get_logger("codec")
+
+# 当前使用的 JSON 库名称
+BACKEND = "orjson" if _orjson is not None else "json"
+
+_compact = False
+
+
+def configure(compact: bool = False):
+    """设置默认输出格式（server 启动时根据配置调用）"""
+    global _compact
+    _compact = compact
+    logger.info(f"JSON 编解码: {BACKEND}，{'紧凑' if compact else '缩进'}输出")
+
+
+def is_compact() -> bool:
+    """当前默认输出是否为紧凑格式"""
+    return _compact
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """解析 JSON"""
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, compact: Optional[bool] = None) -> str:
+    """
+    序列化为 JSON 字符串（非 ASCII 字符原样输出）
+
+    Args:
+        obj: 要序列化的对象
+        compact: 是否紧凑输出；默认使用 configure() 的设置
+    """
+    if isinstance(obj, RawJSON) and (compact if compact is not None else _compact):
+        return obj.text
+    if isinstance(obj, RawJSON):
+        obj = obj.data
+    compact = _compact if compact is None else compact
+    if _orjson is not None:
+        try:
+            option = _orjson.OPT_NON_STR_KEYS | (0 if compact else _orjson.OPT_INDENT_2)
+            return _orjson.dumps(obj, option=option).decode("utf-8")
+        except TypeError:
+            # orjson 不支持的类型（如 Decimal、超过 64 位的整数）交给标准库
+            pass
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+class RawJSON:
+    """
+    未解析的 JSON 响应体
+
+    原样透传给调用方时不需要"解析 → 再序列化"；需要访问内容时再按需解析（结果缓存）。
+    """
+
+    __slots__ = ("raw", "_data")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._data = None
+
+    @classmethod
+    def from_data(cls, data: Any) -> "RawJSON":
+        """由已解析的内容构造（例如缓存命中时）"""
+        raw = cls(dumps(data, compact=True).encode("utf-8"))
+        raw._data = data
+        return raw
+
+    @property
+    def data(self) -> Any:
+        """解析后的内容"""
+        if self._data is None:
+            self._data = loads(self.raw)
+        return self._data
+
+    @property
+    def text(self) -> str:
+        return self.raw.decode("utf-8")
+
+    def status(self) -> Optional[str]:
+        """Prometheus 响应的 status 字段；响应以 status 开头时无需解析整个响应体"""
+        head = self.raw[:32].lstrip()
+        for status in ("success", "error"):
+            if head.startswith(b'{"status":"' + status.encode() + b'"'):
+                return status
+        return self.data.get("status") if isinstance(self.data, dict) else None
+
+    def with_fields(self, **fields: Any) -> "RawJSON":
+        """
+        在顶层对象末尾追加字段，返回新的 RawJSON（不解析原响应体）
+
+        追加的字段名不能与已有字段重复。
+        """
+        body = self.raw.rstrip()
+        if not body.endswith(b"}"):
+            raise ValueError("响应体不是 JSON 对象")
+        extra = dumps(fields, compact=True).encode("utf-8")[1:-1]
+        if not extra:
+            return self
+        head = body[:-1].rstrip()
+        separator = b"" if head.endswith(b"{") else b","
+        combined = RawJSON(head + separator + extra + b"}")
+        if self._data is not None:
+            combined._data = {**self._data, **fields}
+        return combined
+
+    def __len__(self) -> int:
+        return len(self.raw)
@@ -0,0 +1,180 @@
+"""两个时间窗口的范围查询结果对比"""
+import math
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from .series_store import CompactSeries, LabelInterner, from_matrix
+
+try:  # 可选依赖
+    import numpy as _numpy
+except ImportError:  # pragma: no cover - 取决于环境
+    _numpy = None
+
+# 列出只出现在一个窗口中的序列时的上限
+MAX_UNMATCHED = 10
+
+
+# 对齐网格的批量大小：每批序列数 × 网格宽度不超过该值，限制临时数组的内存
+_BATCH_CELLS = 1 << 20
+
+# 一条序列对齐后的统计：(共同网格点数, 当前窗口均值, 基线窗口均值, 差值绝对值最大的网格点的差值)
+Stats = Tuple[int, float, float, float]
+
+
+def _indices(series: CompactSeries, origin_ms: int, step_ms: int) -> array:
+    """采样点所在的网格下标（相对 origin 的 step 数）"""
+    base = series.base - origin_ms
+    return array("q", (round((base + offset) / step_ms) for offset in series.offsets))
+
+
+def _align_arrays(pairs: List[Tuple[CompactSeries, CompactSeries]], now_ms: int, then_ms: int,
+                  step_ms: int) -> List[Optional[Stats]]:
+    """没有 numpy 时逐条序列对齐：两个窗口各自展开为以网格下标寻址的 array('d')（空位为 NaN）"""
+    stats: List[Optional[Stats]] = []
+    for now, then in pairs:
+        now_idx, then_idx = _indices(now, now_ms, step_ms), _indices(then, then_ms, step_ms)
+        if not now_idx or not then_idx:
+            stats.append(None)
+            continue
+        lo = max(min(now_idx), min(then_idx))
+        hi = min(max(now_idx), max(then_idx))
+        if hi < lo:
+            stats.append(None)
+            continue
+        width = hi - lo + 1
+        now_grid = array("d", [math.nan]) * width
+        then_grid = array("d", [math.nan]) * width
+        for grid, indices, values in ((now_grid, now_idx, now.values), (then_grid, then_idx, then.values)):
+            for index, value in zip(indices, values):
+                if lo <= index <= hi:
+                    grid[index - lo] = value
+        count = 0
+        now_sum = then_sum = max_diff = 0.0
+        for a, b in zip(now_grid, then_grid):
+            if math.isfinite(a) and math.isfinite(b):
+                count += 1
+                now_sum += a
+                then_sum += b
+                if abs(a - b) > abs(max_diff):
+                    max_diff = a - b
+        stats.append((count, now_sum / count, then_sum / count, max_diff) if count else None)
+    return stats
+
+
+def _align_numpy(pairs: List[Tuple[CompactSeries, CompactSeries]], now_ms: int, then_ms: int,
+                 step_ms: int) -> List[Optional[Stats]]:
+    """numpy 批量对齐：一批序列展开为 (序列数, 网格宽度) 的矩阵，均值与差值按矩阵整体计算"""
+    np = _numpy
+    columns = []
+    for now, then in pairs:
+        now_ts, now_values = now.to_numpy()
+        then_ts, then_values = then.to_numpy()
+        columns.append((np.rint((now_ts - now_ms) / step_ms).astype("i8"), now_values,
+                        np.rint((then_ts - then_ms) / step_ms).astype("i8"), then_values))
+    indices = [c[i] for c in columns for i in (0, 2) if len(c[i])]
+    if not indices:
+        return [None] * len(pairs)
+    lo = min(int(i.min()) for i in indices)
+    width = max(int(i.max()) for i in indices) - lo + 1
+    batch = max(1, _BATCH_CELLS // width)
+    stats: List[Optional[Stats]] = []
+    for begin in range(0, len(columns), batch):
+        chunk = columns[begin:begin + batch]
+        grids = np.full((2, len(chunk), width), np.nan)
+        for row, (now_idx, now_values, then_idx, then_values) in enumerate(chunk):
+            grids[0, row, now_idx - lo] = now_values
+            grids[1, row, then_idx - lo] = then_values
+        now_grid, then_grid = grids
+        mask = np.isfinite(now_grid) & np.isfinite(then_grid)
+        counts = mask.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            now_means = np.where(mask, now_grid, 0.0).sum(axis=1) / counts
+            then_means = np.where(mask, then_grid, 0.0).sum(axis=1) / counts
+        diffs = np.where(mask, now_grid - then_grid, 0.0)
+        max_diffs = diffs[np.arange(len(chunk)), np.abs(diffs).argmax(axis=1)]
+        for count, now_mean, then_mean, max_diff in zip(counts, now_means, then_means, max_diffs):
+            stats.append((int(count), float(now_mean), float(then_mean), float(max_diff)) if count else None)
+    return stats
+
+
+def _labels_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    if value is None or not math.isfinite(value):
+        return None
+    return round(value, 6)
+
+
+def compare_matrices(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+                     start: float, step: float, shift: float, top: int = 10) -> Dict[str, Any]:
+    """
+    对齐两个窗口的 matrix 结果并按变化幅度排序
+
+    基线窗口的时间戳加上 shift 后与当前窗口落在同一个网格（start + k * step）上，
+    每条序列只比较两个窗口都有值的网格点。安装了 numpy 时按批量矩阵计算，否则逐条序列
+    在 array 缓冲区上计算。
+
+    Args:
+        current: 当前窗口的 data.result
+        baseline: 基线窗口的 data.result
+        start: 当前窗口起始时间（秒）
+        step: 步长（秒）
+        shift: 当前窗口相对基线窗口的偏移（秒，通常为正）
+        top: 返回变化最大的序列数
+
+    Returns:
+        {"summary": {...}, "series": [...], "only_current": [...], "only_baseline": [...]}
+    """
+    interner = LabelInterner()
+    step_ms = int(round(step * 1000))
+    current_by_key = {_labels_key(s.labels): s for s in from_matrix(current, interner)}
+    baseline_by_key = {_labels_key(s.labels): s for s in from_matrix(baseline, interner)}
+
+    matched = [(key, series, baseline_by_key[key]) for key, series in current_by_key.items()
+               if key in baseline_by_key]
+    align = _align_numpy if _numpy is not None else _align_arrays
+    stats = align([(now, then) for _, now, then in matched], int(round(start * 1000)),
+                  int(round((start - shift) * 1000)), step_ms)
+
+    rows = []
+    total_current = total_baseline = 0.0
+    for (_, series, _), item in zip(matched, stats):
+        if item is None:
+            continue
+        count, now_mean, then_mean, max_diff = item
+        total_current += now_mean
+        total_baseline += then_mean
+        diff = now_mean - then_mean
+        ratio = now_mean / then_mean if then_mean else None
+        # 基线为 0 时只要有变化就排在最前
+        relative = abs(diff) / abs(then_mean) if then_mean else (math.inf if diff else 0.0)
+        rows.append((relative, abs(diff), {
+            "metric": dict(series.labels),
+            "points": count,
+            "current_mean": _round(now_mean),
+            "baseline_mean": _round(then_mean),
+            "diff": _round(diff),
+            "ratio": _round(ratio),
+            "max_point_diff": _round(max_diff),
+        }))
+
+    rows.sort(key=lambda row: (row[0], row[1]), reverse=True)
+    only_current = [key for key in current_by_key if key not in baseline_by_key]
+    only_baseline = [key for key in baseline_by_key if key not in current_by_key]
+    return {
+        "summary": {
+            "current_series": len(current_by_key),
+            "baseline_series": len(baseline_by_key),
+            "matched_series": len(rows),
+            "only_current": len(only_current),
+            "only_baseline": len(only_baseline),
+            "current_mean_total": _round(total_current),
+            "baseline_mean_total": _round(total_baseline),
+            "ratio_total": _round(total_current / total_baseline) if total_baseline else None,
+        },
+        "series": [row[2] for row in rows[:top]],
+        "only_current": [dict(key) for key in only_current[:MAX_UNMATCHED]],
+        "only_baseline": [dict(key) for key in only_baseline[:MAX_UNMATCHED]],
+    }
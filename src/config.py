@@ -1,8 +1,8 @@
 """配置加载模块"""
 import yaml
 from pathlib import Path
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, model_validator
 
 
 class LoggingConfig(BaseModel):
@@ -19,19 +19,128 @@ class PrometheusConfig(BaseModel):
     username: Optional[str] = None
     password: Optional[str] = None
     timeout: int = 30
+    pool_size: int = 20  # HTTP 连接池大小
+    replicas: List[str] = Field(default_factory=list)  # 同一份数据的其他 HA 副本地址（用于对冲请求）
+    hedge_percentile: float = 0.95  # 对冲延迟取首选副本最近耗时的该分位数
+    hedge_min_delay: float = 0.05  # 对冲延迟下限（秒）
+    remote_read: bool = False  # 后端开放 remote-read API 时启用原始样本批量获取（prometheus_raw_series）
+
+
+class DatasourceConfig(PrometheusConfig):
+    """命名 datasource 配置（Prometheus / VictoriaMetrics）"""
+    name: str
+    uid: Optional[str] = None  # Grafana datasource uid，用于匹配 panel 的 datasource.uid
 
 
 class DashboardConfig(BaseModel):
     """Dashboard 配置"""
-    name: str
-    path: str
+    name: Optional[str] = None  # 未指定或 path 为目录/glob 时使用 dashboard 的 uid（没有时用 title）
+    path: str  # dashboard JSON 文件、目录（递归匹配 *.json）或 glob（如 "./exported/**/*.json"）
+    prefetch: bool = False  # 在后台按 prefetch.interval 预计算该 dashboard 的 panel 查询
+
+
+class DashboardDiscoveryConfig(BaseModel):
+    """dashboard 文件发现与解析配置"""
+    processes: int = 4  # 并行解析的进程数，0 表示在当前进程中解析
+    rescan_interval: float = 0  # 重新扫描 dashboard 文件的间隔（秒），0 表示只在启动时扫描
+
+
+class CacheConfig(BaseModel):
+    """磁盘缓存配置（label 值、series 元数据、历史范围查询结果）"""
+    enabled: bool = False
+    dir: str = ".cache"  # 缓存目录，相对路径基于配置文件所在目录
+    max_bytes: int = 512 * 1024 * 1024  # 缓存上限，超过后按最近访问时间淘汰
+    ttl: int = 300  # label 值与 series 元数据的缓存时间（秒）
+    immutable_after: int = 600  # 结束时间早于 now - N 秒的范围查询结果视为不可变
+    sliding_window: bool = True  # 相对时间窗口的范围查询只向 Prometheus 请求增量部分（内存缓存）
+    sliding_window_entries: int = 128  # 每个 datasource 最多缓存的 (query, step) 窗口数
+    sliding_window_overlap: int = 2  # 增量请求与已缓存数据重叠的 step 数，覆盖迟到的样本
+
+
+class MetricIndexConfig(BaseModel):
+    """指标名索引配置（查询发往 Prometheus 之前在本地校验指标名）"""
+    enabled: bool = True
+    refresh_interval: int = 300  # 索引刷新间隔（秒）
+    label_names: bool = False  # 同时校验 label 匹配器中的 label 名
+
+
+class MetricMetadataConfig(BaseModel):
+    """指标元数据配置（metrics resource 附加 /api/v1/metadata 中的 type / unit / help）"""
+    enabled: bool = True
+    ttl: float = 600  # 元数据的缓存时间（秒）
+
+
+class PrefetchConfig(BaseModel):
+    """panel 预计算配置（对 prefetch: true 的 dashboard 生效）"""
+    interval: float = 60  # 每个 dashboard 的计算间隔（秒）
+    jitter: float = 0.1  # 间隔的随机抖动比例
+    max_entries: int = 2000  # 最多保存的查询结果数
+
+
+class SeriesGuardConfig(BaseModel):
+    """高基数查询保护配置（未聚合且结果序列过多的查询改写为 topk）"""
+    enabled: bool = False
+    max_series: int = 1000  # 结果序列数上限，超过时改写
+    k: int = 100  # 改写后 topk 的 k
+    probe_ttl: float = 60  # 同一查询 count() 探测结果的缓存时间（秒）
+
+
+class OffloadConfig(BaseModel):
+    """大结果处理（解析、汇总、序列化）的进程池配置"""
+    processes: int = 2  # 进程池大小，0 表示不使用进程池（大结果改在线程池中处理）
+    threshold_bytes: int = 1024 * 1024  # 响应体达到该大小时才放到进程池
+
+
+class ResultStoreConfig(BaseModel):
+    """大查询结果暂存配置（返回 handle，再用 fetch_result_page 分页取回）"""
+    max_bytes: int = 256 * 1024 * 1024  # 暂存结果的内存上限，超过后淘汰最久未访问的
+    ttl: float = 600  # 暂存时间（秒），每次取回后重新计时
+    auto_threshold_bytes: int = 0  # 响应体达到该大小时自动暂存，0 表示只在 store_result=true 时暂存
+
+
+class AdmissionConfig(BaseModel):
+    """准入控制配置（限制发往 Prometheus 的并发与会话请求频率）"""
+    max_concurrency: int = 16  # 所有 datasource 合计的最大并发请求数
+    endpoint_limits: Dict[str, int] = Field(default_factory=lambda: {
+        "/api/v1/query_range": 8,
+        "/api/v1/series": 4,
+        "/api/v1/label/values": 4,
+    })  # 按 API 路径的并发上限
+    queue_timeout: float = 10  # 排队超过该时间（秒）返回"服务繁忙"
+    session_rate: float = 5  # 每个会话每秒允许的 tool 调用数，<= 0 表示不限速
+    session_burst: int = 20  # 每个会话允许的突发 tool 调用数
+
+
+class OutputConfig(BaseModel):
+    """tool/resource 输出配置"""
+    compact: bool = False  # 紧凑 JSON（无缩进）：体积更小，查询结果可直接透传 Prometheus 响应体
+    budget: int = 0  # 查询 tool 输出的默认预算（字符数，约 4 个字符一个 token），超过时逐步裁剪；0 表示不限制
+    resource_page_size: int = 100  # list_resources 每页返回的 resource 数，0 表示不分页
 
 
 class Config(BaseModel):
     """全局配置"""
-    prometheus: PrometheusConfig
+    prometheus: Optional[PrometheusConfig] = None  # 单 datasource 配置（注册为名为 default 的 datasource）
+    datasources: List[DatasourceConfig] = Field(default_factory=list)
+    default_datasource: Optional[str] = None  # 默认 datasource 名称，默认为第一个
     dashboards: List[DashboardConfig] = Field(default_factory=list)
+    dashboard_discovery: DashboardDiscoveryConfig = Field(default_factory=DashboardDiscoveryConfig)
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    metric_index: MetricIndexConfig = Field(default_factory=MetricIndexConfig)
+    metric_metadata: MetricMetadataConfig = Field(default_factory=MetricMetadataConfig)
+    admission: AdmissionConfig = Field(default_factory=AdmissionConfig)
+    prefetch: PrefetchConfig = Field(default_factory=PrefetchConfig)
+    series_guard: SeriesGuardConfig = Field(default_factory=SeriesGuardConfig)
+    offload: OffloadConfig = Field(default_factory=OffloadConfig)
+    output: OutputConfig = Field(default_factory=OutputConfig)
+    result_store: ResultStoreConfig = Field(default_factory=ResultStoreConfig)
+
+    @model_validator(mode="after")
+    def _check_datasources(self) -> "Config":
+        if self.prometheus is None and not self.datasources:
+            raise ValueError("必须配置 prometheus 或 datasources")
+        return self
 
 
 def load_config(config_path: str = "config.yaml") -> Config:
@@ -0,0 +1,236 @@
+"""
+Dashboard 发现与并行解析
+
+dashboards 配置项的 path 可以是单个文件，也可以是目录或 glob（如 "./exported/**/*.json"），
+目录/glob 匹配到的文件自动注册为 dashboard，名称取自 uid（没有时用 title）。
+
+文件内容按 sha256 缓存解析结果（只保留解析器用到的字段）：未变化的文件不再解析；
+配置了磁盘缓存时重启后也能直接复用。需要解析的文件较多时放到进程池中并行解析。
+"""
+import glob
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import codec
+from .logger import get_logger
+
+logger = get_logger("dashboard_catalog")
+
+# 解析器用到的 panel / target 字段，其余（布局、样式、fieldConfig 等）在缓存前丢弃
+_PANEL_FIELDS = ("type", "title", "description", "datasource", "collapsed")
+_TARGET_FIELDS = ("expr", "refId", "datasource")
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+def is_pattern(path: str) -> bool:
+    """path 是否为 glob 模式"""
+    return bool(_GLOB_CHARS.search(path))
+
+
+def _slim_panel(panel: Dict[str, Any]) -> Dict[str, Any]:
+    slim = {key: panel[key] for key in _PANEL_FIELDS if key in panel}
+    targets = [
+        {key: target[key] for key in _TARGET_FIELDS if key in target}
+        for target in panel.get("targets") or []
+        if isinstance(target, dict)
+    ]
+    if targets:
+        slim["targets"] = targets
+    if panel.get("panels"):
+        slim["panels"] = [_slim_panel(p) for p in panel["panels"] if isinstance(p, dict)]
+    return slim
+
+
+def slim_dashboard(data: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留 DashboardParser 用到的字段（变量定义原样保留）"""
+    # 通过 Grafana API 导出的文件外面包了一层 {"dashboard": {...}, "meta": {...}}
+    if "dashboard" in data and "panels" not in data:
+        data = data["dashboard"]
+    slim = {key: data[key] for key in ("uid", "title", "description", "templating") if key in data}
+    slim["panels"] = [_slim_panel(p) for p in data.get("panels") or [] if isinstance(p, dict)]
+    return slim
+
+
+def parse_dashboard(content: bytes) -> Dict[str, Any]:
+    """解析 dashboard 文件内容（在子进程中执行，参数与返回值都要能 pickle）"""
+    return slim_dashboard(codec.loads(content))
+
+
+def dashboard_name(data: Dict[str, Any], path: Path) -> str:
+    """自动发现的 dashboard 名称：uid，其次 title（转为小写并用 - 连接），最后文件名"""
+    name = data.get("uid") or re.sub(r"[^0-9a-zA-Z_.-]+", "-", data.get("title") or "").strip("-").lower()
+    return name or path.stem
+
+
+@dataclass
+class DiscoveredDashboard:
+    """发现的一个 dashboard"""
+    name: str
+    path: Path
+    digest: str  # 文件内容的 sha256
+    data: Dict[str, Any]  # 精简后的 dashboard JSON
+    prefetch: bool = False
+
+
+class DashboardCatalog:
+    """
+    按配置发现 dashboard 文件并解析
+
+    同一个 catalog 可以反复 scan()：mtime 与大小未变的文件直接复用上次的结果，
+    内容变化的文件按内容 hash 查缓存，只有缓存未命中的文件才需要解析。
+    每次 scan() 后丢弃本次未出现的文件与内容的缓存，长时间运行时内存不随修改次数增长。
+    """
+
+    # 需要解析的文件数达到该值时才使用进程池（进程启动本身有开销）
+    PARALLEL_THRESHOLD = 16
+
+    def __init__(self, entries: Sequence, base_dir: Path, processes: int = 4, disk_cache=None):
+        """
+        初始化
+
+        Args:
+            entries: DashboardConfig 列表
+            base_dir: 相对路径的基准目录（配置文件所在目录）
+            processes: 解析进程数（不超过 CPU 核数），0 表示在当前进程中解析
+            disk_cache: 可选的 DiskCache，持久化解析结果
+        """
+        self.entries = list(entries)
+        self.base_dir = base_dir
+        self.processes = processes
+        self.disk_cache = disk_cache
+        # sha256 -> 精简后的 dashboard
+        self._parsed: Dict[str, Dict[str, Any]] = {}
+        # 文件路径 -> ((mtime_ns, size), sha256)
+        self._stats: Dict[Path, Tuple[Tuple[int, int], str]] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, path: str) -> Path:
+        resolved = Path(path).expanduser()
+        if not resolved.is_absolute():
+            # 相对于配置文件所在目录（与 README 约定一致）
+            resolved = self.base_dir / resolved
+        return resolved
+
+    def _files(self, entry) -> Tuple[List[Path], bool]:
+        """
+        配置项匹配到的文件（按路径排序，保证名称冲突时结果稳定）
+
+        Returns:
+            (文件列表, 配置项是否为单个文件)
+        """
+        path = self._resolve(entry.path)
+        if is_pattern(entry.path):
+            files = (Path(p) for p in glob.glob(str(path), recursive=True))
+            return sorted(p.resolve() for p in files if p.is_file()), False
+        if path.is_dir():
+            return sorted(p.resolve() for p in path.rglob("*.json") if p.is_file()), False
+        if not path.exists():
+            # 单个文件被删除时只跳过该配置项，其余 dashboard 照常更新
+            logger.error(f"Dashboard 文件不存在，跳过: {path}")
+            return [], True
+        return [path.resolve()], True
+
+    def _digest(self, path: Path) -> Tuple[str, Optional[bytes]]:
+        """文件内容的 sha256；文件未变化时不重新读取，返回的内容为 None"""
+        stat = path.stat()
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._stats.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1], None
+        content = path.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        self._stats[path] = (key, digest)
+        return digest, content
+
+    def _lookup(self, digest: str) -> Optional[Dict[str, Any]]:
+        data = self._parsed.get(digest)
+        if data is None and self.disk_cache is not None:
+            data = self.disk_cache.get(f"dashboard:{digest}")
+            if data is not None:
+                self._parsed[digest] = data
+        return data
+
+    def _parse_all(self, pending: Dict[str, Tuple[Path, bytes]]):
+        """解析缓存未命中的文件，结果写入缓存"""
+        if not pending:
+            return
+        digests = list(pending)
+        contents = [pending[digest][1] for digest in digests]
+        # 单核机器上进程池只会增加启动与传输开销
+        workers = min(self.processes, os.cpu_count() or 1, len(pending))
+        if workers > 1 and len(pending) >= self.PARALLEL_THRESHOLD:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                results = list(pool.map(_try_parse, contents, chunksize=8))
+        else:
+            results = [_try_parse(content) for content in contents]
+        for digest, (data, error) in zip(digests, results):
+            if error is not None:
+                logger.error(f"解析 dashboard 失败: {pending[digest][0]}: {error}")
+                continue
+            self._parsed[digest] = data
+            if self.disk_cache is not None:
+                self.disk_cache.set(f"dashboard:{digest}", data)
+
+    def _prune(self, paths: set, digests: set):
+        """丢弃本次扫描中未出现的文件与内容（已删除、改名或修改前的旧内容）"""
+        self._stats = {path: stat for path, stat in self._stats.items() if path in paths}
+        self._parsed = {digest: data for digest, data in self._parsed.items() if digest in digests}
+
+    def scan(self) -> Dict[str, DiscoveredDashboard]:
+        """
+        扫描所有配置项
+
+        Returns:
+            dashboard 名称 -> DiscoveredDashboard（按配置顺序）
+        """
+        with self._lock:
+            matched: List[Tuple[Any, Optional[str], Path, str]] = []
+            pending: Dict[str, Tuple[Path, bytes]] = {}
+            for entry in self.entries:
+                files, single = self._files(entry)
+                # 单个文件的配置项可以指定名称，目录/glob 匹配到的文件使用自动生成的名称
+                configured_name = entry.name if single else None
+                for path in files:
+                    try:
+                        digest, content = self._digest(path)
+                    except OSError as e:
+                        logger.error(f"读取 dashboard 失败: {path}: {e}")
+                        continue
+                    matched.append((entry, configured_name, path, digest))
+                    if digest not in pending and self._lookup(digest) is None:
+                        if content is None:
+                            content = path.read_bytes()
+                        pending[digest] = (path, content)
+            self._parse_all(pending)
+            if pending:
+                logger.info(f"解析了 {len(pending)} 个 dashboard 文件，{len(matched) - len(pending)} 个命中缓存")
+            self._prune({path for _, _, path, _ in matched}, {digest for _, _, _, digest in matched})
+
+            dashboards: Dict[str, DiscoveredDashboard] = {}
+            for entry, configured_name, path, digest in matched:
+                data = self._parsed.get(digest)
+                if data is None:
+                    continue
+                name = configured_name or dashboard_name(data, path)
+                if name in dashboards:
+                    logger.warning(f"dashboard 名称重复，忽略: {name} ({path}，已由 {dashboards[name].path} 使用)")
+                    continue
+                dashboards[name] = DiscoveredDashboard(name, path, digest, data, entry.prefetch)
+            return dashboards
+
+
+def _try_parse(content: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    try:
+        return parse_dashboard(content), None
+    except Exception as e:
+        return None, str(e)
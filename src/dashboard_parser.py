@@ -14,16 +14,21 @@ class Variable:
     query: Optional[str] = None  # PromQL 查询语句
     current_value: Optional[str] = None
     options: List[str] = None
+    datasource: Optional[str] = None  # datasource uid 或名称
+    all_value: Optional[str] = None  # 选中 All 时使用的自定义值（Grafana allValue）
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
-        return {
+        result = {
             "name": self.name,
             "label": self.label or self.name,
             "type": self.type,
             "query": self.query,
             "current_value": self.current_value,
         }
+        if self.datasource:
+            result["datasource"] = self.datasource
+        return result
 
 
 @dataclass
@@ -32,6 +37,7 @@ class Metric:
     title: str
     description: Optional[str]
     expr: str  # PromQL 表达式
+    datasource: Optional[str] = None  # datasource uid 或名称（target 优先于 panel）
     
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -41,6 +47,7 @@ class Metric:
         - title: 指标名称
         - description: 指标描述
         - expr: PromQL 表达式
+        - datasource: 仅在 dashboard 使用多个 datasource 时有意义，有值才输出
         """
         result = {
             "title": self.title,
@@ -49,20 +56,53 @@ class Metric:
         # 只在有 description 时才添加，避免空字符串占用 token
         if self.description:
             result["description"] = self.description
+        if self.datasource:
+            result["datasource"] = self.datasource
         return result
 
 
+# Grafana 中表示"混合数据源"的特殊 uid/名称，需要以 target 上的 datasource 为准
+_MIXED_DATASOURCE = "-- Mixed --"
+
+
+def datasource_ref(value: Any) -> Optional[str]:
+    """
+    从 Grafana 的 datasource 字段中取出引用（uid 优先，其次名称）
+
+    datasource 字段在新版 Grafana 中是 {"type": ..., "uid": ...}，旧版是名称字符串。
+
+    Args:
+        value: panel/target/variable 的 datasource 字段
+
+    Returns:
+        uid 或名称；未设置或为混合数据源时返回 None
+    """
+    if isinstance(value, dict):
+        ref = value.get("uid") or value.get("name")
+    elif isinstance(value, str):
+        ref = value
+    else:
+        return None
+    if not ref or ref == _MIXED_DATASOURCE:
+        return None
+    return ref
+
+
 class DashboardParser:
     """Dashboard 解析器"""
     
-    def __init__(self, dashboard_path: str):
+    def __init__(self, dashboard_path: str, dashboard_json: Optional[Dict[str, Any]] = None):
         """
         初始化解析器
         
         Args:
             dashboard_path: dashboard JSON 文件路径
+            dashboard_json: 已解析的 dashboard JSON（如 DashboardCatalog 的缓存结果），提供时不再读取文件
         """
         self.dashboard_path = Path(dashboard_path)
+        if dashboard_json is not None:
+            self.dashboard_json = dashboard_json
+            return
         if not self.dashboard_path.exists():
             raise FileNotFoundError(f"Dashboard 文件不存在: {dashboard_path}")
         
@@ -95,12 +135,25 @@ class DashboardParser:
             if isinstance(current, dict):
                 current_value = current.get("value") or current.get("text")
             
+            # 新版 Grafana 的 query 可能是 {"query": "...", "refId": ...}
+            if isinstance(query, dict):
+                query = query.get("query")
+            
+            # 静态选项（custom/interval 等变量）
+            options = [
+                opt.get("value") for opt in var.get("options") or []
+                if isinstance(opt, dict) and opt.get("value") not in (None, "$__all")
+            ]
+            
             variable = Variable(
                 name=name,
                 label=label,
                 type=var_type,
                 query=query,
                 current_value=current_value,
+                options=options,
+                datasource=datasource_ref(var.get("datasource")),
+                all_value=var.get("allValue") or None,
             )
             variables.append(variable)
         
@@ -167,6 +220,7 @@ class DashboardParser:
         
         title = panel.get("title", "Untitled")
         description = panel.get("description")
+        panel_datasource = datasource_ref(panel.get("datasource"))
         
         # 提取所有 targets 中的 expr
         for idx, target in enumerate(targets):
@@ -184,6 +238,7 @@ class DashboardParser:
                 title=metric_title,
                 description=description,
                 expr=expr,
+                datasource=datasource_ref(target.get("datasource")) or panel_datasource,
             )
             metrics.append(metric)
         
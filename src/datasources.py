@@ -0,0 +1,167 @@
+"""多 datasource 路由"""
+from typing import Dict, Iterable, List, Optional
+
+from .admission import AdmissionController
+from .config import Config
+from .dashboard_parser import Metric
+from .disk_cache import DiskCache
+from .logger import get_logger
+from .prometheus_client import PrometheusClient
+from .promql import metric_names
+from .range_cache import SlidingWindowCache
+
+logger = get_logger("datasources")
+
+# 兼容旧配置：prometheus 段注册为该名称的 datasource
+DEFAULT_DATASOURCE_NAME = "default"
+
+class DatasourceRouter:
+    """
+    按 datasource 名称/uid 管理 Prometheus 客户端，并把查询路由到正确的后端
+
+    每个 datasource 有独立的 PrometheusClient（各自的连接池）。
+    """
+
+    def __init__(self, clients: Dict[str, PrometheusClient], uids: Optional[Dict[str, str]] = None,
+                 default: Optional[str] = None):
+        """
+        初始化路由器
+
+        Args:
+            clients: datasource 名称 -> 客户端
+            uids: Grafana datasource uid -> datasource 名称
+            default: 默认 datasource 名称（无法识别时使用）
+        """
+        if not clients:
+            raise ValueError("至少需要配置一个 datasource")
+        self.clients = clients
+        self.uids = uids or {}
+        self.default = default or next(iter(clients))
+        if self.default not in clients:
+            raise ValueError(f"默认 datasource 不存在: {self.default}")
+        # 指标名 -> datasource 名称（从 dashboard panel 中学习）
+        self.metric_datasources: Dict[str, str] = {}
+
+    @classmethod
+    def from_config(cls, config: Config, cache: Optional[DiskCache] = None,
+                    admission: Optional[AdmissionController] = None) -> "DatasourceRouter":
+        """
+        根据配置创建路由器
+
+        Args:
+            config: 全局配置
+            cache: 各 datasource 共享的磁盘缓存（可选，key 中包含后端地址）
+            admission: 各 datasource 共享的准入控制（可选）
+        """
+        clients: Dict[str, PrometheusClient] = {}
+        uids: Dict[str, str] = {}
+        sources = []
+        if config.prometheus:
+            sources.append((DEFAULT_DATASOURCE_NAME, None, config.prometheus))
+        for ds in config.datasources:
+            sources.append((ds.name, ds.uid, ds))
+
+        for name, uid, ds in sources:
+            if name in clients:
+                raise ValueError(f"datasource 名称重复: {name}")
+            clients[name] = PrometheusClient(
+                base_url=[ds.url] + ds.replicas,
+                username=ds.username,
+                password=ds.password,
+                timeout=ds.timeout,
+                pool_size=ds.pool_size,
+                hedge_percentile=ds.hedge_percentile,
+                hedge_min_delay=ds.hedge_min_delay,
+                cache=cache,
+                cache_ttl=config.cache.ttl,
+                immutable_after=config.cache.immutable_after,
+                admission=admission,
+                remote_read=ds.remote_read,
+                window_cache=SlidingWindowCache(
+                    max_entries=config.cache.sliding_window_entries,
+                    overlap_steps=config.cache.sliding_window_overlap,
+                ) if config.cache.sliding_window else None
+            )
+            if uid:
+                uids[uid] = name
+        return cls(clients, uids, config.default_datasource)
+
+    def names(self) -> List[str]:
+        """所有 datasource 名称"""
+        return list(self.clients)
+
+    def resolve(self, ref: Optional[str]) -> str:
+        """
+        把 datasource 引用（名称、uid 或模板变量）解析为 datasource 名称
+
+        Args:
+            ref: datasource 名称/uid；None 或无法识别（例如 ${DS_PROMETHEUS}）时返回默认 datasource
+
+        Returns:
+            datasource 名称
+        """
+        if ref:
+            if ref in self.clients:
+                return ref
+            if ref in self.uids:
+                return self.uids[ref]
+            logger.debug(f"未识别的 datasource 引用 {ref}，使用默认 datasource {self.default}")
+        return self.default
+
+    def get_client(self, ref: Optional[str] = None) -> PrometheusClient:
+        """获取 datasource 对应的客户端"""
+        return self.clients[self.resolve(ref)]
+
+    @property
+    def default_client(self) -> PrometheusClient:
+        """默认 datasource 的客户端"""
+        return self.clients[self.default]
+
+    def _metric_map(self, metrics: Iterable[Metric]) -> Dict[str, str]:
+        """指标名 -> datasource 的映射（同一指标出现在多个 datasource 时以先出现的为准）"""
+        mapping: Dict[str, str] = {}
+        for metric in metrics:
+            if not metric.datasource:
+                continue
+            name = self.resolve(metric.datasource)
+            for metric_name in metric_names(metric.expr):
+                mapping.setdefault(metric_name, name)
+        return mapping
+
+    def replace_metrics(self, metrics: Iterable[Metric]):
+        """
+        用当前全部 dashboard 的指标重建路由映射（新映射构建完成后整体替换）
+
+        dashboard 重新扫描后调用：指标改用其他 datasource、或 dashboard 被删除时，旧的映射随之失效。
+
+        Args:
+            metrics: 所有 dashboard 的 DashboardParser.parse_metrics() 结果
+        """
+        self.metric_datasources = self._metric_map(metrics)
+
+    def route(self, query: str, datasource: Optional[str] = None) -> str:
+        """
+        为查询选择 datasource
+
+        显式指定时直接使用；否则根据查询中的指标名匹配 dashboard 中的 datasource，
+        所有指标都落在同一个 datasource 时使用它，否则回退到默认 datasource。
+
+        Args:
+            query: PromQL 查询
+            datasource: 显式指定的 datasource 名称/uid（可选）
+
+        Returns:
+            datasource 名称
+        """
+        if datasource:
+            if datasource not in self.clients and datasource not in self.uids:
+                raise ValueError(f"未知的 datasource: {datasource}，可用: {self.names()}")
+            return self.resolve(datasource)
+        candidates = {
+            self.metric_datasources[name]
+            for name in metric_names(query)
+            if name in self.metric_datasources
+        }
+        if len(candidates) == 1:
+            return candidates.pop()
+        return self.default
@@ -0,0 +1,132 @@
+"""基于 SQLite（WAL 模式）的持久化磁盘缓存"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Optional
+
+from .codec import dumps as json_dumps, loads as json_loads
+from .logger import get_logger
+
+logger = get_logger("disk_cache")
+
+
+class DiskCache:
+    """
+    进程间共享的磁盘缓存
+
+    - SQLite WAL 模式：多个 server 进程可同时读写同一个缓存目录
+    - 值以 zlib 压缩的 JSON 存储
+    - 支持 TTL；超过 max_bytes 时按最近访问时间淘汰
+    """
+
+    # 每次淘汰删除的条目比例
+    EVICT_FRACTION = 0.1
+    # 访问时间更新的最小间隔（秒），避免每次读都产生写
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        初始化磁盘缓存
+
+        Args:
+            directory: 缓存目录
+            max_bytes: 缓存最大字节数
+        """
+        self.path = Path(directory) / "cache.sqlite3"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires REAL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        logger.info(f"磁盘缓存: {self.path}，上限 {max_bytes} bytes")
+
+    @staticmethod
+    def make_key(namespace: str, *parts: Any) -> str:
+        """根据命名空间和请求参数生成缓存 key"""
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"{namespace}:{digest}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，不存在或已过期时返回 None"""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires, accessed FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, expires, accessed = row
+                if expires is not None and expires <= now:
+                    return None
+                if now - accessed > self.TOUCH_INTERVAL:
+                    self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            return json_loads(zlib.decompress(value))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            logger.warning(f"读取磁盘缓存失败 key={key}: {e}")
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        写入缓存
+
+        Args:
+            key: 缓存 key
+            value: 可 JSON 序列化的值
+            ttl: 过期时间（秒），None 表示只受容量淘汰
+        """
+        now = time.time()
+        blob = zlib.compress(json_dumps(value, compact=True).encode("utf-8"), 1)
+        expires = now + ttl if ttl is not None else None
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), expires, now)
+                )
+                self._evict_if_needed(now)
+        except sqlite3.Error as e:
+            logger.warning(f"写入磁盘缓存失败 key={key}: {e}")
+
+    def _used_bytes(self) -> int:
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - freelist) * self._page_size
+
+    def _evict_if_needed(self, now: float):
+        """超过容量时先删除过期条目，再按最近访问时间淘汰"""
+        if self._used_bytes() <= self.max_bytes:
+            return
+        self._conn.execute("DELETE FROM entries WHERE expires IS NOT NULL AND expires <= ?", (now,))
+        while self._used_bytes() > self.max_bytes:
+            total = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if total == 0:
+                break
+            batch = max(1, int(total * self.EVICT_FRACTION))
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                (batch,)
+            )
+            logger.debug(f"磁盘缓存超过上限，淘汰 {batch} 个条目")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
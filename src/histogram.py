@@ -0,0 +1,143 @@
+"""
+在本地对 Prometheus 经典直方图的 bucket 序列计算分位数
+
+一次范围查询取回 bucket 序列（带 le label）后，任意多个分位数、bucket 分布都在本地计算，
+不需要为每个分位数分别向 Prometheus 发起一次 histogram_quantile 查询。
+计算规则与 Prometheus 的 histogram_quantile 一致（bucket 内线性插值）。
+"""
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .series_store import format_value
+
+
+def _parse_le(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def bucket_quantile(q: float, buckets: Sequence[Tuple[float, float]]) -> float:
+    """
+    按 Prometheus histogram_quantile 的规则计算一个时间点的分位数
+
+    Args:
+        q: 分位数（0~1）
+        buckets: [(上界 le, 累计计数)]，按 le 升序，最后一个必须是 +Inf
+
+    Returns:
+        分位数；无法计算时返回 NaN
+    """
+    if q < 0:
+        return -math.inf
+    if q > 1:
+        return math.inf
+    if len(buckets) < 2 or not math.isinf(buckets[-1][0]):
+        return math.nan
+    # 累计计数应单调不减；抓取时间不一致可能破坏这一点，与 Prometheus 一样向上修正
+    counts = []
+    running = 0.0
+    for _, count in buckets:
+        running = max(running, count)
+        counts.append(running)
+    total = counts[-1]
+    if total == 0 or math.isnan(total):
+        return math.nan
+    rank = q * total
+    index = next(i for i, count in enumerate(counts) if count >= rank)
+    if index == len(buckets) - 1:
+        return buckets[-2][0]
+    upper = buckets[index][0]
+    if index == 0 and upper <= 0:
+        return upper
+    lower = buckets[index - 1][0] if index > 0 else 0.0
+    below = counts[index - 1] if index > 0 else 0.0
+    in_bucket = counts[index] - below
+    if in_bucket == 0:
+        return upper
+    return lower + (upper - lower) * ((rank - below) / in_bucket)
+
+
+def group_buckets(matrix: List[Dict[str, Any]]) -> Dict[Tuple, Tuple[Dict[str, str], Dict[float, Dict[Any, float]]]]:
+    """
+    按去掉 le 后的 label 集合分组
+
+    Returns:
+        {分组 key: (分组 labels, {le: {时间戳: 值}})}
+    """
+    groups: Dict[Tuple, Tuple[Dict[str, str], Dict[float, Dict[Any, float]]]] = {}
+    for item in matrix:
+        metric = item.get("metric", {})
+        le = _parse_le(metric.get("le"))
+        if le is None:
+            continue
+        labels = {k: v for k, v in metric.items() if k not in ("le", "__name__")}
+        key = tuple(sorted(labels.items()))
+        _, buckets = groups.setdefault(key, (labels, {}))
+        points = buckets.setdefault(le, {})
+        for ts, value in item.get("values", []):
+            points[ts] = points.get(ts, 0.0) + float(value)
+    return groups
+
+
+def _stats(values: List[float]) -> Dict[str, Optional[float]]:
+    finite = [v for v in values if math.isfinite(v)]
+    if not finite:
+        return {"last": None, "min": None, "max": None, "avg": None}
+    return {
+        "last": round(finite[-1], 6),
+        "min": round(min(finite), 6),
+        "max": round(max(finite), 6),
+        "avg": round(sum(finite) / len(finite), 6),
+    }
+
+
+def analyze(matrix: List[Dict[str, Any]], quantiles: Sequence[float],
+            include_points: bool = False) -> List[Dict[str, Any]]:
+    """
+    对每个分组计算多个分位数及 bucket 分布
+
+    Args:
+        matrix: bucket 序列的范围查询结果（data.result），每条序列带 le label
+        quantiles: 要计算的分位数
+        include_points: 是否返回每个分位数的时间序列
+
+    Returns:
+        每个分组一项：labels、各分位数的统计、bucket 分布（各 bucket 在整个窗口内的观测占比）
+    """
+    results = []
+    for labels, buckets in group_buckets(matrix).values():
+        bounds = sorted(buckets)
+        if not bounds or not math.isinf(bounds[-1]):
+            results.append({"labels": labels, "error": "缺少 le=\"+Inf\" bucket"})
+            continue
+        timestamps = sorted({ts for points in buckets.values() for ts in points}, key=float)
+        per_quantile: Dict[float, List[Tuple[Any, float]]] = {q: [] for q in quantiles}
+        # 每个 bucket（非累计）在窗口内的观测量之和，用于分布/热力图
+        totals = [0.0] * len(bounds)
+        for ts in timestamps:
+            cumulative = [(le, buckets[le].get(ts, 0.0)) for le in bounds]
+            for q in quantiles:
+                per_quantile[q].append((ts, bucket_quantile(q, cumulative)))
+            previous = 0.0
+            for i, (_, count) in enumerate(cumulative):
+                count = max(count, previous)
+                totals[i] += count - previous
+                previous = count
+        observed = sum(totals)
+        entry: Dict[str, Any] = {
+            "labels": labels,
+            "quantiles": {},
+            "buckets": [
+                {"le": format_value(le), "share": round(total / observed, 6) if observed else None}
+                for le, total in zip(bounds, totals)
+            ],
+        }
+        for q, points in per_quantile.items():
+            stats = _stats([value for _, value in points])
+            if include_points:
+                stats["values"] = [[ts, format_value(value)] for ts, value in points]
+            entry["quantiles"][format_value(q)] = stats
+        results.append(entry)
+    return results
@@ -0,0 +1,150 @@
+"""指标名索引：查询发往 Prometheus 之前在本地校验指标名是否存在"""
+import difflib
+import threading
+import time
+from typing import FrozenSet, List, Optional
+
+from .logger import get_logger
+from .prometheus_client import PrometheusClient
+from .promql import selectors
+
+logger = get_logger("metric_index")
+
+
+class UnknownMetricError(ValueError):
+    """查询引用了不存在的指标或 label"""
+
+
+class MetricIndex:
+    """
+    单个 datasource 的指标名（以及可选的 label 名）索引
+
+    - 后台周期性地从 /api/v1/label/__name__/values 刷新，校验完全在本地完成
+    - 索引尚未加载成功时不做校验，不会因为索引不可用而拒绝查询
+    - 发现未知指标时，若索引已不是最新，先同步刷新一次再判断，避免误杀新出现的指标
+    """
+
+    # 发现未知指标时触发同步刷新的最小间隔（秒）
+    MIN_REFRESH_INTERVAL = 30
+    # "did you mean" 建议个数
+    MAX_SUGGESTIONS = 3
+
+    def __init__(self, client: PrometheusClient, refresh_interval: float = 300,
+                 label_names: bool = False):
+        """
+        初始化指标名索引
+
+        Args:
+            client: Prometheus 客户端
+            refresh_interval: 刷新间隔（秒）
+            label_names: 是否同时索引并校验 label 名
+        """
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.check_label_names = label_names
+        self.metric_names: FrozenSet[str] = frozenset()
+        self.label_names: FrozenSet[str] = frozenset()
+        self.loaded_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def refresh(self) -> bool:
+        """
+        从 Prometheus 重新加载索引
+
+        Returns:
+            是否加载成功；失败时保留旧索引
+        """
+        with self._refresh_lock:
+            names = self.client.query_label_values("__name__", retry=1, use_cache=False)
+            if not names:
+                logger.warning(f"指标名索引刷新失败或为空，保留旧索引: {self.client.base_url}")
+                return False
+            labels = self.label_names
+            if self.check_label_names:
+                labels = frozenset(self.client.query_label_names(retry=1, use_cache=False)) or labels
+            # 整体替换，读取方无需加锁
+            self.metric_names = frozenset(names)
+            self.label_names = labels
+            self.loaded_at = time.monotonic()
+            logger.info(f"指标名索引已刷新: {len(self.metric_names)} 个指标 ({self.client.base_url})")
+            return True
+
+    def start(self):
+        """启动后台刷新线程（首次加载也在后台完成，不阻塞启动）"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="metric-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"指标名索引刷新异常: {e}")
+            self._stop.wait(self.refresh_interval)
+
+    def suggest(self, name: str, candidates: FrozenSet[str]) -> List[str]:
+        """返回与 name 最接近的若干候选"""
+        return difflib.get_close_matches(name, candidates, n=self.MAX_SUGGESTIONS, cutoff=0.6)
+
+    def _unknown(self, query: str) -> List[str]:
+        """返回查询中不存在的指标名/label 名对应的错误描述"""
+        metric_names = self.metric_names
+        label_names = self.label_names
+        problems = []
+        for selector in selectors(query):
+            name = selector.metric_name
+            if name and "$" not in name and name not in metric_names:
+                message = f"未知的指标 {name}"
+                suggestions = self.suggest(name, metric_names)
+                if suggestions:
+                    message += f"，是否想查询: {', '.join(suggestions)}"
+                if message not in problems:
+                    problems.append(message)
+            if not (self.check_label_names and label_names):
+                continue
+            for matcher in selector.matchers:
+                # 只有要求 label 非空的匹配器在 label 不存在时必然查不到数据
+                if matcher.op not in ("=", "=~") or matcher.value in ("", ".*"):
+                    continue
+                if matcher.name in label_names or "$" in matcher.name:
+                    continue
+                message = f"未知的 label {matcher.name}"
+                suggestions = self.suggest(matcher.name, label_names)
+                if suggestions:
+                    message += f"，是否想使用: {', '.join(suggestions)}"
+                if message not in problems:
+                    problems.append(message)
+        return problems
+
+    def validate(self, query: str):
+        """
+        校验查询中的指标名（以及可选的 label 名）
+
+        Args:
+            query: PromQL 查询
+
+        Raises:
+            UnknownMetricError: 引用了不存在的指标/label
+        """
+        if not self.loaded:
+            return
+        problems = self._unknown(query)
+        if not problems:
+            return
+        if time.monotonic() - self.loaded_at >= self.MIN_REFRESH_INTERVAL and self.refresh():
+            problems = self._unknown(query)
+            if not problems:
+                return
+        raise UnknownMetricError("；".join(problems))
@@ -0,0 +1,101 @@
+"""指标元数据（type / unit / help）缓存：每个 datasource 一次 /api/v1/metadata 批量请求"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .logger import get_logger
+from .prometheus_client import PrometheusClient
+
+logger = get_logger("metric_metadata")
+
+# 序列名相对于指标族名（元数据的 key）可能多出的后缀：histogram/summary 的子序列、counter 的 _total
+_SUFFIXES = ("_bucket", "_count", "_sum", "_total", "_created")
+
+
+def lookup(metadata: Dict[str, List[Dict[str, str]]], name: str) -> Optional[Dict[str, str]]:
+    """
+    查找一个序列名的元数据
+
+    先按原名查找，找不到时去掉 histogram/summary/counter 的后缀再按指标族名查找。
+
+    Returns:
+        {"type", "unit", "help"}（unit 为空时省略）；没有元数据时返回 None
+    """
+    entries = metadata.get(name)
+    if not entries:
+        for suffix in _SUFFIXES:
+            if name.endswith(suffix):
+                entries = metadata.get(name[:-len(suffix)])
+                if entries:
+                    break
+    if not entries:
+        return None
+    entry = entries[0]
+    info = {"type": entry.get("type", "unknown")}
+    if entry.get("unit"):
+        info["unit"] = entry["unit"]
+    if entry.get("help"):
+        info["help"] = entry["help"]
+    return info
+
+
+class MetadataCache:
+    """
+    按 datasource 缓存 /api/v1/metadata 的结果
+
+    缓存过期后由第一个读取方同步刷新（同一客户端的并发读取只会发出一次请求）；
+    请求失败时在 RETRY_INTERVAL 内不再重试，返回旧结果或空结果。
+    """
+
+    # 请求失败后的重试间隔（秒）
+    RETRY_INTERVAL = 30
+
+    def __init__(self, ttl: float = 600):
+        """
+        初始化
+
+        Args:
+            ttl: 元数据的缓存时间（秒）
+        """
+        self.ttl = ttl
+        # id(client) -> (过期时间, 元数据)
+        self._entries: Dict[int, Tuple[float, Dict[str, List[Dict[str, str]]]]] = {}
+        self._locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, client: PrometheusClient) -> Dict[str, List[Dict[str, str]]]:
+        """获取一个 datasource 的全部元数据"""
+        key = id(client)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            # 等待锁期间可能已被其他线程刷新
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+            metadata = client.metadata(retry=1, use_cache=cached is None)
+            if metadata:
+                self._entries[key] = (time.monotonic() + self.ttl, metadata)
+                logger.info(f"指标元数据已加载: {len(metadata)} 个指标 ({client.base_url})")
+            else:
+                metadata = cached[1] if cached is not None else {}
+                self._entries[key] = (time.monotonic() + self.RETRY_INTERVAL, metadata)
+            return metadata
+
+    def describe(self, client: PrometheusClient, names: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """
+        多个序列名的元数据
+
+        Returns:
+            序列名 -> {"type", "unit", "help"}；没有元数据的名称不出现在结果中
+        """
+        metadata = self.get(client)
+        result = {}
+        for name in names:
+            info = lookup(metadata, name)
+            if info is not None:
+                result[name] = info
+        return result
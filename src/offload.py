@@ -0,0 +1,131 @@
+"""
+CPU 密集的结果处理（解析、汇总、序列化）放到进程池执行
+
+大响应的 JSON 解析与带缩进的序列化如果在事件循环中执行，会阻塞所有会话的 tool 调用和
+resource 读取；放到线程池也会因 GIL 拖慢其他线程。超过阈值的处理交给子进程，小结果仍在
+当前进程内直接处理，避免进程间传输的开销。
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import codec
+from .compare import compare_matrices
+from .histogram import analyze as analyze_histogram
+from .logger import get_logger
+from .result_store import decode_response
+from .shaping import shape_raw
+
+logger = get_logger("offload")
+
+
+# ---------------------------------------------------------------------------
+# 在子进程中执行的任务（必须是模块级函数，参数与返回值都要能 pickle）
+# ---------------------------------------------------------------------------
+
+def render_json(raw: bytes, compact: bool) -> str:
+    """把响应体按输出格式序列化"""
+    return codec.dumps(codec.RawJSON(raw), compact=compact)
+
+
+def _matrix(raw: bytes) -> List[Dict[str, Any]]:
+    return codec.loads(raw).get("data", {}).get("result", [])
+
+
+def render_comparison(current: bytes, baseline: bytes, start: float, step: float, shift: float,
+                      top: int, range_info: Dict[str, Any], compact: bool) -> Tuple[Dict[str, Any], str]:
+    """对比两个窗口的范围查询响应，返回 (汇总, 序列化结果)"""
+    comparison = compare_matrices(_matrix(current), _matrix(baseline), start, step, shift, top)
+    comparison["range"] = range_info
+    return comparison["summary"], codec.dumps(comparison, compact=compact)
+
+
+def render_histogram(raw: bytes, quantiles: Sequence[float], include_points: bool,
+                     range_info: Dict[str, Any], compact: bool) -> Tuple[int, str]:
+    """计算 bucket 序列的分位数，返回 (分组数, 序列化结果)"""
+    groups = analyze_histogram(_matrix(raw), quantiles, include_points)
+    return len(groups), codec.dumps({"range": range_info, "groups": groups}, compact=compact)
+
+
+def decode_result(raw: bytes) -> Tuple[str, List[Any], Dict[str, Any]]:
+    """解析要暂存的响应体，matrix 结果转换为 CompactSeries（见 ResultStore.add）"""
+    return decode_response(codec.loads(raw))
+
+
+class Offloader:
+    """
+    按数据量把任务分派到当前进程或进程池
+
+    进程池在第一次需要时才创建，使用 spawn 方式启动子进程（server 进程中有后台线程，
+    fork 可能复制到被其他线程持有的锁）。
+    """
+
+    def __init__(self, processes: int = 2, threshold: int = 1024 * 1024):
+        """
+        初始化
+
+        Args:
+            processes: 进程池大小；0 表示不使用进程池，大任务改在线程池中执行
+            threshold: 输入数据达到该字节数时才放到进程池/线程池
+        """
+        self.processes = processes
+        self.threshold = threshold
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"结果处理进程池已启动: {self.processes} 个进程")
+            return self._pool
+
+    async def run(self, size: int, func: Callable, *args) -> Any:
+        """
+        执行 func(*args)
+
+        Args:
+            size: 输入数据量（字节），低于阈值时直接在当前线程执行
+            func: 模块级函数
+        """
+        if size < self.threshold:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        if self.processes <= 0:
+            return await loop.run_in_executor(None, func, *args)
+        try:
+            return await loop.run_in_executor(self._get_pool(), func, *args)
+        except BrokenProcessPool as e:
+            # 子进程异常退出后进程池不可再用：下次重建，本次改在线程池中执行
+            logger.warning(f"结果处理进程池不可用，改在线程池中执行: {e}")
+            self.shutdown()
+            return await loop.run_in_executor(None, func, *args)
+
+    async def render(self, result: codec.RawJSON, budget: int = 0) -> str:
+        """
+        序列化要返回给调用方的响应体
+
+        Args:
+            result: 响应体
+            budget: 输出预算（字符数），超过时按 shaping 的规则逐步裁剪；<= 0 表示不限制
+        """
+        compact = codec.is_compact()
+        if budget > 0 and not (compact and len(result) <= budget):
+            return await self.run(len(result), shape_raw, result.raw, budget, compact)
+        if compact:
+            # 紧凑输出直接使用响应体，没有需要分流的计算
+            return result.text
+        return await self.run(len(result), render_json, result.raw, False)
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
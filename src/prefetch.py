@@ -0,0 +1,180 @@
+"""dashboard panel 查询的后台预计算"""
+import heapq
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .admission import PRIORITY_BACKGROUND, request_priority
+from .dashboard_parser import DashboardParser
+from .datasources import DatasourceRouter
+from .logger import get_logger
+from .templating import substitute
+
+logger = get_logger("prefetch")
+
+
+class PanelQuery(NamedTuple):
+    """变量替换并确定 datasource 后的 panel 查询"""
+    title: str
+    datasource: str
+    expr: str
+
+
+def dashboard_values(parser: DashboardParser, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """变量取值：dashboard 中保存的当前值，再用 overrides 覆盖"""
+    values = {
+        var.name: var.current_value
+        for var in parser.parse_variables()
+        if var.current_value is not None
+    }
+    values.update(overrides or {})
+    return values
+
+
+def panel_queries(parser: DashboardParser, router: DatasourceRouter,
+                  values: Dict[str, Any]) -> List[PanelQuery]:
+    """按变量取值展开 dashboard 中所有 panel 的查询，每个查询路由到其 datasource"""
+    queries = []
+    for metric in parser.parse_metrics():
+        expr = substitute(metric.expr, values)
+        if metric.datasource:
+            datasource = router.resolve(metric.datasource)
+        else:
+            datasource = router.route(expr)
+        queries.append(PanelQuery(metric.title, datasource, expr))
+    return queries
+
+
+class PrefetchStore:
+    """预计算结果的有界内存存储，key 为 (datasource, expr)"""
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, datasource: str, expr: str, result: Dict[str, Any], evaluated_at: Optional[float] = None):
+        """保存一个即时查询结果"""
+        with self._lock:
+            key = (datasource, expr)
+            self._entries[key] = (evaluated_at if evaluated_at is not None else time.time(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, datasource: str, expr: str, max_age: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """
+        获取不超过 max_age 秒的预计算结果
+
+        Returns:
+            (计算时间, 查询结果)；没有或已过期时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get((datasource, expr))
+            if entry is None or time.time() - entry[0] > max_age:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PanelPrefetcher:
+    """
+    按固定间隔在后台重新计算选定 dashboard 的 panel 查询
+
+    各 dashboard 的首次计算在一个间隔内错开，之后每次的间隔叠加随机抖动，避免所有查询
+    同时打到 Prometheus。查询以后台优先级经过准入控制，不会挤占交互式查询。
+    """
+
+    def __init__(self, router: DatasourceRouter, dashboards: Dict[str, DashboardParser],
+                 store: PrefetchStore, interval: float = 60, jitter: float = 0.1):
+        """
+        初始化预计算调度器
+
+        Args:
+            router: datasource 路由器
+            dashboards: dashboard 名称 -> 解析器
+            store: 结果存储
+            interval: 每个 dashboard 的计算间隔（秒）
+            jitter: 间隔的随机抖动比例（0.1 表示 ±10%）
+        """
+        self.router = router
+        self.dashboards = dashboards
+        self.store = store
+        self.interval = interval
+        self.jitter = jitter
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def max_age(self) -> float:
+        """预计算结果的有效期：略长于一个计算间隔，容忍抖动和计算耗时"""
+        return self.interval * (1 + self.jitter) + 5
+
+    def run_once(self, name: str) -> int:
+        """
+        计算一个 dashboard 的所有 panel 查询
+
+        Returns:
+            成功计算的查询数
+        """
+        parser = self.dashboards[name]
+        queries = panel_queries(parser, self.router, dashboard_values(parser))
+        done = 0
+        # 多个 panel 可能使用相同的查询
+        for datasource, expr in dict.fromkeys((query.datasource, query.expr) for query in queries):
+            if self._stop.is_set():
+                break
+            client = self.router.clients[datasource]
+            try:
+                with request_priority(PRIORITY_BACKGROUND):
+                    result = client.query(expr, retry=1)
+            except Exception as e:
+                logger.debug(f"预计算查询失败 ({name}): {e}")
+                continue
+            self.store.put(datasource, expr, result)
+            done += 1
+        logger.debug(f"预计算 dashboard {name}: {done}/{len(queries)} 个查询")
+        return done
+
+    def _next_delay(self) -> float:
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def start(self):
+        """启动后台调度线程"""
+        if self._thread is not None or not self.dashboards:
+            return
+        self._thread = threading.Thread(target=self._run, name="panel-prefetch", daemon=True)
+        self._thread.start()
+        logger.info(f"panel 预计算已启动: {', '.join(self.dashboards)}，间隔 {self.interval}s")
+
+    def stop(self):
+        """停止后台调度线程"""
+        self._stop.set()
+
+    def _run(self):
+        now = time.monotonic()
+        count = len(self.dashboards)
+        # 首次计算在一个间隔内均匀错开
+        schedule = [
+            (now + i * self.interval / count + random.uniform(0, self.jitter * self.interval / count), name)
+            for i, name in enumerate(self.dashboards)
+        ]
+        heapq.heapify(schedule)
+        while not self._stop.is_set():
+            due, name = schedule[0]
+            if self._stop.wait(max(0.0, due - time.monotonic())):
+                break
+            heapq.heappop(schedule)
+            try:
+                self.run_once(name)
+            except Exception as e:
+                logger.warning(f"预计算 dashboard {name} 异常: {e}")
+            heapq.heappush(schedule, (time.monotonic() + self._next_delay(), name))
@@ -1,35 +1,444 @@
 """Prometheus 客户端封装"""
-import json
+import socket
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
+from .admission import AdmissionController, RequestCancelled, ServerBusyError, current_priority, endpoint_for
+from .codec import RawJSON, loads as json_loads
+from .disk_cache import DiskCache
+from .remote_read import (
+    READ_HEADERS, STREAMED_CONTENT_TYPE, RawSeries, RemoteReadError, build_read_request,
+    iter_chunked_series, matchers_from_selector, parse_read_response,
+)
 from .logger import get_logger
+from .range_cache import SlidingWindowCache
+from .timeutil import parse_duration, parse_timestamp
 
 logger = get_logger("prometheus_client")
 
+# 当前线程正在使用的 CancelToken，以及当前 tool 调用的取消令牌与截止时间
+_local = threading.local()
+
+# 支持 Prometheus 端 timeout 参数（查询求值超时）的接口
+_EVALUATION_PATHS = frozenset({"/api/v1/query", "/api/v1/query_range"})
+
+
+def _format_ts(ts: float) -> str:
+    """Unix 时间戳格式化为 Prometheus API 参数"""
+    return str(int(ts)) if ts == int(ts) else repr(ts)
+
+
+class CancelToken:
+    """
+    可中断的 HTTP 请求令牌
+
+    在 activate() 作用域内发出的请求会登记其底层连接，cancel() 时直接关闭 socket，
+    使阻塞在等待响应上的线程立即失败返回，而不是等到 Prometheus 计算完成。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections = []
+        self._children = []
+        self.cancelled = False
+    
+    def child(self) -> "CancelToken":
+        """创建子令牌：本令牌取消时子令牌一并取消（子令牌可以单独取消）"""
+        token = CancelToken()
+        with self._lock:
+            if self.cancelled:
+                token.cancelled = True
+            else:
+                self._children.append(token)
+        return token
+    
+    @contextmanager
+    def activate(self):
+        """在当前线程中启用该令牌"""
+        previous = getattr(_local, "token", None)
+        _local.token = self
+        try:
+            yield self
+        finally:
+            _local.token = previous
+            with self._lock:
+                for conn in self._connections:
+                    conn._cancel_token = None
+                self._connections.clear()
+    
+    def attach(self, conn):
+        """登记正在使用的连接（由连接池在发请求前调用）"""
+        with self._lock:
+            if self.cancelled:
+                raise requests.exceptions.ConnectionError("请求已取消")
+            conn._cancel_token = self
+            self._connections.append(conn)
+    
+    def detach(self, conn):
+        """连接归还连接池时解除登记，避免中断已被其他请求复用的连接"""
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+            if getattr(conn, "_cancel_token", None) is self:
+                conn._cancel_token = None
+    
+    def cancel(self):
+        """取消令牌并中断所有已登记的连接"""
+        with self._lock:
+            self.cancelled = True
+            children, self._children = self._children, []
+            for conn in self._connections:
+                sock = getattr(conn, "sock", None)
+                if sock is None:
+                    continue
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        for child in children:
+            child.cancel()
+
+
+@contextmanager
+def call_scope(token: Optional[CancelToken] = None, deadline: Optional[float] = None):
+    """
+    设置当前线程中本次调用的取消令牌与截止时间
+
+    作用域内发出的请求在令牌取消时立即中断；有截止时间时 HTTP 超时不超过剩余时间，
+    即时/范围查询还会把剩余时间作为 timeout 参数传给 Prometheus，让其提前停止求值。
+
+    Args:
+        token: 调用的取消令牌
+        deadline: 截止时间（time.monotonic() 时刻）
+    """
+    previous = (getattr(_local, "call_token", None), getattr(_local, "deadline", None))
+    _local.call_token, _local.deadline = token, deadline
+    try:
+        yield
+    finally:
+        _local.call_token, _local.deadline = previous
+
+
+def _request_token() -> CancelToken:
+    """单次 HTTP 请求的令牌（当前调用有取消令牌时作为其子令牌）"""
+    parent = getattr(_local, "call_token", None)
+    return parent.child() if parent is not None else CancelToken()
+
+
+def _call_deadline() -> Optional[float]:
+    return getattr(_local, "deadline", None)
+
+
+class _AbortableMixin:
+    """发请求前把连接登记到当前线程的 CancelToken，归还连接时解除登记"""
+    
+    def _make_request(self, conn, *args, **kwargs):
+        token = getattr(_local, "token", None)
+        if token is not None:
+            token.attach(conn)
+        return super()._make_request(conn, *args, **kwargs)
+    
+    def _put_conn(self, conn):
+        token = getattr(conn, "_cancel_token", None)
+        if token is not None:
+            token.detach(conn)
+        return super()._put_conn(conn)
+
+
+class _AbortableHTTPConnectionPool(_AbortableMixin, HTTPConnectionPool):
+    pass
+
+
+class _AbortableHTTPSConnectionPool(_AbortableMixin, HTTPSConnectionPool):
+    pass
+
+
+class _AbortableAdapter(HTTPAdapter):
+    """使用可中断连接池的 HTTPAdapter"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _AbortableHTTPConnectionPool,
+            "https": _AbortableHTTPSConnectionPool,
+        }
+
+
+class _ReplicaStats:
+    """单个副本的延迟统计"""
+    
+    # EWMA 平滑系数
+    ALPHA = 0.2
+    
+    def __init__(self, url: str, window: int = 200):
+        self.url = url
+        self.latencies = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.lock = threading.Lock()
+    
+    def record(self, latency: float, ok: bool):
+        """记录一次请求耗时（失败或被取消的请求也计入，作为延迟下界）"""
+        with self.lock:
+            self.latencies.append(latency)
+            self.ewma = latency if self.ewma is None else self.ALPHA * latency + (1 - self.ALPHA) * self.ewma
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+    
+    def percentile(self, p: float) -> Optional[float]:
+        """最近请求耗时的 p 分位数，样本不足时返回 None"""
+        with self.lock:
+            if len(self.latencies) < 10:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    
+    def sort_key(self):
+        """副本排序键：最近失败的靠后，其余按 EWMA 延迟升序（未知延迟优先探测）"""
+        with self.lock:
+            return (self.consecutive_failures > 0, self.ewma or 0.0)
+
 
 class PrometheusClient:
     """Prometheus 客户端"""
     
-    def __init__(self, base_url: str, username: Optional[str] = None, 
-                 password: Optional[str] = None, timeout: int = 30):
+    # 副本延迟样本不足时使用的对冲延迟（秒）
+    HEDGE_COLD_DELAY = 0.5
+    
+    def __init__(self, base_url: Union[str, List[str]], username: Optional[str] = None, 
+                 password: Optional[str] = None, timeout: int = 30, pool_size: int = 20,
+                 hedge_percentile: float = 0.95, hedge_min_delay: float = 0.05,
+                 cache: Optional[DiskCache] = None, cache_ttl: float = 300, immutable_after: float = 600,
+                 admission: Optional[AdmissionController] = None, remote_read: bool = False,
+                 window_cache: Optional[SlidingWindowCache] = None):
         """
         初始化 Prometheus 客户端
         
         Args:
-            base_url: Prometheus 服务地址
+            base_url: Prometheus 服务地址；传入列表时视为同一份数据的多个 HA 副本
             username: 认证用户名（可选）
             password: 认证密码（可选）
             timeout: 请求超时时间（秒）
+            pool_size: HTTP 连接池大小（并发请求之间复用 keep-alive 连接）
+            hedge_percentile: 对冲延迟取首选副本最近耗时的该分位数
+            hedge_min_delay: 对冲延迟下限（秒）
+            cache: 磁盘缓存（可选），保存 label 值、series 元数据和历史范围查询结果
+            cache_ttl: label 值与 series 元数据的缓存时间（秒）
+            immutable_after: 结束时间早于 now - immutable_after 秒的范围查询结果视为不可变，永久缓存
+            admission: 准入控制（可选），多个客户端共享以限制发往 Prometheus 的总并发
+            remote_read: 后端是否开放 remote-read API（/api/v1/read）
+            window_cache: 滑动窗口缓存（可选），相对时间窗口的范围查询只请求增量部分
         """
-        self.base_url = base_url.rstrip('/')
+        urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        if not urls:
+            raise ValueError("base_url 不能为空")
+        self.replicas = [url.rstrip('/') for url in urls]
+        self.base_url = self.replicas[0]
         self.timeout = timeout
         self.auth = HTTPBasicAuth(username, password) if username and password else None
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self._stats = {url: _ReplicaStats(url) for url in self.replicas}
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.immutable_after = immutable_after
+        self.admission = admission
+        self.remote_read_enabled = remote_read
+        self.window_cache = window_cache
+        
+        # 所有请求共享同一个 Session，复用 TCP 连接
+        self.session = requests.Session()
+        adapter = _AbortableAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # 多副本时用于并发发送对冲请求
+        self._hedge_executor = None
+        if len(self.replicas) > 1:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=pool_size * len(self.replicas),
+                thread_name_prefix="prometheus-hedge"
+            )
+    
+    def _attempt(self, replica: str, method: str, path: str, params: Optional[Dict] = None,
+                 data: Optional[Dict] = None, token: Optional[CancelToken] = None,
+                 raw: bool = False, deadline: Optional[float] = None, priority: Optional[int] = None,
+                 admitted: bool = False) -> Union[Dict[str, Any], RawJSON]:
+        """
+        向单个副本发送一次请求，返回解析后的 JSON（raw=True 时返回未解析的 RawJSON）
+
+        每次请求（包括对冲请求）各占一个准入名额，使并发上限与实际发往 Prometheus 的请求数一致。
+
+        Args:
+            priority: 准入优先级（在发起调用的线程中确定，对冲请求在线程池中执行）
+            admitted: 调用方已为本次请求取得准入名额，请求结束后由本方法归还
+
+        Raises:
+            ServerBusyError: 准入控制排队超时
+        """
+        token = token or _request_token()
+        if self.admission is None:
+            return self._exchange(replica, method, path, params, data, token, raw, deadline)
+        endpoint = endpoint_for(path)
+        if not admitted:
+            # 排队期间调用被取消或超过截止时间时立即放弃，不占用名额
+            self.admission.acquire(endpoint, current_priority(endpoint) if priority is None else priority,
+                                   token=token, deadline=deadline)
+        try:
+            return self._exchange(replica, method, path, params, data, token, raw, deadline)
+        finally:
+            self.admission.release(endpoint)
+    
+    def _exchange(self, replica: str, method: str, path: str, params: Optional[Dict], data: Optional[Dict],
+                  token: CancelToken, raw: bool, deadline: Optional[float]) -> Union[Dict[str, Any], RawJSON]:
+        """发送请求并解析响应（不经过准入控制）"""
+        timeout = self.timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RequestCancelled("已超过调用截止时间")
+            timeout = min(timeout, remaining)
+            if path in _EVALUATION_PATHS:
+                # Prometheus 的 timeout 参数接受浮点秒数
+                params = {**(params or {}), "timeout": f"{remaining:.3f}"}
+        if token.cancelled:
+            raise RequestCancelled("请求已取消")
+        stats = self._stats[replica]
+        started = time.monotonic()
+        try:
+            with token.activate():
+                response = self.session.request(
+                    method,
+                    f"{replica}{path}",
+                    params=params,
+                    data=data,
+                    auth=self.auth,
+                    timeout=timeout
+                )
+                response.raise_for_status()
+                result = RawJSON(response.content) if raw else json_loads(response.content)
+        except Exception as e:
+            # 被取消的请求由取消方记录耗时
+            if not token.cancelled:
+                stats.record(time.monotonic() - started, ok=False)
+            if token.cancelled:
+                raise RequestCancelled("请求已取消") from e
+            if deadline is not None and time.monotonic() >= deadline:
+                raise RequestCancelled("已超过调用截止时间") from e
+            raise
+        stats.record(time.monotonic() - started, ok=True)
+        return result
+    
+    def _replica_order(self) -> List[str]:
+        """按历史延迟排序的副本列表，较快的优先"""
+        return sorted(self.replicas, key=lambda url: self._stats[url].sort_key())
+    
+    def _hedge_delay(self, replica: str) -> float:
+        """首选副本超过该时间未返回时，向下一个副本发送对冲请求"""
+        delay = self._stats[replica].percentile(self.hedge_percentile)
+        if delay is None:
+            delay = self.HEDGE_COLD_DELAY
+        return min(max(delay, self.hedge_min_delay), self.timeout)
     
-    def query(self, query: str, query_time: Optional[str] = None, retry: int = 3) -> Dict[str, Any]:
+    def _send(self, method: str, path: str, params: Optional[Dict] = None,
+              data: Optional[Dict] = None, raw: bool = False) -> Union[Dict[str, Any], RawJSON]:
+        """
+        发送请求并返回解析后的 JSON
+
+        单副本时直接请求；多副本时先请求最快的副本，超过自适应对冲延迟仍未返回则
+        向下一个副本发送相同请求，取最先成功的结果并中断其余请求。
+        对冲请求只在有空闲准入名额时发出，不排队、不挤占其他调用的名额。
+
+        Raises:
+            ServerBusyError: 准入控制排队超时
+        """
+        deadline = _call_deadline()
+        endpoint = endpoint_for(path)
+        priority = current_priority(endpoint)
+        if self._hedge_executor is None:
+            return self._attempt(self.base_url, method, path, params, data, raw=raw, deadline=deadline,
+                                 priority=priority)
+        
+        remaining = self._replica_order()
+        hedge_delay = self._hedge_delay(remaining[0])
+        pending = {}
+        errors = []
+        
+        def launch(admitted: bool = False):
+            replica = remaining.pop(0)
+            token = _request_token()
+            future = self._hedge_executor.submit(
+                self._attempt, replica, method, path, params, data, token, raw, deadline, priority, admitted
+            )
+            pending[future] = (replica, token, time.monotonic(), admitted)
+        
+        def cancel_pending():
+            now = time.monotonic()
+            for other, (other_replica, other_token, launched, admitted) in pending.items():
+                other_token.cancel()
+                if other.cancel():
+                    # 还在线程池中排队、从未执行的请求：归还已为其取得的名额，不计入副本统计
+                    if admitted:
+                        self.admission.release(endpoint)
+                    continue
+                # 被中断副本的已耗时作为延迟下界计入统计，使其在后续排序中靠后
+                self._stats[other_replica].record(now - launched, ok=True)
+        
+        launch()
+        while pending:
+            done, _ = wait(pending, timeout=hedge_delay if remaining else None, return_when=FIRST_COMPLETED)
+            if not done:
+                if self.admission is not None and not self.admission.try_acquire(endpoint):
+                    logger.debug(f"请求 {path} 超过对冲延迟 {hedge_delay:.3f}s 未返回，但没有空闲准入名额，暂不对冲")
+                    continue
+                logger.debug(f"请求 {path} 超过对冲延迟 {hedge_delay:.3f}s 未返回，向副本 {remaining[0]} 发送对冲请求")
+                launch(admitted=self.admission is not None)
+                continue
+            for future in done:
+                replica = pending.pop(future)[0]
+                try:
+                    result = future.result()
+                except (ServerBusyError, RequestCancelled):
+                    # 排队超时或调用已取消，不再故障转移
+                    cancel_pending()
+                    raise
+                except Exception as e:
+                    logger.debug(f"副本 {replica} 请求失败: {e}")
+                    errors.append(e)
+                    continue
+                # 取最先成功的结果，中断其余仍在进行的请求
+                cancel_pending()
+                return result
+            # 已返回的请求均失败，立即故障转移到下一个副本
+            if not pending and remaining:
+                launch()
+        raise errors[-1]
+    
+    def _cache_key(self, namespace: str, *parts: Any) -> Optional[str]:
+        """生成缓存 key（包含副本地址，不同后端互不干扰），未启用缓存时返回 None"""
+        if self.cache is None:
+            return None
+        return DiskCache.make_key(namespace, self.replicas, *parts)
+    
+    @staticmethod
+    def _check_status(result: Union[Dict[str, Any], RawJSON], action: str):
+        """响应 status 不是 success 时抛出异常（RawJSON 尽量不解析整个响应体）"""
+        status = result.status() if isinstance(result, RawJSON) else result.get("status")
+        if status != "success":
+            body = result.data if isinstance(result, RawJSON) else result
+            error_msg = body.get("error", "Unknown error")
+            raise Exception(f"{action}失败: {error_msg}")
+    
+    def query(self, query: str, query_time: Optional[str] = None, retry: int = 3,
+              raw: bool = False) -> Union[Dict[str, Any], RawJSON]:
         """
         执行 Prometheus 即时查询
         
@@ -37,6 +446,7 @@ class PrometheusClient:
             query: PromQL 查询语句
             query_time: 查询时间点（可选，RFC3339 或 Unix 时间戳）
             retry: 重试次数
+            raw: 返回未解析的 RawJSON（结果原样透传时省去解析与再序列化）
             
         Returns:
             查询结果字典，包含 status 和 data 字段
@@ -55,28 +465,19 @@ class PrometheusClient:
                 }
             }
         """
-        url = f"{self.base_url}/api/v1/query"
         payload = {"query": query}
         if query_time:
             payload["time"] = query_time
         
         for i in range(retry):
             try:
-                response = requests.post(
-                    url, 
-                    data=payload, 
-                    auth=self.auth, 
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                result = response.json()
-                
-                if result.get("status") != "success":
-                    error_msg = result.get("error", "Unknown error")
-                    raise Exception(f"Prometheus 查询失败: {error_msg}")
-                
+                result = self._send("POST", "/api/v1/query", data=payload, raw=raw)
+                self._check_status(result, "Prometheus 查询")
                 return result
                 
+            except (ServerBusyError, RequestCancelled):
+                # 排队超时说明 server 已经过载，重试只会加重拥塞
+                raise
             except Exception as e:
                 logger.warning(f"查询失败 (尝试 {i+1}/{retry}): {e}", exc_info=i == retry - 1)
                 if i == retry - 1:
@@ -85,7 +486,7 @@ class PrometheusClient:
                 time.sleep(1)
     
     def range_query(self, query: str, start: str, end: str, 
-                    step: str = "1m", retry: int = 3) -> Dict[str, Any]:
+                    step: str = "1m", retry: int = 3, raw: bool = False) -> Union[Dict[str, Any], RawJSON]:
         """
         执行 Prometheus 范围查询
         
@@ -95,6 +496,7 @@ class PrometheusClient:
             end: 结束时间（RFC3339 或 Unix 时间戳）
             step: 查询步长，例如 "1m"、"5m"
             retry: 重试次数
+            raw: 返回未解析的 RawJSON（结果原样透传时省去解析与再序列化）
             
         Returns:
             查询结果字典
@@ -116,7 +518,34 @@ class PrometheusClient:
                 }
             }
         """
-        url = f"{self.base_url}/api/v1/query_range"
+        # 结束时间足够早的历史数据不会再变化，可以跨进程、跨重启复用
+        cache_key = None
+        start_ts, end_ts = parse_timestamp(start), parse_timestamp(end)
+        if start_ts is not None and end_ts is not None and end_ts < time.time() - self.immutable_after:
+            cache_key = self._cache_key("range_query", query, start_ts, end_ts, step)
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                logger.debug(f"范围查询命中磁盘缓存: query={query[:100]}")
+                return RawJSON.from_data(cached) if raw else cached
+        elif self.window_cache is not None and start_ts is not None and end_ts is not None:
+            # 相对时间窗口的轮询只请求上次结果之后的增量
+            step_seconds = parse_duration(step)
+            if step_seconds and step_seconds > 0 and end_ts > start_ts:
+                result = self.window_cache.get(
+                    query, start_ts, end_ts, step_seconds,
+                    lambda fetch_start, fetch_end: self._range_query(
+                        query, _format_ts(fetch_start), _format_ts(fetch_end), step, retry)
+                )
+                return RawJSON.from_data(result) if raw else result
+        
+        result = self._range_query(query, start, end, step, retry, raw=raw)
+        if cache_key:
+            self.cache.set(cache_key, result.data if isinstance(result, RawJSON) else result)
+        return result
+    
+    def _range_query(self, query: str, start: str, end: str, step: str, retry: int,
+                     raw: bool = False) -> Union[Dict[str, Any], RawJSON]:
+        """向 Prometheus 发起范围查询（带重试，不读写缓存）"""
         payload = {
             "query": query,
             "start": start,
@@ -126,21 +555,13 @@ class PrometheusClient:
         
         for i in range(retry):
             try:
-                response = requests.post(
-                    url,
-                    data=payload,
-                    auth=self.auth,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                result = response.json()
-                
-                if result.get("status") != "success":
-                    error_msg = result.get("error", "Unknown error")
-                    raise Exception(f"Prometheus 范围查询失败: {error_msg}")
-                
+                result = self._send("POST", "/api/v1/query_range", data=payload, raw=raw)
+                self._check_status(result, "Prometheus 范围查询")
                 return result
                 
+            except (ServerBusyError, RequestCancelled):
+                # 排队超时说明 server 已经过载，重试只会加重拥塞
+                raise
             except Exception as e:
                 logger.warning(f"范围查询失败 (尝试 {i+1}/{retry}): {e}", exc_info=i == retry - 1)
                 if i == retry - 1:
@@ -149,7 +570,7 @@ class PrometheusClient:
                 time.sleep(1)
     
     def query_label_values(self, label: str, match: Optional[str] = None, 
-                          retry: int = 3) -> List[str]:
+                          retry: int = 3, use_cache: bool = True) -> List[str]:
         """
         查询指定 label 的所有可能值
         
@@ -157,6 +578,7 @@ class PrometheusClient:
             label: label 名称
             match: 可选的匹配条件，例如 'pulsar_lb_cpu_usage{service="Pulsar"}'
             retry: 重试次数
+            use_cache: 是否读取磁盘缓存（结果总会写回缓存）
             
         Returns:
             label 值列表
@@ -164,28 +586,32 @@ class PrometheusClient:
         Example:
             ["cluster1", "cluster2", "cluster3"]
         """
-        url = f"{self.base_url}/api/v1/label/{label}/values"
         params = {}
         if match:
             params["match[]"] = match
         
+        cache_key = self._cache_key("label_values", label, match)
+        if cache_key and use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         for i in range(retry):
             try:
-                response = requests.get(
-                    url,
-                    params=params,
-                    auth=self.auth,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                result = response.json()
+                result = self._send("GET", f"/api/v1/label/{label}/values", params=params)
                 
                 if result.get("status") != "success":
                     error_msg = result.get("error", "Unknown error")
                     raise Exception(f"查询 label 值失败: {error_msg}")
                 
-                return result.get("data", [])
+                values = result.get("data", [])
+                if cache_key:
+                    self.cache.set(cache_key, values, ttl=self.cache_ttl)
+                return values
                 
+            except (ServerBusyError, RequestCancelled):
+                # 排队超时说明 server 已经过载，重试只会加重拥塞
+                raise
             except Exception as e:
                 logger.warning(f"查询 label 值失败 (尝试 {i+1}/{retry}), label={label}: {e}")
                 if i == retry - 1:
@@ -194,6 +620,92 @@ class PrometheusClient:
                     return []
                 time.sleep(1)
     
+    def query_label_names(self, match: Optional[str] = None, retry: int = 3,
+                          use_cache: bool = True) -> List[str]:
+        """
+        查询所有 label 名称
+
+        Args:
+            match: 可选的匹配条件，例如 'up{job="prometheus"}'
+            retry: 重试次数
+            use_cache: 是否读取磁盘缓存（结果总会写回缓存）
+
+        Returns:
+            label 名称列表
+        """
+        params = {}
+        if match:
+            params["match[]"] = match
+
+        cache_key = self._cache_key("label_names", match)
+        if cache_key and use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        for i in range(retry):
+            try:
+                result = self._send("GET", "/api/v1/labels", params=params)
+
+                if result.get("status") != "success":
+                    error_msg = result.get("error", "Unknown error")
+                    raise Exception(f"查询 label 名称失败: {error_msg}")
+
+                names = result.get("data", [])
+                if cache_key:
+                    self.cache.set(cache_key, names, ttl=self.cache_ttl)
+                return names
+
+            except (ServerBusyError, RequestCancelled):
+                # 排队超时说明 server 已经过载，重试只会加重拥塞
+                raise
+            except Exception as e:
+                logger.warning(f"查询 label 名称失败 (尝试 {i+1}/{retry}): {e}")
+                if i == retry - 1:
+                    logger.error(f"查询 label 名称最终失败，返回空列表: match={match}")
+                    return []
+                time.sleep(1)
+
+    def metadata(self, retry: int = 3, use_cache: bool = True) -> Dict[str, List[Dict[str, str]]]:
+        """
+        一次性查询所有指标的元数据（/api/v1/metadata）
+
+        Args:
+            retry: 重试次数
+            use_cache: 是否读取磁盘缓存（结果总会写回缓存）
+
+        Returns:
+            指标名 -> [{"type": ..., "unit": ..., "help": ...}]；失败时返回空字典
+        """
+        cache_key = self._cache_key("metadata")
+        if cache_key and use_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        for i in range(retry):
+            try:
+                result = self._send("GET", "/api/v1/metadata")
+
+                if result.get("status") != "success":
+                    error_msg = result.get("error", "Unknown error")
+                    raise Exception(f"查询指标元数据失败: {error_msg}")
+
+                metadata = result.get("data") or {}
+                if cache_key:
+                    self.cache.set(cache_key, metadata, ttl=self.cache_ttl)
+                return metadata
+
+            except (ServerBusyError, RequestCancelled):
+                # 排队超时说明 server 已经过载，重试只会加重拥塞
+                raise
+            except Exception as e:
+                logger.warning(f"查询指标元数据失败 (尝试 {i+1}/{retry}): {e}")
+                if i == retry - 1:
+                    logger.error("查询指标元数据最终失败，返回空结果")
+                    return {}
+                time.sleep(1)
+
     def series(self, match: str, start: Optional[str] = None, 
                end: Optional[str] = None, retry: int = 3) -> List[Dict[str, str]]:
         """
@@ -208,33 +720,98 @@ class PrometheusClient:
         Returns:
             时间序列列表，每个元素是一个 metric 字典
         """
-        url = f"{self.base_url}/api/v1/series"
         params = {"match[]": match}
         if start:
             params["start"] = start
         if end:
             params["end"] = end
         
+        cache_key = self._cache_key("series", match, start, end)
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         for i in range(retry):
             try:
-                response = requests.get(
-                    url,
-                    params=params,
-                    auth=self.auth,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                result = response.json()
+                result = self._send("GET", "/api/v1/series", params=params)
                 
                 if result.get("status") != "success":
                     error_msg = result.get("error", "Unknown error")
                     raise Exception(f"查询时间序列失败: {error_msg}")
                 
-                return result.get("data", [])
+                series = result.get("data", [])
+                if cache_key:
+                    self.cache.set(cache_key, series, ttl=self.cache_ttl)
+                return series
                 
+            except (ServerBusyError, RequestCancelled):
+                # 排队超时说明 server 已经过载，重试只会加重拥塞
+                raise
             except Exception as e:
                 logger.warning(f"查询时间序列失败 (尝试 {i+1}/{retry}), match={match}: {e}")
                 if i == retry - 1:
                     logger.error(f"查询时间序列最终失败，返回空列表: match={match}")
                     return []
                 time.sleep(1)
+
+    def remote_read(self, selector: str, start: float, end: float) -> List[RawSeries]:
+        """
+        通过 remote-read API 获取原始样本
+
+        Prometheus 直接返回压缩的 XOR chunk，不需要逐 step 计算 PromQL，样本解码到紧凑的 array 中。
+        适合需要数周内全部样本的少量指标；不重试，副本不可用时按延迟顺序故障转移。
+
+        Args:
+            selector: 即时向量选择器，例如 'node_load1{instance="a:9100"}'
+            start: 起始时间（Unix 秒）
+            end: 结束时间（Unix 秒）
+
+        Returns:
+            时间序列列表（时间戳为毫秒）
+        """
+        body = build_read_request(matchers_from_selector(selector), int(start * 1000), int(end * 1000))
+
+        def fetch() -> List[RawSeries]:
+            errors = []
+            deadline = _call_deadline()
+            for replica in self._replica_order():
+                timeout = self.timeout
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        raise RequestCancelled("已超过调用截止时间")
+                token = _request_token()
+                if token.cancelled:
+                    raise RequestCancelled("请求已取消")
+                try:
+                    with token.activate():
+                        response = self.session.post(
+                            f"{replica}/api/v1/read",
+                            data=body,
+                            headers=READ_HEADERS,
+                            auth=self.auth,
+                            timeout=timeout,
+                            stream=True
+                        )
+                        with response:
+                            response.raise_for_status()
+                            if response.headers.get("Content-Type", "").startswith(STREAMED_CONTENT_TYPE):
+                                response.raw.decode_content = True
+                                return list(iter_chunked_series(response.raw))
+                            return parse_read_response(response.content)
+                except Exception as e:
+                    # 取消时 socket 被关闭，读取流式响应可能抛出 urllib3 的异常
+                    if token.cancelled:
+                        raise RequestCancelled("请求已取消") from e
+                    if not isinstance(e, (requests.RequestException, RemoteReadError)):
+                        raise
+                    logger.warning(f"remote-read 失败 replica={replica}, selector={selector}: {e}")
+                    errors.append(e)
+            raise errors[-1]
+
+        if self.admission is None:
+            return fetch()
+        with self.admission.admit("/api/v1/read", token=getattr(_local, "call_token", None),
+                                  deadline=_call_deadline()):
+            return fetch()
@@ -0,0 +1,749 @@
+"""
+PromQL 词法/语法分析（覆盖 Grafana dashboard 中常用的子集）
+
+解析结果是不可变的 AST，并按表达式字符串缓存，重复解析同一表达式没有额外开销。
+用于：变量查询分类（label_values/query_result 等）、从 panel expr 中提取指标名和 label
+匹配器，以及高基数保护判断查询是否经过聚合。
+"""
+import re
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple, Union
+
+
+class PromQLSyntaxError(ValueError):
+    """PromQL 语法错误"""
+
+    def __init__(self, message: str, pos: int):
+        super().__init__(f"{message} (位置 {pos})")
+        self.pos = pos
+
+
+# ---------------------------------------------------------------------------
+# 词法分析
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Token:
+    kind: str  # IDENT, NUMBER, DURATION, STRING, VARIABLE, OP, PUNCT, EOF
+    value: str
+    pos: int
+
+
+_TOKEN_SPEC = [
+    ("WS", r"\s+|#[^\n]*"),
+    # 带括号的变量后可以紧跟时长单位（[${__range_s}s]），作为一个时长整体保留
+    ("VARIABLE", r"(?:\$\{\w+(?::\w+)?\}|\[\[\w+(?::\w+)?\]\])(?:(?:ms|[smhdwy])(?!\w))?|\$\w+"),
+    ("DURATION", r"(?:\d+(?:ms|[smhdwy]))+(?!\w)"),
+    # 子查询中的 ':'（[5m:1m]、[5m:]），需在标识符之前匹配
+    ("COLON", r":(?=[\d\]$\s])"),
+    ("NUMBER", r"0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"),
+    ("STRING", r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|`[^`]*`'),
+    ("IDENT", r"[a-zA-Z_:][a-zA-Z0-9_:]*"),
+    ("OP", r"==|!=|<=|>=|=~|!~|[-+*/%^<>=]"),
+    ("PUNCT", r"[(){}\[\],@]"),
+]
+_TOKEN_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _TOKEN_SPEC))
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", '"': '"', "'": "'"}
+
+
+def _unquote(text: str) -> str:
+    """去掉引号并处理转义（未知转义保留原样）"""
+    if text[0] == "`":
+        return text[1:-1]
+    body = text[1:-1]
+    if "\\" not in body:
+        return body
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), "\\" + m.group(1)), body)
+
+
+def _quote(value: str) -> str:
+    """把字符串值格式化为 PromQL 双引号字符串"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def tokenize(expr: str) -> List[Token]:
+    """
+    把 PromQL 表达式切分为 token
+
+    Grafana 模板变量（$var、${var}、[[var]]）作为 VARIABLE token 保留。
+    """
+    tokens = []
+    pos = 0
+    length = len(expr)
+    while pos < length:
+        match = _TOKEN_RE.match(expr, pos)
+        if not match:
+            raise PromQLSyntaxError(f"无法识别的字符 {expr[pos]!r}", pos)
+        kind = match.lastgroup
+        if kind != "WS":
+            tokens.append(Token(kind, match.group(0), pos))
+        pos = match.end()
+    tokens.append(Token("EOF", "", length))
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# AST
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class LabelMatcher:
+    name: str
+    op: str  # =, !=, =~, !~
+    value: str
+
+    def to_promql(self) -> str:
+        name = self.name if re.fullmatch(r"[a-zA-Z_][a-zA-Z0-9_]*", self.name) else _quote(self.name)
+        return f"{name}{self.op}{_quote(self.value)}"
+
+
+@dataclass(frozen=True)
+class NumberLiteral:
+    value: str
+
+
+@dataclass(frozen=True)
+class StringLiteral:
+    value: str
+
+
+@dataclass(frozen=True)
+class TemplateVariable:
+    """出现在表达式位置上的 Grafana 模板变量"""
+    text: str
+
+
+@dataclass(frozen=True)
+class VectorSelector:
+    name: Optional[str]
+    matchers: Tuple[LabelMatcher, ...] = ()
+    range: Optional[str] = None  # 区间选择器，如 "5m"；非空时为 range vector
+    offset: Optional[str] = None
+    at: Optional[str] = None
+
+    @property
+    def metric_name(self) -> Optional[str]:
+        """指标名（包括 {__name__="x"} 形式）"""
+        if self.name:
+            return self.name
+        for matcher in self.matchers:
+            if matcher.name == "__name__" and matcher.op == "=":
+                return matcher.value
+        return None
+
+
+@dataclass(frozen=True)
+class Call:
+    func: str
+    args: Tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Aggregation:
+    op: str
+    expr: "Node"
+    param: Optional["Node"] = None
+    grouping: Tuple[str, ...] = ()
+    without: bool = False
+    has_grouping: bool = False
+
+
+@dataclass(frozen=True)
+class VectorMatching:
+    card: Optional[str] = None  # group_left / group_right
+    on: Optional[bool] = None  # True: on(...)，False: ignoring(...)，None: 未指定
+    labels: Tuple[str, ...] = ()
+    include: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class BinaryOp:
+    op: str
+    lhs: "Node"
+    rhs: "Node"
+    return_bool: bool = False
+    matching: Optional[VectorMatching] = None
+
+
+@dataclass(frozen=True)
+class UnaryOp:
+    op: str
+    expr: "Node"
+
+
+@dataclass(frozen=True)
+class Paren:
+    expr: "Node"
+
+
+@dataclass(frozen=True)
+class Subquery:
+    expr: "Node"
+    range: str
+    step: Optional[str] = None
+    offset: Optional[str] = None
+    at: Optional[str] = None
+
+
+Node = Union[NumberLiteral, StringLiteral, TemplateVariable, VectorSelector, Call,
+             Aggregation, BinaryOp, UnaryOp, Paren, Subquery]
+
+AGGREGATION_OPS = {
+    "sum", "min", "max", "avg", "group", "stddev", "stdvar", "count", "count_values",
+    "bottomk", "topk", "quantile", "limitk", "limit_ratio",
+}
+# 需要额外参数的聚合运算
+_PARAM_AGGREGATIONS = {"count_values", "bottomk", "topk", "quantile", "limitk", "limit_ratio"}
+
+# 二元运算优先级（数值越大优先级越高）
+_BINARY_PRECEDENCE = {
+    "or": 1,
+    "and": 2, "unless": 2,
+    "==": 3, "!=": 3, "<=": 3, "<": 3, ">=": 3, ">": 3,
+    "+": 4, "-": 4,
+    "*": 5, "/": 5, "%": 5, "atan2": 5,
+    "^": 6,
+}
+_COMPARISON_OPS = {"==", "!=", "<=", "<", ">=", ">"}
+
+
+# ---------------------------------------------------------------------------
+# 语法分析
+# ---------------------------------------------------------------------------
+
+class _Parser:
+    def __init__(self, expr: str):
+        self.expr = expr
+        self.tokens = tokenize(expr)
+        self.pos = 0
+
+    # token 工具 ----------------------------------------------------------
+
+    def peek(self, offset: int = 0) -> Token:
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def next(self) -> Token:
+        token = self.tokens[self.pos]
+        self.pos = min(self.pos + 1, len(self.tokens) - 1)
+        return token
+
+    def at(self, value: str, kind: Optional[str] = None) -> bool:
+        token = self.peek()
+        if kind and token.kind != kind:
+            return False
+        if token.kind == "IDENT":
+            return token.value.lower() == value
+        return token.value == value
+
+    def expect(self, value: str) -> Token:
+        token = self.next()
+        if token.value != value:
+            raise PromQLSyntaxError(f"期望 {value!r}，实际为 {token.value or 'EOF'!r}", token.pos)
+        return token
+
+    def error(self, message: str) -> PromQLSyntaxError:
+        return PromQLSyntaxError(message, self.peek().pos)
+
+    # 表达式 --------------------------------------------------------------
+
+    def parse(self) -> Node:
+        node = self.parse_binary(0)
+        if self.peek().kind != "EOF":
+            raise self.error(f"多余的内容 {self.peek().value!r}")
+        return node
+
+    def binary_op(self) -> Optional[str]:
+        token = self.peek()
+        if token.kind == "OP" and token.value in _BINARY_PRECEDENCE:
+            return token.value
+        if token.kind == "IDENT" and token.value.lower() in ("and", "or", "unless", "atan2"):
+            return token.value.lower()
+        return None
+
+    def parse_binary(self, min_prec: int) -> Node:
+        lhs = self.parse_unary()
+        while True:
+            op = self.binary_op()
+            if op is None or _BINARY_PRECEDENCE[op] < min_prec:
+                return lhs
+            self.next()
+            return_bool, matching = self.parse_binary_modifiers(op)
+            # ^ 为右结合，其余左结合
+            next_prec = _BINARY_PRECEDENCE[op] if op == "^" else _BINARY_PRECEDENCE[op] + 1
+            rhs = self.parse_binary(next_prec)
+            lhs = BinaryOp(op, lhs, rhs, return_bool, matching)
+
+    def parse_binary_modifiers(self, op: str) -> Tuple[bool, Optional[VectorMatching]]:
+        return_bool = False
+        if op in _COMPARISON_OPS and self.at("bool", "IDENT"):
+            self.next()
+            return_bool = True
+        on = None
+        labels: Tuple[str, ...] = ()
+        card = None
+        include: Tuple[str, ...] = ()
+        if self.at("on", "IDENT") or self.at("ignoring", "IDENT"):
+            on = self.next().value.lower() == "on"
+            labels = self.parse_label_list()
+        if self.at("group_left", "IDENT") or self.at("group_right", "IDENT"):
+            card = self.next().value.lower()
+            if self.peek().value == "(":
+                include = self.parse_label_list()
+        if on is None and card is None:
+            return return_bool, None
+        return return_bool, VectorMatching(card=card, on=on, labels=labels, include=include)
+
+    def parse_label_list(self) -> Tuple[str, ...]:
+        self.expect("(")
+        labels = []
+        while self.peek().value != ")":
+            token = self.next()
+            if token.kind in ("IDENT", "VARIABLE"):
+                # 模板变量（by ($group)）原样保留，展开后为 label 名列表
+                labels.append(token.value)
+            elif token.kind == "STRING":
+                labels.append(_unquote(token.value))
+            else:
+                raise PromQLSyntaxError(f"期望 label 名，实际为 {token.value!r}", token.pos)
+            if self.peek().value == ",":
+                self.next()
+            elif self.peek().value != ")":
+                raise self.error("label 列表中缺少 ','")
+        self.expect(")")
+        return tuple(labels)
+
+    def parse_unary(self) -> Node:
+        token = self.peek()
+        if token.kind == "OP" and token.value in ("-", "+"):
+            self.next()
+            # 一元运算优先级低于 ^，高于 * /
+            operand = self.parse_binary(_BINARY_PRECEDENCE["^"])
+            if token.value == "+":
+                return operand
+            if isinstance(operand, NumberLiteral):
+                return NumberLiteral("-" + operand.value)
+            return UnaryOp("-", operand)
+        return self.parse_postfix(self.parse_primary())
+
+    def parse_postfix(self, node: Node) -> Node:
+        while True:
+            token = self.peek()
+            if token.value == "[":
+                node = self.parse_range(node)
+            elif token.kind == "IDENT" and token.value.lower() == "offset":
+                self.next()
+                node = self.with_modifier(node, offset=self.parse_offset())
+            elif token.value == "@":
+                self.next()
+                node = self.with_modifier(node, at=self.parse_at())
+            else:
+                return node
+
+    def with_modifier(self, node: Node, **changes) -> Node:
+        if isinstance(node, (VectorSelector, Subquery)):
+            return replace(node, **changes)
+        raise self.error("offset/@ 只能用于选择器或子查询")
+
+    def parse_duration_token(self) -> str:
+        token = self.next()
+        if token.kind in ("DURATION", "NUMBER", "VARIABLE"):
+            return token.value
+        raise PromQLSyntaxError(f"期望时长，实际为 {token.value or 'EOF'!r}", token.pos)
+
+    def parse_offset(self) -> str:
+        if self.peek().value == "-":
+            self.next()
+            return "-" + self.parse_duration_token()
+        return self.parse_duration_token()
+
+    def parse_at(self) -> str:
+        token = self.next()
+        if token.kind == "IDENT" and token.value in ("start", "end"):
+            self.expect("(")
+            self.expect(")")
+            return f"{token.value}()"
+        if token.kind in ("NUMBER", "VARIABLE"):
+            return token.value
+        raise PromQLSyntaxError(f"@ 之后应为时间戳，实际为 {token.value!r}", token.pos)
+
+    def parse_range(self, node: Node) -> Node:
+        self.expect("[")
+        range_ = self.parse_duration_token()
+        # 子查询 [range:step]
+        if self.peek().kind == "COLON":
+            self.next()
+            step = None
+            if self.peek().value != "]":
+                step = self.parse_duration_token()
+            self.expect("]")
+            return Subquery(node, range_, step)
+        self.expect("]")
+        if isinstance(node, VectorSelector) and node.range is None and node.offset is None:
+            return replace(node, range=range_)
+        raise PromQLSyntaxError("区间选择器只能用于即时向量选择器", self.peek().pos)
+
+    def parse_primary(self) -> Node:
+        token = self.peek()
+        if token.kind == "NUMBER":
+            self.next()
+            return NumberLiteral(token.value)
+        if token.kind == "DURATION":
+            # Prometheus 3 允许在数值位置使用时长
+            self.next()
+            return NumberLiteral(token.value)
+        if token.kind == "STRING":
+            self.next()
+            return StringLiteral(_unquote(token.value))
+        if token.kind == "VARIABLE":
+            self.next()
+            if self.peek().value == "{":
+                return VectorSelector(token.value, self.parse_matchers())
+            return TemplateVariable(token.value)
+        if token.value == "(":
+            self.next()
+            inner = self.parse_binary(0)
+            self.expect(")")
+            return Paren(inner)
+        if token.value == "{":
+            return self.parse_selector(None)
+        if token.kind == "IDENT":
+            name = token.value
+            lowered = name.lower()
+            following = self.peek(1)
+            if lowered in AGGREGATION_OPS and (following.value == "(" or following.value.lower() in ("by", "without")):
+                return self.parse_aggregation()
+            if following.value == "(":
+                return self.parse_call()
+            if lowered in ("inf", "nan"):
+                self.next()
+                return NumberLiteral(name)
+            self.next()
+            return self.parse_selector(name)
+        raise self.error(f"无法解析的表达式开头 {token.value or 'EOF'!r}")
+
+    def parse_selector(self, name: Optional[str]) -> VectorSelector:
+        matchers: Tuple[LabelMatcher, ...] = ()
+        if self.peek().value == "{":
+            matchers = self.parse_matchers()
+        # {"metric.name"} 形式的 UTF-8 指标名
+        if name is None:
+            for matcher in matchers:
+                if matcher.op == "" and matcher.name:
+                    name = matcher.name
+            matchers = tuple(m for m in matchers if m.op)
+        if name is None and not matchers:
+            raise self.error("向量选择器至少需要指标名或一个 label 匹配器")
+        return VectorSelector(name, matchers)
+
+    def parse_matchers(self) -> Tuple[LabelMatcher, ...]:
+        self.expect("{")
+        matchers = []
+        while self.peek().value != "}":
+            token = self.next()
+            if token.kind == "IDENT":
+                label = token.value
+            elif token.kind == "STRING":
+                label = _unquote(token.value)
+                if self.peek().value in (",", "}"):
+                    matchers.append(LabelMatcher(label, "", ""))
+                    if self.peek().value == ",":
+                        self.next()
+                    continue
+            else:
+                raise PromQLSyntaxError(f"期望 label 名，实际为 {token.value!r}", token.pos)
+            op = self.next()
+            if op.kind != "OP" or op.value not in ("=", "!=", "=~", "!~"):
+                raise PromQLSyntaxError(f"无效的匹配运算符 {op.value!r}", op.pos)
+            value = self.next()
+            if value.kind != "STRING":
+                raise PromQLSyntaxError(f"label 值必须是字符串，实际为 {value.value!r}", value.pos)
+            matchers.append(LabelMatcher(label, op.value, _unquote(value.value)))
+            if self.peek().value == ",":
+                self.next()
+            elif self.peek().value != "}":
+                raise self.error("label 匹配器之间缺少 ','")
+        self.expect("}")
+        return tuple(matchers)
+
+    def parse_args(self) -> Tuple[Node, ...]:
+        self.expect("(")
+        args = []
+        while self.peek().value != ")":
+            args.append(self.parse_binary(0))
+            if self.peek().value == ",":
+                self.next()
+            elif self.peek().value != ")":
+                raise self.error("参数之间缺少 ','")
+        self.expect(")")
+        return tuple(args)
+
+    def parse_call(self) -> Call:
+        name = self.next().value
+        return Call(name, self.parse_args())
+
+    def parse_aggregation(self) -> Aggregation:
+        op = self.next().value.lower()
+        grouping: Tuple[str, ...] = ()
+        without = False
+        has_grouping = False
+        if self.peek().kind == "IDENT" and self.peek().value.lower() in ("by", "without"):
+            without = self.next().value.lower() == "without"
+            grouping = self.parse_label_list()
+            has_grouping = True
+        args = self.parse_args()
+        if not has_grouping and self.peek().kind == "IDENT" and self.peek().value.lower() in ("by", "without"):
+            without = self.next().value.lower() == "without"
+            grouping = self.parse_label_list()
+            has_grouping = True
+        if op in _PARAM_AGGREGATIONS:
+            if len(args) != 2:
+                raise self.error(f"{op} 需要 2 个参数")
+            param, expr = args
+        else:
+            if len(args) != 1:
+                raise self.error(f"{op} 需要 1 个参数")
+            param, expr = None, args[0]
+        return Aggregation(op, expr, param, grouping, without, has_grouping)
+
+
+@lru_cache(maxsize=4096)
+def parse(expr: str) -> Node:
+    """
+    解析 PromQL 表达式（结果按表达式字符串缓存）
+
+    Args:
+        expr: PromQL 表达式，可包含 Grafana 模板变量
+
+    Returns:
+        AST 根节点
+
+    Raises:
+        PromQLSyntaxError: 语法错误
+    """
+    return _Parser(expr).parse()
+
+
+def try_parse(expr: str) -> Optional[Node]:
+    """解析 PromQL，语法错误时返回 None"""
+    try:
+        return parse(expr)
+    except PromQLSyntaxError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# 遍历与提取
+# ---------------------------------------------------------------------------
+
+def children(node: Node) -> Tuple[Node, ...]:
+    """节点的直接子节点"""
+    if isinstance(node, Call):
+        return node.args
+    if isinstance(node, Aggregation):
+        return (node.param, node.expr) if node.param is not None else (node.expr,)
+    if isinstance(node, BinaryOp):
+        return (node.lhs, node.rhs)
+    if isinstance(node, (UnaryOp, Paren, Subquery)):
+        return (node.expr,)
+    return ()
+
+
+def walk(node: Node) -> Iterator[Node]:
+    """深度优先遍历所有节点"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(reversed(children(current)))
+
+
+@lru_cache(maxsize=4096)
+def selectors(expr: str) -> Tuple[VectorSelector, ...]:
+    """表达式中的所有向量选择器（语法错误时返回空）"""
+    node = try_parse(expr)
+    if node is None:
+        return ()
+    return tuple(n for n in walk(node) if isinstance(n, VectorSelector))
+
+
+def metric_names(expr: str) -> List[str]:
+    """
+    表达式中引用的指标名（按出现顺序去重）
+
+    Args:
+        expr: PromQL 表达式
+
+    Returns:
+        指标名列表；语法错误时返回空列表
+    """
+    names = []
+    for selector in selectors(expr):
+        name = selector.metric_name
+        if name and not name.startswith("$") and name not in names:
+            names.append(name)
+    return names
+
+
+def unwrap_parens(node: Node) -> Node:
+    """去掉最外层的括号"""
+    while isinstance(node, Paren):
+        node = node.expr
+    return node
+
+
+# ---------------------------------------------------------------------------
+# 序列化与改写
+# ---------------------------------------------------------------------------
+
+def _modifiers(offset: Optional[str], at: Optional[str]) -> str:
+    text = ""
+    if offset:
+        text += f" offset {offset}"
+    if at:
+        text += f" @ {at}"
+    return text
+
+
+def to_promql(node: Node) -> str:
+    """把 AST 序列化为 PromQL 字符串"""
+    if isinstance(node, NumberLiteral):
+        return node.value
+    if isinstance(node, StringLiteral):
+        return _quote(node.value)
+    if isinstance(node, TemplateVariable):
+        return node.text
+    if isinstance(node, VectorSelector):
+        text = ""
+        if node.name and re.fullmatch(r"[a-zA-Z_:$][\w:${}]*", node.name):
+            text = node.name
+        matchers = list(node.matchers)
+        if node.name and not text:
+            matchers.insert(0, LabelMatcher("__name__", "=", node.name))
+        if matchers or not text:
+            text += "{" + ", ".join(m.to_promql() for m in matchers) + "}"
+        if node.range:
+            text += f"[{node.range}]"
+        return text + _modifiers(node.offset, node.at)
+    if isinstance(node, Call):
+        return f"{node.func}(" + ", ".join(to_promql(arg) for arg in node.args) + ")"
+    if isinstance(node, Aggregation):
+        text = node.op
+        if node.has_grouping:
+            text += f" {'without' if node.without else 'by'} (" + ", ".join(node.grouping) + ") "
+        args = [to_promql(node.expr)]
+        if node.param is not None:
+            args.insert(0, to_promql(node.param))
+        return f"{text}(" + ", ".join(args) + ")"
+    if isinstance(node, BinaryOp):
+        text = f"{to_promql(node.lhs)} {node.op}"
+        if node.return_bool:
+            text += " bool"
+        matching = node.matching
+        if matching:
+            if matching.on is not None:
+                text += f" {'on' if matching.on else 'ignoring'}(" + ", ".join(matching.labels) + ")"
+            if matching.card:
+                text += f" {matching.card}"
+                if matching.include:
+                    text += "(" + ", ".join(matching.include) + ")"
+        return f"{text} {to_promql(node.rhs)}"
+    if isinstance(node, UnaryOp):
+        return f"{node.op}{to_promql(node.expr)}"
+    if isinstance(node, Paren):
+        return f"({to_promql(node.expr)})"
+    if isinstance(node, Subquery):
+        step = node.step or ""
+        return f"{to_promql(node.expr)}[{node.range}:{step}]" + _modifiers(node.offset, node.at)
+    raise TypeError(f"未知的节点类型: {type(node).__name__}")
+
+
+# ---------------------------------------------------------------------------
+# Grafana 变量查询
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class VariableQuery:
+    """Grafana Prometheus 变量查询的分类结果"""
+    kind: str  # label_values / label_names / metrics / promql
+    label: Optional[str] = None  # label_values 的 label 名
+    match: Optional[str] = None  # series 选择器（match[] 参数）
+    regex: Optional[str] = None  # metrics() 的过滤正则
+    expr: Optional[str] = None  # 需要执行的 PromQL（promql 类型）
+
+
+_METRICS_QUERY = re.compile(r"metrics\((.*)\)", re.DOTALL)
+
+
+def _call_arg_sources(expr: str) -> List[str]:
+    """
+    顶层函数调用各参数的原始文本
+
+    改写查询时保留用户原文（引号风格、转义等），避免序列化带来的差异。
+    """
+    tokens = tokenize(expr)
+    args = []
+    depth = 0
+    start = None
+    for token in tokens:
+        if token.value in ("(", "{", "["):
+            depth += 1
+            if depth == 1:
+                start = token.pos + 1
+        elif token.value in (")", "}", "]"):
+            depth -= 1
+            if depth == 0 and start is not None:
+                args.append(expr[start:token.pos].strip())
+                break
+        elif token.value == "," and depth == 1:
+            args.append(expr[start:token.pos].strip())
+            start = token.pos + 1
+    return [arg for arg in args if arg]
+
+
+def _selector_name(node: Node) -> Optional[str]:
+    node = unwrap_parens(node)
+    if isinstance(node, VectorSelector) and not node.matchers and not node.range:
+        return node.name
+    if isinstance(node, (StringLiteral, TemplateVariable)):
+        return node.value if isinstance(node, StringLiteral) else node.text
+    return None
+
+
+@lru_cache(maxsize=1024)
+def classify_variable_query(query: str) -> VariableQuery:
+    """
+    识别 Grafana 变量查询的类型
+
+    支持 label_values(label)、label_values(selector, label)、label_names([selector])、
+    metrics(regex)、query_result(expr)，其余按普通 PromQL 处理。
+
+    Args:
+        query: 变量查询语句
+
+    Returns:
+        VariableQuery
+    """
+    # metrics() 的参数是未加引号的正则，不是合法的 PromQL，单独处理
+    metrics_match = _METRICS_QUERY.fullmatch(query.strip())
+    if metrics_match:
+        return VariableQuery("metrics", label="__name__", regex=metrics_match.group(1).strip() or None)
+    query = query.strip()
+    node = try_parse(query)
+    if node is None:
+        return VariableQuery("promql", expr=query)
+    if isinstance(node, Call):
+        func = node.func.lower()
+        args = node.args
+        sources = _call_arg_sources(query)
+        if func == "label_values" and len(args) == 1 and _selector_name(args[0]):
+            return VariableQuery("label_values", label=_selector_name(args[0]))
+        if func == "label_values" and len(args) == 2 and _selector_name(args[1]):
+            return VariableQuery("label_values", label=_selector_name(args[1]), match=sources[0])
+        if func == "label_names":
+            return VariableQuery("label_names", match=sources[0] if args else None)
+        if func == "query_result" and len(args) == 1:
+            # VictoriaMetrics/Grafana 的 query_result(...) 包装，标准 Prometheus 不支持，只执行内层 PromQL
+            return VariableQuery("promql", expr=sources[0])
+    return VariableQuery("promql", expr=query)
@@ -0,0 +1,164 @@
+"""相对时间窗口（"最近 N 小时"）范围查询的增量缓存"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+from .logger import get_logger
+from .series_store import CompactSeries, LabelInterner, to_matrix
+
+logger = get_logger("range_cache")
+
+# 浮点时间戳比较的容差（秒）
+_EPSILON = 1e-6
+
+
+class _WindowEntry:
+    """一个 (query, step) 的缓存窗口：每条序列一个按时间排序的紧凑缓冲"""
+
+    __slots__ = ("start", "last", "series", "lock")
+
+    def __init__(self):
+        self.start = 0.0  # 窗口起点（即第一个求值时间点）
+        self.last = 0.0  # 最后一个求值时间点
+        self.series: "OrderedDict[Tuple, CompactSeries]" = OrderedDict()
+        self.lock = threading.Lock()
+
+
+def _series_key(metric: Dict[str, str]) -> Tuple:
+    return tuple(sorted(metric.items()))
+
+
+def _last_step(start: float, end: float, step: float) -> float:
+    """Prometheus 在 start + k * step <= end 的时间点上求值，返回最后一个求值点"""
+    return start + int((end - start) / step + _EPSILON) * step
+
+
+class SlidingWindowCache:
+    """
+    滑动窗口范围查询缓存
+
+    同一查询按相同 step 反复请求"最近 N 小时"时，只向 Prometheus 请求上次缓存的最后一个
+    求值点之后的数据（外加 overlap_steps 个 step 的重叠，以覆盖迟到的样本），合并进每条
+    序列的缓冲区并丢弃窗口之外的旧点。上游开销与请求间隔成正比，而不是与窗口长度成正比。
+    """
+
+    def __init__(self, max_entries: int = 128, overlap_steps: int = 2):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最多缓存的 (query, step) 窗口数，超出后淘汰最久未使用的
+            overlap_steps: 增量请求与已缓存数据重叠的 step 数
+        """
+        self.max_entries = max_entries
+        self.overlap_steps = overlap_steps
+        self._entries: "OrderedDict[Tuple[str, float], _WindowEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._labels = LabelInterner()
+
+    def _entry(self, key: Tuple[str, float]) -> _WindowEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _WindowEntry()
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get(self, query: str, start: float, end: float, step: float,
+            fetch: Callable[[float, float], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        获取范围查询结果，能复用缓存时只请求增量部分
+
+        Args:
+            query: PromQL 查询
+            start: 起始时间（Unix 秒）
+            end: 结束时间（Unix 秒）
+            step: 步长（秒）
+            fetch: fetch(start, end) 向 Prometheus 发起范围查询并返回解析后的响应
+
+        Returns:
+            Prometheus 范围查询响应
+        """
+        entry = self._entry((query, step))
+        with entry.lock:
+            if not self._reusable(entry, start, end, step):
+                result = fetch(start, end)
+                self._replace(entry, result, start, end, step)
+                return result
+
+            fetch_start = max(start, entry.last - self.overlap_steps * step)
+            tail = fetch(fetch_start, end)
+            self._merge(entry, tail, start, fetch_start)
+            entry.start = start
+            entry.last = _last_step(start, end, step)
+            logger.debug(
+                f"滑动窗口增量查询: query={query[:80]}, 请求 {end - fetch_start:.0f}s / 窗口 {end - start:.0f}s"
+            )
+            return self._build(entry, tail)
+
+    @staticmethod
+    def _reusable(entry: _WindowEntry, start: float, end: float, step: float) -> bool:
+        """窗口有交集、求值时间点对齐且向后滑动时才能增量更新"""
+        if not entry.series and entry.last == 0:
+            return False
+        if not (entry.start - _EPSILON <= start <= entry.last + _EPSILON and end >= entry.last):
+            return False
+        offset = (start - entry.start) / step
+        return abs(offset - round(offset)) < _EPSILON
+
+    @staticmethod
+    def _is_matrix(result: Dict[str, Any]) -> bool:
+        return result.get("status") == "success" and result.get("data", {}).get("resultType") == "matrix"
+
+    def _replace(self, entry: _WindowEntry, result: Dict[str, Any], start: float, end: float, step: float):
+        entry.series.clear()
+        if not self._is_matrix(result):
+            entry.last = 0.0
+            return
+        for item in result["data"]["result"]:
+            metric = item.get("metric", {})
+            entry.series[_series_key(metric)] = CompactSeries.from_pairs(metric, item.get("values", []), self._labels)
+        entry.start = start
+        entry.last = _last_step(start, end, step)
+
+    def _merge(self, entry: _WindowEntry, tail: Dict[str, Any], start: float, fetch_start: float):
+        if not self._is_matrix(tail):
+            raise ValueError("增量范围查询返回了非 matrix 结果")
+        # 丢弃将被重新获取的尾部和滑出窗口的头部
+        for series in entry.series.values():
+            series.drop_from(fetch_start)
+            series.drop_before(start)
+        for item in tail["data"]["result"]:
+            metric = item.get("metric", {})
+            key = _series_key(metric)
+            if key in entry.series:
+                entry.series[key].extend(item.get("values", []))
+            else:
+                entry.series[key] = CompactSeries.from_pairs(metric, item.get("values", []), self._labels)
+        for key in [key for key, series in entry.series.items() if not series]:
+            del entry.series[key]
+
+    @staticmethod
+    def _build(entry: _WindowEntry, tail: Dict[str, Any]) -> Dict[str, Any]:
+        result = {
+            "status": "success",
+            "data": {
+                "resultType": "matrix",
+                "result": to_matrix(entry.series.values()),
+            },
+        }
+        for extra in ("warnings", "infos"):
+            if extra in tail:
+                result[extra] = tail[extra]
+        return result
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
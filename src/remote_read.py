@@ -0,0 +1,611 @@
+"""
+Prometheus remote-read API（protobuf + snappy，流式 XOR chunk）的编解码
+
+用于长时间窗口的原始样本批量获取：Prometheus 不需要逐个 step 计算 PromQL，
+响应直接是压缩的 XOR chunk，解码后放进紧凑的 array 中，不经过 JSON 字符串。
+
+不依赖 protobuf 代码生成；python-snappy、crc32c 可选，未安装时使用纯 Python 实现。
+"""
+import struct
+from array import array
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from .promql import VectorSelector, parse, unwrap_parens
+
+try:  # 可选依赖
+    import snappy as _snappy
+except ImportError:  # pragma: no cover - 取决于环境
+    _snappy = None
+
+try:  # 可选依赖
+    import crc32c as _crc32c
+except ImportError:  # pragma: no cover - 取决于环境
+    _crc32c = None
+
+# remote-read 请求头
+READ_HEADERS = {
+    "Content-Encoding": "snappy",
+    "Content-Type": "application/x-protobuf",
+    "Accept": "application/x-streamed-protobuf; proto=prometheus.ChunkedReadResponse",
+    "X-Prometheus-Remote-Read-Version": "0.1.0",
+}
+STREAMED_CONTENT_TYPE = "application/x-streamed-protobuf"
+
+# prompb.LabelMatcher.Type
+MATCH_EQ, MATCH_NEQ, MATCH_RE, MATCH_NRE = 0, 1, 2, 3
+_MATCHER_TYPES = {"=": MATCH_EQ, "!=": MATCH_NEQ, "=~": MATCH_RE, "!~": MATCH_NRE}
+# prompb.ReadRequest.ResponseType
+RESPONSE_SAMPLES, RESPONSE_STREAMED_XOR_CHUNKS = 0, 1
+# prompb.Chunk.Encoding
+CHUNK_XOR = 1
+
+# 单帧上限，防止异常响应导致一次分配过多内存
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class RemoteReadError(Exception):
+    """remote-read 响应无法解码"""
+
+
+@dataclass
+class RawSeries:
+    """一条时间序列的原始样本（时间戳为毫秒）"""
+    labels: Dict[str, str]
+    timestamps: array = field(default_factory=lambda: array("q"))
+    values: array = field(default_factory=lambda: array("d"))
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+
+# ---------------------------------------------------------------------------
+# protobuf wire format
+# ---------------------------------------------------------------------------
+
+def _encode_varint(value: int) -> bytes:
+    if value < 0:
+        value += 1 << 64
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _decode_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise RemoteReadError("varint 被截断")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 64:
+            raise RemoteReadError("varint 过长")
+
+
+def _to_int64(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _field_varint(number: int, value: int) -> bytes:
+    return _encode_varint(number << 3) + _encode_varint(value)
+
+
+def _field_bytes(number: int, payload: bytes) -> bytes:
+    return _encode_varint((number << 3) | 2) + _encode_varint(len(payload)) + payload
+
+
+def _iter_fields(buf: bytes) -> Iterator[Tuple[int, int, object]]:
+    """遍历 protobuf 消息的字段，返回 (字段号, wire type, 值)"""
+    pos = 0
+    length = len(buf)
+    while pos < length:
+        key, pos = _decode_varint(buf, pos)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = _decode_varint(buf, pos)
+        elif wire_type == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            size, pos = _decode_varint(buf, pos)
+            value = buf[pos:pos + size]
+            pos += size
+        elif wire_type == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        else:
+            raise RemoteReadError(f"不支持的 wire type: {wire_type}")
+        if pos > length:
+            raise RemoteReadError("protobuf 消息被截断")
+        yield number, wire_type, value
+
+
+# ---------------------------------------------------------------------------
+# snappy（block 格式）与 CRC32C
+# ---------------------------------------------------------------------------
+
+def snappy_compress(data: bytes) -> bytes:
+    """snappy block 压缩；未安装 python-snappy 时只输出 literal（合法但不压缩）"""
+    if _snappy is not None:
+        return _snappy.compress(data)
+    out = bytearray(_encode_varint(len(data)))
+    for start in range(0, len(data), 65536):
+        chunk = data[start:start + 65536]
+        size = len(chunk) - 1
+        if size < 60:
+            out.append(size << 2)
+        elif size < 256:
+            out += bytes((60 << 2, size))
+        else:
+            out += bytes((61 << 2,)) + size.to_bytes(2, "little")
+        out += chunk
+    return bytes(out)
+
+
+def snappy_decompress(data: bytes) -> bytes:
+    """snappy block 解压"""
+    if _snappy is not None:
+        return _snappy.uncompress(data)
+    expected, pos = _decode_varint(data, 0)
+    out = bytearray()
+    length = len(data)
+    while pos < length:
+        tag = data[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:
+            size = tag >> 2
+            if size >= 60:
+                extra = size - 59
+                size = int.from_bytes(data[pos:pos + extra], "little")
+                pos += extra
+            size += 1
+            out += data[pos:pos + size]
+            pos += size
+            continue
+        if kind == 1:
+            size = ((tag >> 2) & 7) + 4
+            offset = ((tag >> 5) << 8) | data[pos]
+            pos += 1
+        elif kind == 2:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 2], "little")
+            pos += 2
+        else:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 4], "little")
+            pos += 4
+        if offset == 0 or offset > len(out):
+            raise RemoteReadError("snappy 数据损坏")
+        start = len(out) - offset
+        if offset >= size:
+            out += out[start:start + size]
+        else:
+            # 重叠复制（重复模式）
+            for i in range(size):
+                out.append(out[start + i])
+    if len(out) != expected:
+        raise RemoteReadError("snappy 解压长度不符")
+    return bytes(out)
+
+
+_CRC32C_TABLE: Optional[List[int]] = None
+
+
+def crc32c(data: bytes) -> int:
+    """CRC32C（Castagnoli）校验和"""
+    if _crc32c is not None:
+        return _crc32c.crc32c(data)
+    global _CRC32C_TABLE
+    if _CRC32C_TABLE is None:
+        table = []
+        for i in range(256):
+            crc = i
+            for _ in range(8):
+                crc = (crc >> 1) ^ 0x82F63B78 if crc & 1 else crc >> 1
+            table.append(crc)
+        _CRC32C_TABLE = table
+    table = _CRC32C_TABLE
+    crc = 0xFFFFFFFF
+    for byte in data:
+        crc = table[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+# ---------------------------------------------------------------------------
+# XOR chunk（Gorilla 编码）
+# ---------------------------------------------------------------------------
+
+class _BitReader:
+    def __init__(self, data: bytes):
+        self.value = int.from_bytes(data, "big")
+        self.size = len(data) * 8
+        self.pos = 0
+
+    def read(self, nbits: int) -> int:
+        end = self.pos + nbits
+        if end > self.size:
+            raise RemoteReadError("XOR chunk 被截断")
+        self.pos = end
+        return (self.value >> (self.size - end)) & ((1 << nbits) - 1)
+
+    def read_uvarint(self) -> int:
+        result = 0
+        shift = 0
+        while True:
+            byte = self.read(8)
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def read_varint(self) -> int:
+        value = self.read_uvarint()
+        return (value >> 1) ^ -(value & 1)
+
+
+class _BitWriter:
+    def __init__(self):
+        self.value = 0
+        self.size = 0
+
+    def write(self, bits: int, nbits: int):
+        self.value = (self.value << nbits) | (bits & ((1 << nbits) - 1))
+        self.size += nbits
+
+    def write_uvarint(self, value: int):
+        for byte in _encode_varint(value):
+            self.write(byte, 8)
+
+    def write_varint(self, value: int):
+        self.write_uvarint((value << 1) ^ (value >> 63))
+
+    def getvalue(self) -> bytes:
+        padding = -self.size % 8
+        return (self.value << padding).to_bytes((self.size + padding) // 8, "big")
+
+
+# delta-of-delta 的分桶：(前缀, 前缀位数, 数值位数)
+_DOD_BUCKETS = ((0b10, 2, 14), (0b110, 3, 17), (0b1110, 4, 20))
+
+
+def _float_bits(value: float) -> int:
+    return struct.unpack(">Q", struct.pack(">d", value))[0]
+
+
+def _bits_float(bits: int) -> float:
+    return struct.unpack(">d", bits.to_bytes(8, "big"))[0]
+
+
+def decode_xor_chunk(data: bytes, timestamps: array, values: array):
+    """
+    解码 Prometheus XOR chunk，样本追加到 timestamps（毫秒）和 values
+
+    Args:
+        data: chunk 数据（前 2 字节为样本数）
+        timestamps: array('q')
+        values: array('d')
+    """
+    if len(data) < 2:
+        raise RemoteReadError("XOR chunk 过短")
+    count = int.from_bytes(data[:2], "big")
+    if count == 0:
+        return
+    reader = _BitReader(data[2:])
+    ts = reader.read_varint()
+    bits = reader.read(64)
+    timestamps.append(ts)
+    values.append(_bits_float(bits))
+    delta = 0
+    leading = trailing = 0
+    for index in range(1, count):
+        if index == 1:
+            delta = reader.read_uvarint()
+        else:
+            prefix = 0
+            size = 0
+            for _ in range(4):
+                prefix = (prefix << 1) | reader.read(1)
+                if not prefix & 1:
+                    break
+            if prefix == 0:
+                dod = 0
+            elif prefix == 0b1111:
+                dod = _to_int64(reader.read(64))
+            else:
+                size = {0b10: 14, 0b110: 17, 0b1110: 20}[prefix]
+                dod = reader.read(size)
+                if dod > 1 << (size - 1):
+                    dod -= 1 << size
+            delta += dod
+        ts += delta
+        # 值：与前一个值 XOR
+        if reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                significant = reader.read(6) or 64
+                trailing = 64 - leading - significant
+            significant = 64 - leading - trailing
+            bits ^= reader.read(significant) << trailing
+        timestamps.append(ts)
+        values.append(_bits_float(bits))
+
+
+def encode_xor_chunk(timestamps: List[int], values: List[float]) -> bytes:
+    """把样本编码为 Prometheus XOR chunk（用于测试和 Mock 服务）"""
+    writer = _BitWriter()
+    prev_ts = prev_delta = 0
+    prev_bits = 0
+    leading = trailing = None
+    for index, (ts, value) in enumerate(zip(timestamps, values)):
+        bits = _float_bits(value)
+        if index == 0:
+            writer.write_varint(ts)
+            writer.write(bits, 64)
+            prev_ts, prev_bits = ts, bits
+            continue
+        delta = ts - prev_ts
+        if index == 1:
+            writer.write_uvarint(delta)
+        else:
+            dod = delta - prev_delta
+            if dod == 0:
+                writer.write(0, 1)
+            else:
+                for prefix, prefix_bits, size in _DOD_BUCKETS:
+                    if -((1 << (size - 1)) - 1) <= dod <= 1 << (size - 1):
+                        writer.write(prefix, prefix_bits)
+                        writer.write(dod, size)
+                        break
+                else:
+                    writer.write(0b1111, 4)
+                    writer.write(dod, 64)
+        xor = bits ^ prev_bits
+        if xor == 0:
+            writer.write(0, 1)
+        else:
+            writer.write(1, 1)
+            new_leading = min(64 - xor.bit_length(), 31)
+            new_trailing = (xor & -xor).bit_length() - 1
+            if leading is not None and new_leading >= leading and new_trailing >= trailing:
+                writer.write(0, 1)
+                writer.write(xor >> trailing, 64 - leading - trailing)
+            else:
+                leading, trailing = new_leading, new_trailing
+                significant = 64 - leading - trailing
+                writer.write(1, 1)
+                writer.write(leading, 5)
+                writer.write(significant & 63, 6)
+                writer.write(xor >> trailing, significant)
+        prev_ts, prev_delta, prev_bits = ts, delta, bits
+    return len(timestamps).to_bytes(2, "big") + writer.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# 请求与响应
+# ---------------------------------------------------------------------------
+
+def matchers_from_selector(selector: str) -> List[Tuple[int, str, str]]:
+    """
+    把 PromQL 向量选择器转换为 remote-read 的 label 匹配器
+
+    Args:
+        selector: 例如 'node_cpu_seconds_total{mode!="idle"}'
+
+    Returns:
+        [(匹配类型, label 名, 值), ...]
+    """
+    node = unwrap_parens(parse(selector))
+    if not isinstance(node, VectorSelector) or node.range or node.offset or node.at:
+        raise ValueError(f"remote-read 只支持即时向量选择器: {selector}")
+    matchers = []
+    if node.name:
+        matchers.append((MATCH_EQ, "__name__", node.name))
+    for matcher in node.matchers:
+        matchers.append((_MATCHER_TYPES[matcher.op], matcher.name, matcher.value))
+    return matchers
+
+
+def build_read_request(matchers: List[Tuple[int, str, str]], start_ms: int, end_ms: int,
+                       streamed: bool = True) -> bytes:
+    """构造 snappy 压缩的 prompb.ReadRequest"""
+    query = _field_varint(1, start_ms) + _field_varint(2, end_ms)
+    for match_type, name, value in matchers:
+        matcher = _field_varint(1, match_type) + _field_bytes(2, name.encode()) + _field_bytes(3, value.encode())
+        query += _field_bytes(3, matcher)
+    request = _field_bytes(1, query)
+    if streamed:
+        request += _field_varint(2, RESPONSE_STREAMED_XOR_CHUNKS)
+    request += _field_varint(2, RESPONSE_SAMPLES)
+    return snappy_compress(request)
+
+
+def parse_read_request(body: bytes) -> List[Tuple[int, int, List[Tuple[int, str, str]]]]:
+    """解析 snappy 压缩的 ReadRequest，返回 [(start_ms, end_ms, matchers), ...]（用于 Mock 服务）"""
+    queries = []
+    for number, _, value in _iter_fields(snappy_decompress(body)):
+        if number != 1:
+            continue
+        start = end = 0
+        matchers = []
+        for qnum, _, qvalue in _iter_fields(value):
+            if qnum == 1:
+                start = _to_int64(qvalue)
+            elif qnum == 2:
+                end = _to_int64(qvalue)
+            elif qnum == 3:
+                match_type, name, mvalue = MATCH_EQ, "", ""
+                for mnum, _, mval in _iter_fields(qvalue):
+                    if mnum == 1:
+                        match_type = mval
+                    elif mnum == 2:
+                        name = mval.decode()
+                    elif mnum == 3:
+                        mvalue = mval.decode()
+                matchers.append((match_type, name, mvalue))
+        queries.append((start, end, matchers))
+    return queries
+
+
+def _parse_labels(buf: bytes) -> Tuple[str, str]:
+    name = value = ""
+    for number, _, raw in _iter_fields(buf):
+        if number == 1:
+            name = raw.decode()
+        elif number == 2:
+            value = raw.decode()
+    return name, value
+
+
+def _read_exact(stream: BinaryIO, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise RemoteReadError("响应流意外结束")
+        data += chunk
+    return bytes(data)
+
+
+def _read_frame(stream: BinaryIO) -> Optional[bytes]:
+    """读取一帧：uvarint 长度 + 4 字节 CRC32C（大端） + 数据；流结束时返回 None"""
+    size = 0
+    shift = 0
+    while True:
+        byte = stream.read(1)
+        if not byte:
+            if shift == 0:
+                return None
+            raise RemoteReadError("帧长度被截断")
+        size |= (byte[0] & 0x7F) << shift
+        if not byte[0] & 0x80:
+            break
+        shift += 7
+    if size > MAX_FRAME_BYTES:
+        raise RemoteReadError(f"帧过大: {size} bytes")
+    checksum = int.from_bytes(_read_exact(stream, 4), "big")
+    data = _read_exact(stream, size)
+    if crc32c(data) != checksum:
+        raise RemoteReadError("帧校验和不匹配")
+    return data
+
+
+def iter_chunked_series(stream: BinaryIO) -> Iterator[RawSeries]:
+    """
+    流式解码 ChunkedReadResponse，逐条产出时间序列
+
+    同一序列的 chunk 可能被拆分到相邻的多帧中，按 label 集合合并。
+    """
+    current: Optional[RawSeries] = None
+    current_key = None
+    while True:
+        frame = _read_frame(stream)
+        if frame is None:
+            break
+        for number, _, series_buf in _iter_fields(frame):
+            if number != 1:  # chunked_series
+                continue
+            labels = {}
+            chunks = []
+            for snum, _, svalue in _iter_fields(series_buf):
+                if snum == 1:
+                    name, value = _parse_labels(svalue)
+                    labels[name] = value
+                elif snum == 2:
+                    chunks.append(svalue)
+            key = tuple(sorted(labels.items()))
+            if key != current_key:
+                if current is not None:
+                    yield current
+                current, current_key = RawSeries(labels), key
+            for chunk in chunks:
+                encoding, data = 0, b""
+                for cnum, _, cvalue in _iter_fields(chunk):
+                    if cnum == 3:
+                        encoding = cvalue
+                    elif cnum == 4:
+                        data = cvalue
+                if encoding != CHUNK_XOR:
+                    # 原生直方图等其他编码暂不支持，跳过
+                    continue
+                decode_xor_chunk(data, current.timestamps, current.values)
+    if current is not None:
+        yield current
+
+
+def parse_read_response(body: bytes) -> List[RawSeries]:
+    """解码非流式（SAMPLES）的 snappy 压缩 ReadResponse"""
+    result = []
+    for number, _, query_result in _iter_fields(snappy_decompress(body)):
+        if number != 1:
+            continue
+        for qnum, _, ts_buf in _iter_fields(query_result):
+            if qnum != 1:
+                continue
+            series = RawSeries({})
+            for tnum, _, tvalue in _iter_fields(ts_buf):
+                if tnum == 1:
+                    name, value = _parse_labels(tvalue)
+                    series.labels[name] = value
+                elif tnum == 2:
+                    sample_value, sample_ts = 0.0, 0
+                    for snum, _, svalue in _iter_fields(tvalue):
+                        if snum == 1:
+                            sample_value = struct.unpack("<d", svalue)[0]
+                        elif snum == 2:
+                            sample_ts = _to_int64(svalue)
+                    series.timestamps.append(sample_ts)
+                    series.values.append(sample_value)
+            result.append(series)
+    return result
+
+
+def encode_chunked_frame(series: List[RawSeries], samples_per_chunk: int = 120) -> bytes:
+    """把序列编码为一帧 ChunkedReadResponse（用于测试和 Mock 服务）"""
+    message = b""
+    for item in series:
+        body = b""
+        for name, value in sorted(item.labels.items()):
+            body += _field_bytes(1, _field_bytes(1, name.encode()) + _field_bytes(2, value.encode()))
+        for start in range(0, len(item.timestamps), samples_per_chunk):
+            ts = list(item.timestamps[start:start + samples_per_chunk])
+            vs = list(item.values[start:start + samples_per_chunk])
+            chunk = (_field_varint(1, ts[0]) + _field_varint(2, ts[-1]) + _field_varint(3, CHUNK_XOR)
+                     + _field_bytes(4, encode_xor_chunk(ts, vs)))
+            body += _field_bytes(2, chunk)
+        message += _field_bytes(1, body)
+    return _encode_varint(len(message)) + crc32c(message).to_bytes(4, "big") + message
+
+
+def summarize(series: RawSeries) -> Dict[str, object]:
+    """
+    原始样本的摘要统计
+
+    Returns:
+        count/min/max/avg/first/last 以及首尾时间戳（秒）
+    """
+    values = series.values
+    count = len(values)
+    if count == 0:
+        return {"count": 0}
+    return {
+        "count": count,
+        "start": series.timestamps[0] / 1000,
+        "end": series.timestamps[-1] / 1000,
+        "min": min(values),
+        "max": max(values),
+        "avg": sum(values) / count,
+        "first": values[0],
+        "last": values[-1],
+    }
@@ -1,22 +1,38 @@
 """Metrics Resource 实现"""
-import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional, TYPE_CHECKING
+from ..codec import dumps as json_dumps
 from ..dashboard_parser import DashboardParser
+from ..logger import get_logger
+from ..metric_metadata import MetadataCache
+from ..promql import metric_names
+
+if TYPE_CHECKING:
+    from ..datasources import DatasourceRouter
+
+logger = get_logger("resources.metrics")
 
 
 class MetricsResource:
     """Dashboard Metrics Resource"""
     
-    def __init__(self, dashboard_name: str, dashboard_path: str):
+    def __init__(self, dashboard_name: str, dashboard_path: str,
+                 dashboard_json: Optional[Dict[str, Any]] = None,
+                 datasource_router: Optional["DatasourceRouter"] = None,
+                 metadata: Optional[MetadataCache] = None):
         """
         初始化 Metrics Resource
         
         Args:
             dashboard_name: dashboard 名称
             dashboard_path: dashboard JSON 文件路径
+            dashboard_json: 已解析的 dashboard JSON（可选）
+            datasource_router: 多 datasource 路由器（可选），与 metadata 一起提供时附加指标元数据
+            metadata: 指标元数据缓存（可选）
         """
         self.dashboard_name = dashboard_name
-        self.parser = DashboardParser(dashboard_path)
+        self.parser = DashboardParser(dashboard_path, dashboard_json)
+        self.datasource_router = datasource_router
+        self.metadata = metadata
     
     def get_uri(self) -> str:
         """获取 resource URI"""
@@ -39,8 +55,33 @@ class MetricsResource:
             "total_metrics": len(metrics_data),
             "metrics": metrics_data
         }
+        if self.metadata is not None and self.datasource_router is not None:
+            result["metric_metadata"] = self._metric_metadata(metrics)
         
-        return json.dumps(result, indent=2, ensure_ascii=False)
+        return json_dumps(result)
+    
+    def _metric_metadata(self, metrics) -> Dict[str, Dict[str, str]]:
+        """
+        expr 中引用的各指标的 type / unit / help（每个 datasource 一次批量请求，结果有缓存）
+
+        按指标名去重后放在顶层，避免多个 panel 使用同一指标时重复输出。
+        """
+        names_by_datasource: Dict[str, Dict[str, None]] = {}
+        for metric in metrics:
+            datasource = self.datasource_router.resolve(metric.datasource)
+            names = names_by_datasource.setdefault(datasource, {})
+            names.update(dict.fromkeys(metric_names(metric.expr)))
+        described: Dict[str, Dict[str, str]] = {}
+        for datasource, names in names_by_datasource.items():
+            client = self.datasource_router.clients[datasource]
+            try:
+                found = self.metadata.describe(client, names)
+            except Exception as e:
+                logger.warning(f"获取指标元数据失败 ({datasource}): {e}")
+                continue
+            for name, info in found.items():
+                described.setdefault(name, info)
+        return dict(sorted(described.items()))
     
     def get_description(self) -> str:
         """获取 resource 描述"""
@@ -1,9 +1,20 @@
 """Variables Resource 实现"""
 import re
-from typing import Dict, Any, List
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, TYPE_CHECKING
+from ..admission import PRIORITY_BACKGROUND, request_priority
 from ..prometheus_client import PrometheusClient
 from ..dashboard_parser import DashboardParser, Variable
+from ..codec import dumps as json_dumps
 from ..logger import get_logger
+from ..promql import classify_variable_query
+from ..templating import VariableValue, find_references, substitute
+
+if TYPE_CHECKING:
+    from ..datasources import DatasourceRouter
 
 logger = get_logger("resources.variables")
 
@@ -11,42 +22,90 @@ logger = get_logger("resources.variables")
 class VariablesResource:
     """Dashboard Variables Resource"""
     
+    # 并行查询变量候选值的最大线程数
+    MAX_WORKERS = 8
+    # 候选值缓存的最大条目数（按父变量取值组合区分）
+    VALUES_CACHE_SIZE = 1024
+    
     def __init__(self, dashboard_name: str, dashboard_path: str, 
-                 prometheus_client: PrometheusClient):
+                 prometheus_client: PrometheusClient,
+                 datasource_router: Optional["DatasourceRouter"] = None,
+                 values_cache_ttl: float = 60,
+                 dashboard_json: Optional[Dict[str, Any]] = None):
         """
         初始化 Variables Resource
         
         Args:
             dashboard_name: dashboard 名称
             dashboard_path: dashboard JSON 文件路径
-            prometheus_client: Prometheus 客户端
+            prometheus_client: Prometheus 客户端（未配置路由器时使用）
+            datasource_router: 多 datasource 路由器（可选），按变量的 datasource 选择客户端
+            values_cache_ttl: 候选值缓存时间（秒）
+            dashboard_json: 已解析的 dashboard JSON（可选）
         """
         self.dashboard_name = dashboard_name
-        self.parser = DashboardParser(dashboard_path)
+        self.parser = DashboardParser(dashboard_path, dashboard_json)
         self.prometheus_client = prometheus_client
+        self.datasource_router = datasource_router
+        self.values_cache_ttl = values_cache_ttl
+        # (datasource, 变量名, 替换后的查询) -> (过期时间, 候选值)
+        self._values_cache: "OrderedDict[Tuple[str, str, str], Tuple[float, List[str]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    def _client_for(self, variable: Variable) -> PrometheusClient:
+        """获取变量所属 datasource 的客户端"""
+        if self.datasource_router:
+            return self.datasource_router.get_client(variable.datasource)
+        return self.prometheus_client
     
     def get_uri(self) -> str:
         """获取 resource URI"""
         return f"prometheus://dashboard/{self.dashboard_name}/variables"
     
-    def get_content(self) -> str:
+    def get_content(self, selected: Optional[Dict[str, VariableValue]] = None) -> str:
         """
         获取 resource 内容
         
+        Args:
+            selected: 变量取值覆盖（用于下钻，例如 {"cluster": "c1"}），未指定的变量使用 dashboard 当前值
+        
         Returns:
             格式化的变量信息（JSON 字符串）
         """
         variables = self.parser.parse_variables()
-        variables_data = []
+        selected = selected or {}
+        
+        # 按依赖关系分层解析：同一层的变量互不依赖，并行查询；
+        # 子变量查询中的 $parent 替换为父变量的选中值后再查询
+        values_by_name: Dict[str, List[str]] = {}
+        chosen: Dict[str, VariableValue] = {}
+        resolved_queries: Dict[str, str] = {}
+        all_values = {var.name: var.all_value for var in variables}
+        levels, deps = self._resolution_levels(variables)
+        
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            for level in levels:
+                query_vars = [var for var in level if var.type == "query" and var.query]
+                queries = [substitute(var.query, chosen, all_values) for var in query_vars]
+                for var, query in zip(query_vars, queries):
+                    if query != var.query:
+                        resolved_queries[var.name] = query
+                for var, values in zip(query_vars, executor.map(self._cached_variable_values, query_vars, queries)):
+                    values_by_name[var.name] = values
+                for var in level:
+                    chosen[var.name] = self._selected_value(var, values_by_name.get(var.name), selected)
         
+        variables_data = []
         for var in variables:
             var_dict = var.to_dict()
-            
-            # 对于 query 类型的变量，查询 Prometheus 获取候选值
-            if var.type == "query" and var.query:
-                values = self._query_variable_values(var)
-                var_dict["values"] = values
-            
+            if deps.get(var.name):
+                var_dict["depends_on"] = sorted(deps[var.name])
+            if var.name in resolved_queries:
+                var_dict["resolved_query"] = resolved_queries[var.name]
+            if var.name in selected:
+                var_dict["selected_value"] = selected[var.name]
+            if var.name in values_by_name:
+                var_dict["values"] = values_by_name[var.name]
             variables_data.append(var_dict)
         
         result = {
@@ -55,109 +114,147 @@ class VariablesResource:
             "variables": variables_data
         }
         
-        import json
-        return json.dumps(result, indent=2, ensure_ascii=False)
-
-    def _unwrap_query_result(self, query: str) -> str:
+        return json_dumps(result)
+    
+    def _resolution_levels(self, variables: List[Variable]) -> Tuple[List[List[Variable]], Dict[str, set]]:
         """
-        去掉 VictoriaMetrics/Grafana 的 query_result(...) 包装，返回内层 PromQL。
-        标准 Prometheus 不支持 query_result()，但支持内层的 sort_desc/topk 等。
+        根据变量查询中的 $var 引用构建依赖图，并按拓扑顺序分层
+        
+        Returns:
+            (分层后的变量列表, 变量名 -> 依赖的变量名集合)
         """
-        q = query.strip()
-        if not re.match(r'query_result\s*\(', q, re.IGNORECASE):
-            return query
-        start = q.index('(') + 1
-        depth = 1
-        i = start
-        while i < len(q) and depth > 0:
-            if q[i] == '(':
-                depth += 1
-            elif q[i] == ')':
-                depth -= 1
-            i += 1
-        inner = q[start : i - 1].strip()
-        logger.debug("query_result 已剥离，内层 PromQL: %s", inner[:80])
-        return inner
+        names = {var.name for var in variables}
+        deps = {
+            var.name: (find_references(var.query) & names) - {var.name}
+            for var in variables
+        }
+        levels = []
+        resolved = set()
+        remaining = list(variables)
+        while remaining:
+            level = [var for var in remaining if deps[var.name] <= resolved]
+            if not level:
+                # 存在循环依赖：剩余变量一起解析，未解析的引用保持原样
+                logger.warning(f"变量存在循环依赖: {[var.name for var in remaining]}")
+                level = remaining
+            levels.append(level)
+            resolved.update(var.name for var in level)
+            remaining = [var for var in remaining if var.name not in resolved]
+        return levels, deps
+    
+    @staticmethod
+    def _selected_value(variable: Variable, candidates: Optional[List[str]],
+                        selected: Dict[str, VariableValue]) -> Optional[VariableValue]:
+        """变量的选中值：调用方覆盖 > dashboard 当前值 > 第一个候选值"""
+        if variable.name in selected:
+            return selected[variable.name]
+        current = variable.current_value
+        if current not in (None, "", []):
+            return current
+        candidates = candidates or variable.options or []
+        if candidates:
+            return candidates[0]
+        return None
+    
+    def _cached_variable_values(self, variable: Variable, query: str) -> List[str]:
+        """按 (datasource, 变量, 替换后的查询) 缓存候选值，下钻时复用已查询过的父变量取值组合"""
+        datasource = self.datasource_router.resolve(variable.datasource) if self.datasource_router else ""
+        key = (datasource, variable.name, query)
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._values_cache.get(key)
+            if entry and entry[0] > now:
+                self._values_cache.move_to_end(key)
+                return entry[1]
+        
+        values = self._query_variable_values(variable, query)
+        # 查询失败时返回空列表，不缓存
+        if values:
+            with self._cache_lock:
+                self._values_cache[key] = (now + self.values_cache_ttl, values)
+                self._values_cache.move_to_end(key)
+                while len(self._values_cache) > self.VALUES_CACHE_SIZE:
+                    self._values_cache.popitem(last=False)
+        return values
 
-    def _query_variable_values(self, variable: Variable) -> List[str]:
+    def _query_variable_values(self, variable: Variable, query: Optional[str] = None) -> List[str]:
         """
         查询变量的候选值
         
         Args:
             variable: 变量对象
+            query: 已替换父变量取值的查询（默认使用变量原始查询）
             
         Returns:
             候选值列表
         """
-        query = variable.query
+        query = query or variable.query
         if not query:
             return []
+        client = self._client_for(variable)
         
         try:
-            # 检测是否是 label_values() 查询
-            # 格式1: label_values(label_name)
-            # 格式2: label_values(metric{...}, label_name)，metric 内可含逗号，用贪婪匹配取最后一个逗号分隔
-            label_values_pattern = r'label_values\s*\(\s*(?:(.+),\s*)?([^,\)]+)\s*\)'
-            match = re.search(label_values_pattern, query)
-            
-            if match:
-                metric_part = match.group(1)
-                label_name = match.group(2).strip()
-                
-                if metric_part:
-                    # 格式2: label_values(metric{...}, label_name)
-                    # 提取 metric 部分作为 match 参数
-                    metric_part = metric_part.strip()
-                    values = self.prometheus_client.query_label_values(
-                        label=label_name,
-                        match=metric_part
-                    )
-                else:
-                    # 格式1: label_values(label_name)
-                    values = self.prometheus_client.query_label_values(label=label_name)
-                
-                return values
+            # 变量刷新属于后台请求，准入控制中排在交互式查询之后
+            with request_priority(PRIORITY_BACKGROUND):
+                return self._fetch_variable_values(variable, client, query)
+        except Exception as e:
+            logger.error(f"查询变量 {variable.name} 的候选值失败: {e}", exc_info=True)
+            return []
 
-            # 处理 VictoriaMetrics/Grafana 的 query_result(...) 包装（标准 Prometheus 不支持）
-            # 去掉 query_result(...) 只保留内层 PromQL，再请求
-            promql = self._unwrap_query_result(query)
+    def _fetch_variable_values(self, variable: Variable, client: PrometheusClient, query: str) -> List[str]:
+        """按变量查询的类型向 Prometheus 请求候选值"""
+        parsed = classify_variable_query(query)
 
-            # 尝试直接执行查询
-            result = self.prometheus_client.query(promql)
-            data = result.get("data", {})
-            result_list = data.get("result", [])
+        if parsed.kind == "label_values":
+            # label_values(label_name) 或 label_values(metric{...}, label_name)
+            return client.query_label_values(label=parsed.label, match=parsed.match)
 
-            # 提取所有不重复的值
-            values = []
-            for item in result_list:
-                metric = item.get("metric", {})
-                value_data = item.get("value", [])
+        if parsed.kind == "label_names":
+            return client.query_label_names(match=parsed.match)
 
-                # 尝试从 metric 中提取值（先按变量名，再按常见映射如 maxmount->mountpoint）
-                label_to_try = variable.name
-                if label_to_try not in metric and variable.name == "maxmount":
-                    label_to_try = "mountpoint"
-                if label_to_try in metric:
-                    val = metric[label_to_try]
-                    if val and val not in values:
-                        values.append(val)
-                # 或取任意非 __ 开头的 label 值（单结果时常用）
-                if not values and metric:
-                    for k, v in metric.items():
-                        if not k.startswith("__") and v and v not in values:
-                            values.append(v)
-                            break
-                # 或者从 value 中提取
-                if not values and len(value_data) >= 2:
-                    val = str(value_data[1])
-                    if val and val not in values:
-                        values.append(val)
+        if parsed.kind == "metrics":
+            # metrics(regex)：按正则过滤指标名
+            names = client.query_label_values(label="__name__")
+            if not parsed.regex:
+                return names
+            pattern = re.compile(parsed.regex)
+            return [name for name in names if pattern.search(name)]
 
-            return values
-            
-        except Exception as e:
-            logger.error(f"查询变量 {variable.name} 的候选值失败: {e}", exc_info=True)
-            return []
+        # 普通 PromQL；query_result(...) 包装已在分类时剥离（标准 Prometheus 不支持）
+        promql = parsed.expr
+
+        # 尝试直接执行查询
+        result = client.query(promql)
+        data = result.get("data", {})
+        result_list = data.get("result", [])
+
+        # 提取所有不重复的值
+        values = []
+        for item in result_list:
+            metric = item.get("metric", {})
+            value_data = item.get("value", [])
+
+            # 尝试从 metric 中提取值（先按变量名，再按常见映射如 maxmount->mountpoint）
+            label_to_try = variable.name
+            if label_to_try not in metric and variable.name == "maxmount":
+                label_to_try = "mountpoint"
+            if label_to_try in metric:
+                val = metric[label_to_try]
+                if val and val not in values:
+                    values.append(val)
+            # 或取任意非 __ 开头的 label 值（单结果时常用）
+            if not values and metric:
+                for k, v in metric.items():
+                    if not k.startswith("__") and v and v not in values:
+                        values.append(v)
+                        break
+            # 或者从 value 中提取
+            if not values and len(value_data) >= 2:
+                val = str(value_data[1])
+                if val and val not in values:
+                    values.append(val)
+
+        return values
     
     def get_description(self) -> str:
         """获取 resource 描述"""
@@ -0,0 +1,232 @@
+"""
+大查询结果的服务端暂存
+
+查询结果过大时不在一次 tool 响应中全部返回，而是暂存在 server 上，返回一个 handle 和概要
+（序列数、label 键、时间范围）；调用方再用 fetch_result_page 按 label 过滤、按时间切片、
+按 cursor 分页取回需要的部分，上游查询只执行一次。
+
+range 查询的序列以 CompactSeries 存储，内存按 TTL 与总字节上限淘汰。
+"""
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .logger import get_logger
+from .series_store import CompactSeries, LabelInterner
+
+logger = get_logger("result_store")
+
+# 概要中每个 label 键最多列出的取值数
+MAX_LABEL_VALUES = 10
+# 每页最多返回的序列数
+MAX_PAGE_SIZE = 100
+
+
+class UnknownHandleError(Exception):
+    """handle 不存在或已过期"""
+
+
+@dataclass
+class StoredResult:
+    """一个暂存的查询结果"""
+    handle: str
+    query: str
+    result_type: str
+    series: List[Union[CompactSeries, Dict[str, Any]]]  # matrix 为 CompactSeries，其他为原始条目
+    nbytes: int
+    expires: float
+    extra: Dict[str, Any] = field(default_factory=dict)  # 原响应中的附加字段（range、warnings 等）
+
+    @staticmethod
+    def labels_of(item: Union[CompactSeries, Dict[str, Any]]) -> Dict[str, str]:
+        return item.labels if isinstance(item, CompactSeries) else item.get("metric", {})
+
+    def overview(self) -> Dict[str, Any]:
+        """结果概要：序列数、各 label 键的取值数与部分取值、时间范围"""
+        values: Dict[str, set] = {}
+        for item in self.series:
+            for key, value in self.labels_of(item).items():
+                values.setdefault(key, set()).add(value)
+        info: Dict[str, Any] = {
+            "handle": self.handle,
+            "query": self.query,
+            "result_type": self.result_type,
+            "series_count": len(self.series),
+            "label_keys": {
+                key: {"distinct": len(seen), "values": sorted(seen)[:MAX_LABEL_VALUES]}
+                for key, seen in sorted(values.items())
+            },
+            "expires_in": max(0, int(self.expires - time.time())),
+        }
+        if self.result_type == "matrix":
+            firsts = [item.base + item.offsets[0] for item in self.series if len(item)]
+            lasts = [item.base + item.offsets[-1] for item in self.series if len(item)]
+            info["points"] = sum(len(item) for item in self.series)
+            if firsts:
+                info["time_range"] = {"start": min(firsts) / 1000, "end": max(lasts) / 1000}
+        info.update(self.extra)
+        return info
+
+    def page(self, cursor: Optional[str] = None, limit: int = 20, match: Optional[Dict[str, str]] = None,
+             start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+        """
+        按 cursor 取一页序列
+
+        Args:
+            cursor: 上一页返回的 next_cursor（序列下标），为空时从头开始
+            limit: 每页序列数（限制在 1..MAX_PAGE_SIZE 之间）
+            match: label 精确匹配过滤
+            start: 时间切片起点（仅 matrix）
+            end: 时间切片终点（仅 matrix）
+
+        Raises:
+            ValueError: cursor 无效
+        """
+        try:
+            offset = int(cursor) if cursor else 0
+        except ValueError:
+            raise ValueError(f"无效的 cursor: {cursor}")
+        if offset < 0:
+            raise ValueError(f"无效的 cursor: {cursor}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        match = match or {}
+        matched = [
+            index for index, item in enumerate(self.series)
+            if all(self.labels_of(item).get(k) == v for k, v in match.items())
+        ]
+        position = next((i for i, index in enumerate(matched) if index >= offset), len(matched))
+        selected = matched[position:position + limit]
+        items = []
+        for index in selected:
+            item = self.series[index]
+            if isinstance(item, CompactSeries):
+                sliced = item.slice(start, end) if start is not None or end is not None else item
+                items.append({"metric": dict(item.labels), "values": sliced.pairs()})
+            else:
+                items.append(item)
+        remaining = matched[position + limit:position + limit + 1]
+        return {
+            "handle": self.handle,
+            "total_matched": len(matched),
+            "series": items,
+            "next_cursor": str(remaining[0]) if remaining else None,
+        }
+
+
+def decode_response(response: Dict[str, Any]) -> Tuple[str, List[Any], Dict[str, Any]]:
+    """
+    把查询响应转换为暂存的形式（不依赖 ResultStore 的状态，可以在子进程中执行）
+
+    Returns:
+        (结果类型, 序列列表, status / data 以外的字段)；matrix 结果转换为 CompactSeries
+    """
+    data = response.get("data", {})
+    result_type = data.get("resultType", "")
+    result = data.get("result", [])
+    if result_type == "matrix":
+        series: List[Any] = [
+            CompactSeries.from_pairs(item.get("metric", {}), item.get("values", [])) for item in result
+        ]
+    elif result_type == "vector":
+        series = list(result)
+    else:
+        # scalar / string 只有一个值
+        series = [{"value": result}]
+    extra = {key: value for key, value in response.items() if key not in ("status", "data")}
+    return result_type, series, extra
+
+
+class ResultStore:
+    """按 TTL 与内存上限淘汰的结果暂存区（最久未访问的先淘汰）"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 600):
+        """
+        初始化
+
+        Args:
+            max_bytes: 所有暂存结果的内存上限（估算值）
+            ttl: 结果的保存时间（秒），每次访问后重新计时
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, StoredResult]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._labels = LabelInterner()
+
+    def put(self, query: str, response: Dict[str, Any]) -> StoredResult:
+        """
+        暂存一个 Prometheus 查询响应
+
+        Args:
+            query: 查询语句
+            response: 解析后的响应
+
+        Returns:
+            暂存的结果
+        """
+        return self.add(query, *decode_response(response))
+
+    def add(self, query: str, result_type: str, series: List[Any], extra: Dict[str, Any]) -> StoredResult:
+        """
+        暂存 decode_response() 的结果（可以在子进程中解码，label 集合在这里驻留）
+
+        Args:
+            query: 查询语句
+            result_type: 结果类型
+            series: 序列列表
+            extra: 响应中 status / data 以外的字段
+
+        Returns:
+            暂存的结果
+        """
+        if result_type == "matrix":
+            for item in series:
+                item.labels = self._labels.intern(item.labels)
+            nbytes = sum(item.nbytes + 64 * len(item.labels) for item in series)
+        elif result_type == "vector":
+            nbytes = sys.getsizeof(series) + 256 * len(series)
+        else:
+            nbytes = 256
+        entry = StoredResult(
+            handle=f"r-{secrets.token_hex(8)}",
+            query=query,
+            result_type=result_type,
+            series=series,
+            nbytes=nbytes,
+            expires=time.time() + self.ttl,
+            extra=extra,
+        )
+        with self._lock:
+            self._expire(time.time())
+            self._entries[entry.handle] = entry
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                logger.info(f"暂存结果超过内存上限，淘汰 {evicted.handle}")
+        logger.info(f"暂存查询结果 {entry.handle}: {len(series)} 条序列，约 {nbytes} bytes")
+        return entry
+
+    def get(self, handle: str) -> StoredResult:
+        """取回暂存的结果（重新计时），不存在或已过期时抛出 UnknownHandleError"""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(handle)
+            if entry is None:
+                raise UnknownHandleError(f"结果 handle 不存在或已过期: {handle}，请重新执行查询")
+            entry.expires = now + self.ttl
+            self._entries.move_to_end(handle)
+            return entry
+
+    def _expire(self, now: float):
+        for handle in [handle for handle, entry in self._entries.items() if entry.expires <= now]:
+            self._bytes -= self._entries.pop(handle).nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
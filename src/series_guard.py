@@ -0,0 +1,144 @@
+"""未聚合的高基数查询保护：超过序列数上限时改写为 topk"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from . import promql
+from .logger import get_logger
+from .timeutil import format_duration
+
+logger = get_logger("series_guard")
+
+# 结果不会按序列展开的函数
+_SCALAR_FUNCS = frozenset({"scalar", "time", "vector", "absent", "absent_over_time", "pi"})
+
+
+def may_fan_out(node: promql.Node) -> bool:
+    """表达式的结果是否可能包含与原始序列一样多的序列（没有经过聚合）"""
+    node = promql.unwrap_parens(node)
+    if isinstance(node, promql.VectorSelector):
+        return True
+    if isinstance(node, (promql.Aggregation, promql.NumberLiteral, promql.StringLiteral, promql.TemplateVariable)):
+        return False
+    if isinstance(node, promql.Call):
+        return node.func not in _SCALAR_FUNCS and any(may_fan_out(arg) for arg in node.args)
+    if isinstance(node, promql.BinaryOp):
+        return may_fan_out(node.lhs) or may_fan_out(node.rhs)
+    return any(may_fan_out(child) for child in promql.children(node))
+
+
+def probe_query(query: str, window: Optional[float] = None, step: Optional[str] = None) -> str:
+    """
+    序列数探测查询
+
+    范围查询统计整个窗口内出现过的序列（窗口内消失或新出现的序列也计入），而不只是结束时刻的序列：
+    选择器直接用 last_over_time，其他表达式用子查询按查询步长求值。
+    """
+    if not window:
+        return f"count({query})"
+    duration = format_duration(window)
+    node = promql.unwrap_parens(promql.parse(query))
+    if isinstance(node, promql.VectorSelector):
+        return f"count(last_over_time({query}[{duration}]))"
+    return f"count(last_over_time(({query})[{duration}:{step or ''}]))"
+
+
+@dataclass(frozen=True)
+class GuardDecision:
+    """保护检查结果"""
+    total_series: int
+    query: str  # 实际执行的查询（未改写时与原查询相同）
+    rewritten: bool
+    per_step: bool = False  # 范围查询：topk 在每个步长上各自选取
+
+    def to_dict(self, k: int) -> Dict[str, object]:
+        info: Dict[str, object] = {"total_series": self.total_series, "rewritten": self.rewritten}
+        if self.rewritten:
+            info["query"] = self.query
+            if self.per_step:
+                info["note"] = (
+                    f"窗口内结果序列数超过上限，改写为 topk({k}, ...)：每个步长只保留值最大的 {k} 条，"
+                    f"不同步长选中的序列可能不同，返回的序列总数可能超过 {k}；请加聚合或更具体的 label 过滤"
+                )
+            else:
+                info["note"] = f"结果序列数超过上限，只返回值最大的 {k} 条；请加聚合或更具体的 label 过滤"
+        return info
+
+
+class SeriesGuard:
+    """
+    在执行未聚合的查询之前先用 count() 探测结果序列数，超过 max_series 时改写为 topk(k, ...)
+
+    范围查询的 topk 按步长分别选取，窗口内返回的序列总数可能超过 k，改写说明中会注明。
+
+    探测只返回一个数字，比直接执行原查询并传输上万条序列便宜得多；同一查询的探测结果
+    缓存 probe_ttl 秒，轮询时不会重复探测。
+    """
+
+    def __init__(self, max_series: int = 1000, k: int = 100, probe_ttl: float = 60):
+        """
+        初始化保护
+
+        Args:
+            max_series: 结果序列数上限
+            k: 改写后的 topk 参数
+            probe_ttl: 探测结果的缓存时间（秒）
+        """
+        self.max_series = max_series
+        self.k = k
+        self.probe_ttl = probe_ttl
+        self._probes: Dict[Tuple[int, str], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def needs_probe(self, query: str) -> bool:
+        """可以解析且没有聚合的查询才需要探测"""
+        node = promql.try_parse(query)
+        return node is not None and may_fan_out(node)
+
+    def _count(self, client, probe: str, query_time: Optional[str]) -> Optional[int]:
+        key = (id(client), probe)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._probes.get(key)
+            if cached is not None and now - cached[0] < self.probe_ttl:
+                return cached[1]
+        try:
+            result = client.query(probe, query_time, retry=1)
+        except Exception as e:
+            # 探测失败时不改写，由原查询给出真正的错误
+            logger.debug(f"序列数探测失败: {e}")
+            return None
+        samples = result.get("data", {}).get("result", [])
+        total = int(float(samples[0]["value"][1])) if samples else 0
+        with self._lock:
+            if len(self._probes) > 1024:
+                self._probes.clear()
+            self._probes[key] = (now, total)
+        return total
+
+    def check(self, client, query: str, query_time: Optional[str] = None, window: Optional[float] = None,
+              step: Optional[str] = None) -> Optional[GuardDecision]:
+        """
+        检查查询，必要时改写
+
+        Args:
+            client: PrometheusClient
+            query: PromQL 查询
+            query_time: 探测的时间点（范围查询使用窗口结束时间）
+            window: 范围查询的窗口长度（秒），统计整个窗口内出现过的序列
+            step: 范围查询的步长
+
+        Returns:
+            GuardDecision；查询不需要探测或探测失败时返回 None
+        """
+        if not self.needs_probe(query):
+            return None
+        total = self._count(client, probe_query(query, window, step), query_time)
+        if total is None:
+            return None
+        per_step = bool(window)
+        if total <= self.max_series:
+            return GuardDecision(total, query, False, per_step)
+        logger.info(f"查询结果 {total} 条序列，超过上限 {self.max_series}，改写为 topk({self.k}, ...)")
+        return GuardDecision(total, f"topk({self.k}, {query})", True, per_step)
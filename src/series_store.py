@@ -0,0 +1,179 @@
+"""
+缓存时间序列的紧凑内存表示
+
+Prometheus JSON 中每个采样点是 [float, "str"] 列表，每条序列还带一个 label 字典，
+每个点占用 100 字节以上。这里把 label 集合驻留（相同的 label 集合共享同一个字典），
+时间戳保存为相对序列起点的毫秒偏移（array('i')，超出范围时自动升级为 array('q')），
+值保存为 array('d')，每个点约 12 字节；按时间范围切片返回 memoryview，不复制数据。
+"""
+import bisect
+import math
+import sys
+import threading
+import weakref
+from array import array
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:  # 可选依赖
+    import numpy as _numpy
+except ImportError:  # pragma: no cover - 取决于环境
+    _numpy = None
+
+_INT32_MAX = 2 ** 31 - 1
+
+Buffer = Union[array, memoryview]
+
+
+def format_value(value: float) -> str:
+    """按 Prometheus 的格式输出采样值（NaN、+Inf、不使用科学计数法）"""
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    text = repr(value)
+    if "e" in text or "E" in text:
+        text = format(Decimal(text), "f")
+    if text.endswith(".0"):
+        text = text[:-2]
+    return text
+
+
+def _format_ts(ms: int) -> Union[int, float]:
+    return ms // 1000 if ms % 1000 == 0 else ms / 1000
+
+
+class _LabelSet(dict):
+    """可被弱引用的 label 字典"""
+    __slots__ = ("__weakref__",)
+
+
+class LabelInterner:
+    """
+    label 集合驻留：相同的 label 集合返回同一个字典，键和值字符串也驻留
+
+    驻留表只持有弱引用：引用某个 label 集合的序列全部被淘汰后，该集合随之释放，
+    长时间运行时驻留表的大小不超过缓存中仍存活的序列。
+    """
+
+    def __init__(self):
+        self._sets: "weakref.WeakValueDictionary[Tuple[Tuple[str, str], ...], _LabelSet]" = \
+            weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def intern(self, labels: Dict[str, str]) -> Dict[str, str]:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            shared = self._sets.get(key)
+            if shared is None:
+                shared = _LabelSet((sys.intern(str(k)), sys.intern(str(v))) for k, v in key)
+                self._sets[key] = shared
+            return shared
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+
+class CompactSeries:
+    """
+    一条时间序列的紧凑表示
+
+    采样点必须按时间递增追加。切片（slice）得到的序列共享底层缓冲区，只读；
+    切片存活期间不能再修改原序列（array 的缓冲区被导出时不允许改变长度）。
+    """
+
+    __slots__ = ("labels", "base", "offsets", "values")
+
+    def __init__(self, labels: Dict[str, str], base: int = 0,
+                 offsets: Optional[Buffer] = None, values: Optional[Buffer] = None):
+        self.labels = labels
+        self.base = base  # 时间戳基准（毫秒）
+        self.offsets = offsets if offsets is not None else array("i")
+        self.values = values if values is not None else array("d")
+
+    @classmethod
+    def from_pairs(cls, labels: Dict[str, str], pairs: Iterable[Sequence[Any]],
+                   interner: Optional[LabelInterner] = None) -> "CompactSeries":
+        """由 Prometheus 的 [[ts, "value"], ...] 构造"""
+        series = cls(interner.intern(labels) if interner is not None else dict(labels))
+        series.extend(pairs)
+        return series
+
+    def append(self, ts: float, value: Any):
+        """追加一个采样点（ts 为秒）"""
+        ms = int(round(float(ts) * 1000))
+        if not self.offsets:
+            self.base = ms
+        offset = ms - self.base
+        if offset > _INT32_MAX and self.offsets.typecode == "i":
+            self.offsets = array("q", self.offsets)
+        self.offsets.append(offset)
+        self.values.append(float(value))
+
+    def extend(self, pairs: Iterable[Sequence[Any]]):
+        """追加 Prometheus 格式的采样点"""
+        for ts, value in pairs:
+            self.append(ts, value)
+
+    def _index(self, ts: float) -> int:
+        """第一个时间戳 >= ts 的位置"""
+        return bisect.bisect_left(self.offsets, int(round(ts * 1000)) - self.base)
+
+    def slice(self, start: Optional[float] = None, end: Optional[float] = None) -> "CompactSeries":
+        """[start, end] 时间范围内的采样点（不复制数据）"""
+        lo = self._index(start) if start is not None else 0
+        hi = bisect.bisect_right(self.offsets, int(round(end * 1000)) - self.base) if end is not None else len(self)
+        return CompactSeries(self.labels, self.base, memoryview(self.offsets)[lo:hi], memoryview(self.values)[lo:hi])
+
+    def drop_before(self, ts: float):
+        """删除时间戳早于 ts 的采样点"""
+        index = self._index(ts)
+        del self.offsets[:index]
+        del self.values[:index]
+
+    def drop_from(self, ts: float):
+        """删除时间戳不早于 ts 的采样点"""
+        index = self._index(ts)
+        del self.offsets[index:]
+        del self.values[index:]
+
+    def timestamps(self) -> Iterator[Union[int, float]]:
+        """时间戳（秒）"""
+        base = self.base
+        return (_format_ts(base + offset) for offset in self.offsets)
+
+    def pairs(self) -> List[List[Any]]:
+        """Prometheus 格式的采样点 [[ts, "value"], ...]"""
+        return [[ts, format_value(value)] for ts, value in zip(self.timestamps(), self.values)]
+
+    def to_numpy(self):
+        """
+        (时间戳毫秒, 值) 两个 NumPy 数组；值数组直接引用底层缓冲区，不复制
+
+        需要安装 numpy。
+        """
+        if _numpy is None:
+            raise RuntimeError("需要安装 numpy")
+        offsets = _numpy.frombuffer(self.offsets, dtype="i4" if self.offsets.itemsize == 4 else "i8")
+        return offsets.astype("i8") + self.base, _numpy.frombuffer(self.values, dtype="f8")
+
+    @property
+    def nbytes(self) -> int:
+        """采样点缓冲区占用的字节数"""
+        return len(self.offsets) * self.offsets.itemsize + len(self.values) * self.values.itemsize
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+
+def from_matrix(result: Iterable[Dict[str, Any]], interner: Optional[LabelInterner] = None) -> List[CompactSeries]:
+    """Prometheus matrix 结果（data.result）转换为紧凑序列"""
+    return [
+        CompactSeries.from_pairs(item.get("metric", {}), item.get("values", []), interner)
+        for item in result
+    ]
+
+
+def to_matrix(series: Iterable[CompactSeries]) -> List[Dict[str, Any]]:
+    """紧凑序列转换回 Prometheus matrix 结果"""
+    return [{"metric": dict(s.labels), "values": s.pairs()} for s in series]
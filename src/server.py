@@ -2,13 +2,18 @@
 """Dash2Insight-MCP 主入口"""
 import argparse
 import asyncio
+import base64
 import os
 import sys
+import threading
+from bisect import bisect_right
 from pathlib import Path
-from typing import Any, Sequence
+from time import monotonic
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
 
 # 添加项目根目录到 Python 路径，支持直接运行
-if __name__ == "__main__":
+if not __package__:
     # 获取 src 目录的父目录（项目根目录）
     project_root = Path(__file__).parent.parent
     if str(project_root) not in sys.path:
@@ -16,26 +21,70 @@ if __name__ == "__main__":
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
-from mcp.types import Resource, Tool, TextContent, Prompt, PromptArgument, PromptMessage, GetPromptResult
+from mcp.shared.exceptions import McpError
+from mcp.types import (
+    INVALID_PARAMS, ErrorData, GetPromptResult, ListResourcesRequest, ListResourcesResult, Prompt,
+    PromptArgument, PromptMessage, Resource, ResourceTemplate, ServerResult, TextContent, Tool,
+)
 
-# 根据运行方式选择导入方式
-if __name__ == "__main__":
+# 根据运行方式选择导入方式（进程池的子进程会以 __mp_main__ 的名字重新导入直接运行的脚本）
+if not __package__:
     # 直接运行时使用绝对导入
+    from src.admission import AdmissionController, PRIORITY_RANGE, ServerBusyError, request_priority
+    from src.codec import configure as configure_codec, dumps as json_dumps, is_compact
     from src.config import load_config
-    from src.prometheus_client import PrometheusClient
+    from src.dashboard_catalog import DashboardCatalog, DiscoveredDashboard
+    from src.datasources import DatasourceRouter
+    from src.disk_cache import DiskCache
+    from src.remote_read import summarize
+    from src.metric_index import MetricIndex, UnknownMetricError
+    from src.metric_metadata import MetadataCache
+    from src.offload import Offloader, render_comparison, render_histogram
+    from src.prefetch import PanelPrefetcher, PrefetchStore, dashboard_values, panel_queries
+    from src.prometheus_client import CancelToken, RequestCancelled, call_scope
     from src.resources import VariablesResource, MetricsResource
+    from src.result_store import MAX_PAGE_SIZE, ResultStore, UnknownHandleError
+    from src.series_guard import SeriesGuard
+    from src.shaping import shape
+    from src.timeutil import (
+        align_range, choose_step, format_duration, is_relative, parse_duration, parse_timestamp,
+    )
     from src.logger import setup_logger, get_logger
 else:
     # 作为模块导入时使用相对导入
+    from .admission import AdmissionController, PRIORITY_RANGE, ServerBusyError, request_priority
+    from .codec import configure as configure_codec, dumps as json_dumps, is_compact
     from .config import load_config
-    from .prometheus_client import PrometheusClient
+    from .dashboard_catalog import DashboardCatalog, DiscoveredDashboard
+    from .datasources import DatasourceRouter
+    from .disk_cache import DiskCache
+    from .remote_read import summarize
+    from .metric_index import MetricIndex, UnknownMetricError
+    from .metric_metadata import MetadataCache
+    from .offload import Offloader, decode_result, render_comparison, render_histogram
+    from .prefetch import PanelPrefetcher, PrefetchStore, dashboard_values, panel_queries
+    from .prometheus_client import CancelToken, RequestCancelled, call_scope
     from .resources import VariablesResource, MetricsResource
+    from .result_store import MAX_PAGE_SIZE, ResultStore, UnknownHandleError
+    from .series_guard import SeriesGuard
+    from .shaping import shape
+    from .timeutil import (
+        align_range, choose_step, format_duration, is_relative, parse_duration, parse_timestamp,
+    )
     from .logger import setup_logger, get_logger
 
 
 class PrometheusServer:
     """Prometheus MCP Server"""
     
+    # dashboard 快照时每个 datasource 的最大并发查询数
+    SNAPSHOT_CONCURRENCY = 8
+    # 范围查询未指定 step 时每条序列的默认点数预算，以及自动步长的下限（秒，约为常见采集间隔）
+    DEFAULT_MAX_DATA_POINTS = 1000
+    MIN_AUTO_STEP = 15
+    # histogram_quantiles 未指定分位数时计算的分位数
+    DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+    
     def __init__(self, config_path: str = "config.yaml"):
         """
         初始化 MCP Server
@@ -54,106 +103,295 @@ class PrometheusServer:
             backup_count=self.config.logging.backup_count
         )
         self.logger = get_logger("server")
+        configure_codec(compact=self.config.output.compact)
         self.logger.info("=" * 60)
         self.logger.info("Dash2Insight-MCP 启动")
         self.logger.info(f"配置文件: {Path(config_path).resolve()}")
         self.logger.info(f"配置文件所在目录（dashboard 相对路径解析基准）: {Path(config_path).resolve().parent}")
-        self.logger.info(f"Prometheus URL: {self.config.prometheus.url}")
+        config_dir = Path(config_path).resolve().parent
+        
+        # 可选的磁盘缓存：重启后的新进程、同一主机上的多个进程共享
+        self.disk_cache = None
+        if self.config.cache.enabled:
+            cache_dir = Path(self.config.cache.dir)
+            if not cache_dir.is_absolute():
+                cache_dir = (config_dir / cache_dir).resolve()
+            self.disk_cache = DiskCache(str(cache_dir), max_bytes=self.config.cache.max_bytes)
+        
+        # 准入控制：所有 datasource 共享，限制发往 Prometheus 的总并发
+        admission_config = self.config.admission
+        self.admission = AdmissionController(
+            max_concurrency=admission_config.max_concurrency,
+            endpoint_limits=admission_config.endpoint_limits,
+            queue_timeout=admission_config.queue_timeout,
+            session_rate=admission_config.session_rate,
+            session_burst=admission_config.session_burst
+        )
+        
+        # 初始化各 datasource 的 Prometheus 客户端（每个 datasource 独立连接池）
+        self.datasource_router = DatasourceRouter.from_config(
+            self.config, cache=self.disk_cache, admission=self.admission
+        )
+        for name, client in self.datasource_router.clients.items():
+            self.logger.info(f"Datasource {name}: {', '.join(client.replicas)}")
+        self.logger.info(f"默认 datasource: {self.datasource_router.default}")
+        
+        # 指标名索引：在本地拒绝引用不存在指标的查询，省去一次 Prometheus 往返
+        self.metric_indexes: Dict[str, MetricIndex] = {}
+        if self.config.metric_index.enabled:
+            for name, client in self.datasource_router.clients.items():
+                index = MetricIndex(
+                    client,
+                    refresh_interval=self.config.metric_index.refresh_interval,
+                    label_names=self.config.metric_index.label_names
+                )
+                index.start()
+                self.metric_indexes[name] = index
+        
+        # 大结果的解析与序列化放到进程池，避免阻塞事件循环
+        self.offloader = Offloader(
+            processes=self.config.offload.processes,
+            threshold=self.config.offload.threshold_bytes
+        )
+        
+        # 指标元数据：metrics resource 中附加各指标的 type / unit / help
+        self.metric_metadata = None
+        if self.config.metric_metadata.enabled:
+            self.metric_metadata = MetadataCache(ttl=self.config.metric_metadata.ttl)
+        
+        # 大查询结果暂存：返回 handle，由 fetch_result_page 分页取回
+        self.result_store = ResultStore(
+            max_bytes=self.config.result_store.max_bytes,
+            ttl=self.config.result_store.ttl
+        )
+        
+        # 可选的高基数查询保护
+        self.series_guard = None
+        if self.config.series_guard.enabled:
+            self.series_guard = SeriesGuard(
+                max_series=self.config.series_guard.max_series,
+                k=self.config.series_guard.k,
+                probe_ttl=self.config.series_guard.probe_ttl
+            )
         self.logger.info(f"日志级别: {self.config.logging.level}")
         self.logger.info("=" * 60)
         
-        # 初始化 Prometheus 客户端
-        self.prometheus_client = PrometheusClient(
-            base_url=self.config.prometheus.url,
-            username=self.config.prometheus.username,
-            password=self.config.prometheus.password,
-            timeout=self.config.prometheus.timeout
-        )
+        # 兼容单 datasource 的用法
+        self.prometheus_client = self.datasource_router.default_client
         
         # 初始化 resources
         self.variables_resources = {}
         self.metrics_resources = {}
         
-        self.logger.info(f"加载 {len(self.config.dashboards)} 个 dashboard...")
-        config_dir = Path(config_path).resolve().parent
-        for dashboard in self.config.dashboards:
-            # 确保 dashboard 路径是绝对路径
-            dashboard_path = Path(dashboard.path)
-            if not dashboard_path.is_absolute():
-                # 相对于配置文件所在目录（与 README 约定一致）
-                dashboard_path = (config_dir / dashboard_path).resolve()
-                self.logger.info(f"  - {dashboard.name}: 配置 path={dashboard.path} -> 解析为 {dashboard_path}")
-            else:
-                dashboard_path = dashboard_path.resolve()
-                self.logger.info(f"  - {dashboard.name}: 配置 path={dashboard.path} (绝对路径) -> {dashboard_path}")
+        # dashboard 发现：目录/glob 配置项自动注册，解析结果按文件内容 hash 缓存
+        self.dashboard_catalog = DashboardCatalog(
+            self.config.dashboards,
+            config_dir,
+            processes=self.config.dashboard_discovery.processes,
+            disk_cache=self.disk_cache
+        )
+        self.dashboards_version = 0
+        self._listing_cache: Optional[Tuple[int, List[str], List[Resource]]] = None
+        self._dashboard_digests: Dict[str, str] = {}
+        # dashboard 名称 -> 解析出的指标（内容未变化时复用，用于重建路由映射）
+        self._dashboard_metrics: Dict[str, list] = {}
+        self.logger.info(f"扫描 {len(self.config.dashboards)} 个 dashboard 配置项...")
+        started = monotonic()
+        self._load_dashboards(self.dashboard_catalog.scan())
+        self.logger.info(f"dashboard 加载完成，耗时 {monotonic() - started:.2f}s")
+        
+        # 可选的 panel 预计算：事故中首次查看 dashboard 时无需等待冷查询
+        self.prefetch_store = PrefetchStore(max_entries=self.config.prefetch.max_entries)
+        self.prefetcher = PanelPrefetcher(
+            self.datasource_router,
+            {
+                name: self.metrics_resources[f"prometheus://dashboard/{name}/metrics"].parser
+                for name in self._prefetch_names
+            },
+            self.prefetch_store,
+            interval=self.config.prefetch.interval,
+            jitter=self.config.prefetch.jitter
+        )
+        self.prefetcher.start()
+        
+        # 可选的定期重新扫描：新增/修改/删除的 dashboard 文件无需重启即可生效
+        self._rescan_stop = threading.Event()
+        if self.config.dashboard_discovery.rescan_interval > 0:
+            threading.Thread(target=self._rescan_loop, name="dashboard-rescan", daemon=True).start()
+        
+        # 创建 MCP server
+        self.server = Server("dash2insight-mcp")
+        self._setup_handlers()
+        self.logger.info("MCP Server 初始化完成")
+    
+    def _load_dashboards(self, dashboards: Dict[str, DiscoveredDashboard]):
+        """
+        根据扫描结果重建 dashboard resources
+
+        内容未变化的 dashboard 复用已有的 resource（保留变量候选值缓存）；新的字典构建完成后
+        整体替换，处理中的请求不会看到构建到一半的状态。
+        """
+        variables_resources = {}
+        metrics_resources = {}
+        dashboard_metrics = {}
+        for name, dashboard in dashboards.items():
+            var_uri = f"prometheus://dashboard/{name}/variables"
+            metrics_uri = f"prometheus://dashboard/{name}/metrics"
+            if self._dashboard_digests.get(name) == dashboard.digest:
+                variables_resources[var_uri] = self.variables_resources[var_uri]
+                metrics_resources[metrics_uri] = self.metrics_resources[metrics_uri]
+                dashboard_metrics[name] = self._dashboard_metrics[name]
+                continue
+            self.logger.info(f"  - {name}: {dashboard.path}")
             
             # Variables resource
-            var_resource = VariablesResource(
-                dashboard_name=dashboard.name,
-                dashboard_path=str(dashboard_path),
-                prometheus_client=self.prometheus_client
+            variables_resources[var_uri] = VariablesResource(
+                dashboard_name=name,
+                dashboard_path=str(dashboard.path),
+                prometheus_client=self.prometheus_client,
+                datasource_router=self.datasource_router,
+                values_cache_ttl=self.config.cache.ttl,
+                dashboard_json=dashboard.data
             )
-            var_uri = var_resource.get_uri()
-            self.variables_resources[var_uri] = var_resource
-
+            
             # Metrics resource
             metrics_resource = MetricsResource(
-                dashboard_name=dashboard.name,
-                dashboard_path=str(dashboard_path)
+                dashboard_name=name,
+                dashboard_path=str(dashboard.path),
+                dashboard_json=dashboard.data,
+                datasource_router=self.datasource_router,
+                metadata=self.metric_metadata
             )
-            metrics_uri = metrics_resource.get_uri()
-            self.metrics_resources[metrics_uri] = metrics_resource
-
-            self.logger.debug(f"    Variables URI: {var_uri}")
-            self.logger.debug(f"    Metrics URI: {metrics_uri}")
-
+            metrics_resources[metrics_uri] = metrics_resource
+            dashboard_metrics[name] = metrics_resource.parser.parse_metrics()
+        
+        # 按全部 dashboard 重建指标名 -> datasource 的映射，供查询自动路由
+        self.datasource_router.replace_metrics(
+            metric for metrics in dashboard_metrics.values() for metric in metrics
+        )
+        self._dashboard_metrics = dashboard_metrics
+        changed = self._dashboard_digests != {name: d.digest for name, d in dashboards.items()}
+        self.variables_resources = variables_resources
+        self.metrics_resources = metrics_resources
+        self._dashboard_digests = {name: d.digest for name, d in dashboards.items()}
+        self._prefetch_names = [name for name, d in dashboards.items() if d.prefetch]
+        if changed:
+            self.dashboards_version += 1
         self.logger.info(f"总共加载 {len(self.variables_resources)} 个 variables resources")
         self.logger.info(f"总共加载 {len(self.metrics_resources)} 个 metrics resources")
-        
-        # 创建 MCP server
-        self.server = Server("dash2insight-mcp")
-        self._setup_handlers()
-        self.logger.info("MCP Server 初始化完成")
-    
+
+    def _rescan_loop(self):
+        """定期重新扫描 dashboard 文件"""
+        interval = self.config.dashboard_discovery.rescan_interval
+        while not self._rescan_stop.wait(interval):
+            try:
+                version = self.dashboards_version
+                self._load_dashboards(self.dashboard_catalog.scan())
+            except Exception as e:
+                self.logger.warning(f"重新扫描 dashboard 失败: {e}")
+                continue
+            if self.dashboards_version == version:
+                continue
+            self.logger.info(f"dashboard 已变化，当前 {len(self.metrics_resources)} 个")
+            # 预计算只覆盖启动时标记的 dashboard，这里更新其解析器
+            for name in list(self.prefetcher.dashboards):
+                resource = self.metrics_resources.get(f"prometheus://dashboard/{name}/metrics")
+                if resource is not None:
+                    self.prefetcher.dashboards[name] = resource.parser
+
+    def _resource_listing(self) -> Tuple[List[str], List[Resource]]:
+        """
+        按 URI 排序的 resource 列表
+
+        只在 dashboard 集合变化（dashboards_version 增加）后重建，list_resources 不必每次
+        重新生成所有 Resource 及其描述。
+        """
+        cached = self._listing_cache
+        if cached is not None and cached[0] == self.dashboards_version:
+            return cached[1], cached[2]
+        version = self.dashboards_version
+        resources = []
+        for uri, resource in self.variables_resources.items():
+            resources.append(Resource(
+                uri=uri,
+                name=f"📊 {resource.dashboard_name} - Variables",
+                description=(
+                    f"【优先阅读】Dashboard '{resource.dashboard_name}' 的变量定义和可用标签值。\n"
+                    "包含所有可用的变量（如 cluster、namespace、pod 等）及其候选值，"
+                    "这些变量可以在 PromQL 查询中使用。\n"
+                    "支持下钻：在 URI 后追加 ?变量名=取值（如 ?cluster=xxx），依赖该变量的子变量会按此取值解析候选值。\n"
+                    "⚠️ 在构造任何 PromQL 查询前，必须先阅读此资源！"
+                ),
+                mimeType=resource.get_mime_type()
+            ))
+        for uri, resource in self.metrics_resources.items():
+            resources.append(Resource(
+                uri=uri,
+                name=f"📈 {resource.dashboard_name} - Metrics",
+                description=(
+                    f"【优先阅读】Dashboard '{resource.dashboard_name}' 的所有可用监控指标列表。\n"
+                    "包含每个指标的名称、描述、查询模板和用途说明。\n"
+                    "这是构造 PromQL 查询的必读资源，所有可用指标都在这里。\n"
+                    "⚠️ 不要猜测指标名称，直接从此资源中获取准确的指标信息！"
+                ),
+                mimeType=resource.get_mime_type()
+            ))
+        # 同一 dashboard 的 metrics 与 variables 相邻
+        resources.sort(key=lambda resource: str(resource.uri))
+        uris = [str(resource.uri) for resource in resources]
+        self._listing_cache = (version, uris, resources)
+        return uris, resources
+
     def _setup_handlers(self):
         """设置 MCP 处理器"""
         
-        @self.server.list_resources()
-        async def list_resources() -> list[Resource]:
-            """列出所有可用的 resources"""
-            self.logger.debug("收到 list_resources 请求")
-            resources = []
+        async def list_resources(request: ListResourcesRequest) -> ServerResult:
+            """列出 resources（支持 cursor 分页）"""
+            cursor = request.params.cursor if request.params else None
+            self.logger.debug(f"收到 list_resources 请求, cursor={cursor}")
+            uris, resources = self._resource_listing()
             
-            # 添加 variables resources
-            for uri, resource in self.variables_resources.items():
-                resources.append(Resource(
-                    uri=uri,
-                    name=f"📊 {resource.dashboard_name} - Variables",
-                    description=(
-                        f"【优先阅读】Dashboard '{resource.dashboard_name}' 的变量定义和可用标签值。\n"
-                        "包含所有可用的变量（如 cluster、namespace、pod 等）及其候选值，"
-                        "这些变量可以在 PromQL 查询中使用。\n"
-                        "⚠️ 在构造任何 PromQL 查询前，必须先阅读此资源！"
-                    ),
-                    mimeType=resource.get_mime_type()
-                ))
+            page_size = self.config.output.resource_page_size
+            start = 0
+            if cursor:
+                try:
+                    last_uri = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+                except (ValueError, UnicodeDecodeError):
+                    raise McpError(ErrorData(code=INVALID_PARAMS, message=f"无效的 cursor: {cursor}"))
+                # cursor 记录上一页最后一个 URI：dashboard 集合在翻页期间变化也不会重复或跳过未变化的项
+                start = bisect_right(uris, last_uri)
+            end = start + page_size if page_size > 0 else len(resources)
+            page = resources[start:end]
+            next_cursor = None
+            if end < len(resources):
+                next_cursor = base64.urlsafe_b64encode(uris[end - 1].encode("utf-8")).decode("ascii")
             
-            # 添加 metrics resources
-            for uri, resource in self.metrics_resources.items():
-                resources.append(Resource(
-                    uri=uri,
-                    name=f"📈 {resource.dashboard_name} - Metrics",
+            self.logger.info(f"返回 {len(page)}/{len(resources)} 个 resources")
+            return ServerResult(ListResourcesResult(resources=page, nextCursor=next_cursor))
+        
+        # 较早版本 SDK 的 list_resources 装饰器不把请求（及其中的 cursor）传给处理函数，直接注册请求处理器
+        self.server.request_handlers[ListResourcesRequest] = list_resources
+        
+        @self.server.list_resource_templates()
+        async def list_resource_templates() -> list[ResourceTemplate]:
+            """列出 resource URI 模板，客户端无需枚举全部 resources 即可按 dashboard 名称读取"""
+            return [
+                ResourceTemplate(
+                    uriTemplate="prometheus://dashboard/{dashboard_name}/variables",
+                    name="📊 Dashboard Variables",
                     description=(
-                        f"【优先阅读】Dashboard '{resource.dashboard_name}' 的所有可用监控指标列表。\n"
-                        "包含每个指标的名称、描述、查询模板和用途说明。\n"
-                        "这是构造 PromQL 查询的必读资源，所有可用指标都在这里。\n"
-                        "⚠️ 不要猜测指标名称，直接从此资源中获取准确的指标信息！"
+                        "Dashboard 的变量定义和可用标签值（cluster、namespace、pod 等）。\n"
+                        "支持下钻：在 URI 后追加 ?变量名=取值（如 ?cluster=xxx）。"
                     ),
-                    mimeType=resource.get_mime_type()
-                ))
-            
-            self.logger.info(f"返回 {len(resources)} 个 resources")
-            return resources
+                    mimeType="application/json"
+                ),
+                ResourceTemplate(
+                    uriTemplate="prometheus://dashboard/{dashboard_name}/metrics",
+                    name="📈 Dashboard Metrics",
+                    description="Dashboard 的所有可用监控指标（panel 标题、描述和 PromQL 表达式）。",
+                    mimeType="application/json"
+                ),
+            ]
         
         @self.server.read_resource()
         async def read_resource(uri) -> str:
@@ -164,15 +402,27 @@ class PrometheusServer:
             self.logger.debug(f"已注册的 variables resources: {list(self.variables_resources.keys())}")
             self.logger.debug(f"已注册的 metrics resources: {list(self.metrics_resources.keys())}")
 
-            # 查找 variables resource
-            if uri_str in self.variables_resources:
-                content = self.variables_resources[uri_str].get_content()
+            # variables resource 支持通过查询参数下钻，例如 .../variables?cluster=c1&namespace=a&namespace=b
+            base_uri, _, query_string = uri_str.partition("?")
+            if base_uri in self.variables_resources:
+                selected = {
+                    name: values[0] if len(values) == 1 else values
+                    for name, values in parse_qs(query_string).items()
+                }
+                # 变量候选值需要同步请求 Prometheus，放到线程池中执行，避免阻塞其他会话
+                loop = asyncio.get_event_loop()
+                content = await loop.run_in_executor(
+                    None,
+                    lambda: self.variables_resources[base_uri].get_content(selected)
+                )
                 self.logger.debug(f"返回 variables resource，大小: {len(content)} bytes")
                 return content
             
             # 查找 metrics resource
             if uri_str in self.metrics_resources:
-                content = self.metrics_resources[uri_str].get_content()
+                # 指标元数据可能需要请求 Prometheus，放到线程池中执行
+                loop = asyncio.get_event_loop()
+                content = await loop.run_in_executor(None, self.metrics_resources[uri_str].get_content)
                 self.logger.debug(f"返回 metrics resource，大小: {len(content)} bytes")
                 return content
             
@@ -270,7 +520,40 @@ class PrometheusServer:
         @self.server.list_tools()
         async def list_tools() -> list[Tool]:
             """列出所有可用的 tools"""
-            return [
+            datasource_schema = {
+                "type": "string",
+                "description": (
+                    f"可选的 datasource 名称，可用: {', '.join(self.datasource_router.names())}。"
+                    "不指定时根据查询中的指标名自动路由到其所在 dashboard panel 的 datasource，"
+                    f"无法判断时使用默认 datasource（{self.datasource_router.default}）"
+                )
+            }
+            budget_schema = {
+                "type": "integer",
+                "description": (
+                    f"可选的输出预算（字符数，约 4 个字符一个 token），默认 {self.config.output.budget or '不限制'}。"
+                    "结果超过预算时依次去掉缩进、提取公共 label、抽样序列、降采样，"
+                    "省略的内容记录在 output_shaping 字段中"
+                ),
+                "minimum": 0
+            }
+            store_schema = {
+                "type": "boolean",
+                "description": (
+                    "是否把结果暂存在 server 上，只返回 handle 与概要（序列数、label 键、时间范围），"
+                    "再用 fetch_result_page 分页取回需要的部分。"
+                    + (f"不指定时响应超过 {self.config.result_store.auto_threshold_bytes} bytes 自动暂存"
+                       if self.config.result_store.auto_threshold_bytes > 0 else "默认 false")
+                )
+            }
+            timeout_schema = {
+                "type": "string",
+                "description": (
+                    "可选的调用超时时间，例如 '10s'、'1m'。超时后立即中断发往 Prometheus 的请求，"
+                    "剩余时间也会作为 timeout 参数传给 Prometheus，使其提前停止计算"
+                )
+            }
+            tools = [
                 Tool(
                     name="prometheus_query",
                     description=(
@@ -291,7 +574,11 @@ class PrometheusServer:
                             "time": {
                                 "type": "string",
                                 "description": "可选的查询时间点，支持 RFC3339 格式（2023-01-01T00:00:00Z）或 Unix 时间戳（1234567890）。不指定则查询当前时间。"
-                            }
+                            },
+                            "output_budget": budget_schema,
+                            "store_result": store_schema,
+                            "timeout": timeout_schema,
+                            "datasource": datasource_schema
                         },
                         "required": ["query"]
                     }
@@ -315,22 +602,252 @@ class PrometheusServer:
                             },
                             "start": {
                                 "type": "string",
-                                "description": "起始时间，支持 RFC3339 格式或 Unix 时间戳"
+                                "description": (
+                                    "起始时间，支持 RFC3339 格式、Unix 时间戳或相对时间（如 'now-6h'）。"
+                                    "周期性查询最近一段时间时使用相对时间，server 只向 Prometheus 请求新增的部分"
+                                )
                             },
                             "end": {
                                 "type": "string",
-                                "description": "结束时间，支持 RFC3339 格式或 Unix 时间戳"
+                                "description": "结束时间，支持 RFC3339 格式、Unix 时间戳或 'now'"
                             },
                             "step": {
                                 "type": "string",
-                                "description": "查询步长，例如 '1m'（1分钟）、'5m'（5分钟）、'1h'（1小时），默认为 '1m'",
-                                "default": "1m"
+                                "description": (
+                                    "查询步长，例如 '1m'（1分钟）、'5m'（5分钟）、'1h'（1小时）。"
+                                    f"不指定时按 max_data_points（默认 {self.DEFAULT_MAX_DATA_POINTS}）自动选择；"
+                                    "与 max_data_points 同时指定时作为步长下限"
+                                )
+                            },
+                            "max_data_points": {
+                                "type": "integer",
+                                "description": (
+                                    "每条时间序列的最大点数。server 选择不超过该点数的最小整齐步长，"
+                                    "并把 start/end 对齐到步长边界；实际使用的步长在返回结果的 range 字段中"
+                                ),
+                                "minimum": 2
+                            },
+                            "output_budget": budget_schema,
+                            "store_result": store_schema,
+                            "timeout": timeout_schema,
+                            "datasource": datasource_schema
+                        },
+                        "required": ["query", "start", "end"]
+                    }
+                ),
+                Tool(
+                    name="dashboard_snapshot",
+                    description=(
+                        "获取 dashboard 当前状态的快照：按变量当前值（或传入的覆盖值）替换后，"
+                        "并行执行 dashboard 中所有 panel 的 PromQL 即时查询，每个 panel 的查询自动路由到其 datasource。\n\n"
+                        "适合快速了解一个 dashboard 的整体情况；dashboard 名称可从 Resources 列表中获取。"
+                    ),
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "dashboard": {
+                                "type": "string",
+                                "description": "dashboard 名称（即 prometheus://dashboard/{dashboard_name}/metrics 中的 dashboard_name）"
+                            },
+                            "variables": {
+                                "type": "object",
+                                "description": "可选的变量取值覆盖，例如 {\"cluster\": \"CN_PULSAR_TEST\"}；多值可传数组",
+                                "additionalProperties": {
+                                    "anyOf": [
+                                        {"type": "string"},
+                                        {"type": "array", "items": {"type": "string"}}
+                                    ]
+                                }
+                            },
+                            "time": {
+                                "type": "string",
+                                "description": "可选的查询时间点，支持 RFC3339 格式或 Unix 时间戳，不指定则查询当前时间"
+                            },
+                            "max_series": {
+                                "type": "integer",
+                                "description": "每个 panel 最多返回的时间序列数，默认 10",
+                                "default": 10
+                            }
+                        },
+                        "required": ["dashboard"]
+                    }
+                ),
+                Tool(
+                    name="fetch_result_page",
+                    description=(
+                        "分页取回 store_result=true 时暂存在 server 上的查询结果，不会重新查询 Prometheus。\n\n"
+                        "可以按 label 精确过滤序列、按时间切片（仅范围查询结果），"
+                        "用上一页返回的 next_cursor 继续取下一页。结果在最后一次访问后保留一段时间"
+                    ),
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "handle": {
+                                "type": "string",
+                                "description": "查询返回的结果 handle（如 r-0123abcd...）"
+                            },
+                            "cursor": {
+                                "type": "string",
+                                "description": "上一页返回的 next_cursor，不指定则从第一条序列开始"
+                            },
+                            "limit": {
+                                "type": "integer",
+                                "description": f"每页返回的序列数，默认 20，最多 {MAX_PAGE_SIZE}",
+                                "default": 20,
+                                "minimum": 1,
+                                "maximum": MAX_PAGE_SIZE
+                            },
+                            "match": {
+                                "type": "object",
+                                "description": "按 label 精确过滤，例如 {\"instance\": \"host-1:9100\"}",
+                                "additionalProperties": {"type": "string"}
+                            },
+                            "start": {
+                                "type": "string",
+                                "description": "可选的时间切片起点（RFC3339 或 Unix 时间戳），仅对范围查询结果有效"
+                            },
+                            "end": {
+                                "type": "string",
+                                "description": "可选的时间切片终点（RFC3339 或 Unix 时间戳），仅对范围查询结果有效"
                             }
                         },
+                        "required": ["handle"]
+                    }
+                ),
+                Tool(
+                    name="compare_windows",
+                    description=(
+                        "对比同一个 PromQL 在两个时间窗口的结果（例如\"和上周同一时间相比是否变差\"）。\n\n"
+                        "server 并行执行两次范围查询，按序列对齐到同一时间网格后计算均值差和比值，"
+                        "只返回变化最大的若干序列、汇总统计以及只出现在一个窗口中的序列，"
+                        "不返回原始数据点。基线窗口用 offset（如 '1w'）或 baseline_start 指定"
+                    ),
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "query": {
+                                "type": "string",
+                                "description": "PromQL 查询语句。指标名称必须从 Resources 中获取"
+                            },
+                            "start": {
+                                "type": "string",
+                                "description": "当前窗口起始时间，支持 RFC3339 格式、Unix 时间戳或相对时间（如 'now-1h'）"
+                            },
+                            "end": {
+                                "type": "string",
+                                "description": "当前窗口结束时间，支持 RFC3339 格式、Unix 时间戳或 'now'"
+                            },
+                            "offset": {
+                                "type": "string",
+                                "description": "基线窗口相对当前窗口提前的时长，例如 '1d'、'1w'；默认 1w"
+                            },
+                            "baseline_start": {
+                                "type": "string",
+                                "description": "基线窗口起始时间（替代 offset），窗口长度与当前窗口相同"
+                            },
+                            "step": {
+                                "type": "string",
+                                "description": f"查询步长；不指定时按 {self.DEFAULT_MAX_DATA_POINTS} 个点自动选择"
+                            },
+                            "top": {
+                                "type": "integer",
+                                "description": "返回变化最大的序列数，默认 10",
+                                "default": 10
+                            },
+                            "timeout": timeout_schema,
+                            "datasource": datasource_schema
+                        },
+                        "required": ["query", "start", "end"]
+                    }
+                ),
+                Tool(
+                    name="histogram_quantiles",
+                    description=(
+                        "对经典直方图（_bucket 序列）在本地计算任意多个分位数和 bucket 分布。\n\n"
+                        "server 只执行一次范围查询取回 bucket 序列，p50/p90/p99/p999 等分位数"
+                        "（规则与 histogram_quantile 相同）以及各 bucket 的观测占比都在本地计算，"
+                        "比为每个分位数分别执行一次 histogram_quantile 范围查询便宜得多。"
+                        "返回每个分组每个分位数的 last/min/max/avg"
+                    ),
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "query": {
+                                "type": "string",
+                                "description": (
+                                    "返回 bucket 序列（保留 le label）的 PromQL，例如 "
+                                    "'sum by (le, instance) (rate(http_request_duration_seconds_bucket{job=\"api\"}[5m]))'"
+                                )
+                            },
+                            "quantiles": {
+                                "type": "array",
+                                "items": {"type": "number", "minimum": 0, "maximum": 1},
+                                "description": "要计算的分位数，默认 [0.5, 0.9, 0.99, 0.999]"
+                            },
+                            "start": {
+                                "type": "string",
+                                "description": "起始时间，支持 RFC3339 格式、Unix 时间戳或相对时间（如 'now-1h'）"
+                            },
+                            "end": {
+                                "type": "string",
+                                "description": "结束时间，支持 RFC3339 格式、Unix 时间戳或 'now'"
+                            },
+                            "step": {
+                                "type": "string",
+                                "description": f"查询步长；不指定时按 {self.DEFAULT_MAX_DATA_POINTS} 个点自动选择"
+                            },
+                            "include_points": {
+                                "type": "boolean",
+                                "description": "是否同时返回每个分位数的时间序列，默认 false",
+                                "default": False
+                            },
+                            "timeout": timeout_schema,
+                            "datasource": datasource_schema
+                        },
                         "required": ["query", "start", "end"]
                     }
                 )
             ]
+            remote_read_sources = [
+                name for name, client in self.datasource_router.clients.items() if client.remote_read_enabled
+            ]
+            if remote_read_sources:
+                tools.append(Tool(
+                    name="prometheus_raw_series",
+                    description=(
+                        "通过 Prometheus remote-read API 获取一个序列选择器在时间范围内的全部原始样本，"
+                        "在 server 端汇总后返回每条序列的 count/min/max/avg/first/last。\n\n"
+                        "适合对少量指标做数天到数周的长窗口分析：不按 step 计算 PromQL，"
+                        "比 prometheus_range_query 对 Prometheus 和 server 的开销都小得多。"
+                        f"仅支持以下 datasource: {', '.join(remote_read_sources)}"
+                    ),
+                    inputSchema={
+                        "type": "object",
+                        "properties": {
+                            "selector": {
+                                "type": "string",
+                                "description": "即时向量选择器（不能是表达式），例如 'node_load1{instance=\"host:9100\"}'"
+                            },
+                            "start": {
+                                "type": "string",
+                                "description": "起始时间，支持 RFC3339 格式或 Unix 时间戳"
+                            },
+                            "end": {
+                                "type": "string",
+                                "description": "结束时间，支持 RFC3339 格式或 Unix 时间戳"
+                            },
+                            "max_series": {
+                                "type": "integer",
+                                "description": "最多返回的时间序列数，默认 50",
+                                "default": 50
+                            },
+                            "timeout": timeout_schema,
+                            "datasource": datasource_schema
+                        },
+                        "required": ["selector", "start", "end"]
+                    }
+                ))
+            return tools
         
         @self.server.call_tool()
         async def call_tool(name: str, arguments: Any) -> Sequence[TextContent]:
@@ -338,15 +855,44 @@ class PrometheusServer:
             self.logger.info(f"调用 tool: {name}")
             self.logger.debug(f"参数: {arguments}")
             
+            try:
+                self.admission.check_session(self._session_id())
+            except ServerBusyError as e:
+                self.logger.warning(f"tool 调用被限速: {e}")
+                return [TextContent(type="text", text=str(e))]
+            
             if name == "prometheus_query":
                 return await self._handle_prometheus_query(arguments)
             elif name == "prometheus_range_query":
                 return await self._handle_prometheus_range_query(arguments)
+            elif name == "fetch_result_page":
+                return await self._handle_fetch_result_page(arguments)
+            elif name == "dashboard_snapshot":
+                return await self._handle_dashboard_snapshot(arguments)
+            elif name == "prometheus_raw_series":
+                return await self._handle_prometheus_raw_series(arguments)
+            elif name == "compare_windows":
+                return await self._handle_compare_windows(arguments)
+            elif name == "histogram_quantiles":
+                return await self._handle_histogram_quantiles(arguments)
             else:
                 self.logger.error(f"未知的 tool: {name}")
                 raise ValueError(f"未知的 tool: {name}")
     
 
+    def _session_id(self) -> Optional[str]:
+        """当前 MCP 会话标识（不在请求上下文中时返回 None）"""
+        try:
+            return str(id(self.server.request_context.session))
+        except LookupError:
+            return None
+
+    def _check_metrics(self, datasource: str, query: str):
+        """用 datasource 的指标名索引校验查询（未启用或索引未加载时跳过）"""
+        index = self.metric_indexes.get(datasource)
+        if index is not None:
+            index.validate(query)
+
     async def _handle_prometheus_query(self, arguments: dict) -> Sequence[TextContent]:
         """处理 prometheus_query tool 调用"""
         query = arguments.get("query")
@@ -356,24 +902,56 @@ class PrometheusServer:
             self.logger.error("query 参数缺失")
             raise ValueError("query 参数是必需的")
         
-        self.logger.info(f"执行 Prometheus 查询: {query[:100]}...")
+        datasource = self.datasource_router.route(query, arguments.get("datasource"))
+        client = self.datasource_router.clients[datasource]
+        self.logger.info(f"执行 Prometheus 查询 (datasource={datasource}): {query[:100]}...")
         
+        prefetched = self._prefetched(datasource, query) if not time else None
+        if prefetched is not None:
+            self.logger.info("查询命中 panel 预计算结果")
+            return [TextContent(
+                type="text",
+                text=shape(prefetched, self._output_budget(arguments), is_compact())
+            )]
 
         try:
             # 在线程池中执行同步的 Prometheus 查询
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None, 
-                lambda: self.prometheus_client.query(query, time)
-            )
+            def run_query():
+                self._check_metrics(datasource, query)
+                guard = self._guard(client, query, time)
+                result = client.query(guard.query if guard else query, time, raw=True)
+                if guard:
+                    result = result.with_fields(series_guard=guard.to_dict(self.series_guard.k))
+                return result
+
+            result = await self._run_call(run_query, self._call_timeout(arguments))
             
-            result_count = len(result.get("data", {}).get("result", []))
-            self.logger.info(f"查询成功，返回 {result_count} 条结果")
+            self.logger.info(f"查询成功，响应 {len(result)} bytes")
+            if self._should_store(arguments, result):
+                return [TextContent(type="text", text=await self._store_result(query, result))]
             
-            import json
+            # 结果原样透传：紧凑输出时直接使用响应体，不解析再序列化
+            return [TextContent(
+                type="text",
+                text=await self.offloader.render(result, self._output_budget(arguments))
+            )]
+        except ServerBusyError as e:
+            self.logger.warning(f"查询被准入控制拒绝: {e}")
+            return [TextContent(
+                type="text",
+                text=str(e)
+            )]
+        except UnknownMetricError as e:
+            self.logger.info(f"查询被指标名索引拒绝: {e}")
             return [TextContent(
                 type="text",
-                text=json.dumps(result, indent=2, ensure_ascii=False)
+                text=f"查询失败: {str(e)}"
+            )]
+        except RequestCancelled as e:
+            self.logger.warning(f"查询超时: {e}")
+            return [TextContent(
+                type="text",
+                text=f"查询失败: {str(e)}"
             )]
         except Exception as e:
             self.logger.error(f"查询失败: {e}", exc_info=True)
@@ -382,35 +960,192 @@ class PrometheusServer:
                 text=f"查询失败: {str(e)}"
             )]
     
+    def _should_store(self, arguments: dict, result) -> bool:
+        """结果是否暂存在 server 上、只返回 handle 与概要"""
+        store = arguments.get("store_result")
+        if store is not None:
+            return bool(store)
+        threshold = self.config.result_store.auto_threshold_bytes
+        return threshold > 0 and len(result) >= threshold
+
+    async def _store_result(self, query: str, result) -> str:
+        """暂存查询结果，返回 handle 与概要"""
+        # 解析与转换是主要开销，和其他大响应一样按数据量交给 offloader
+        decoded = await self.offloader.run(len(result), decode_result, result.raw)
+        overview = self.result_store.add(query, *decoded).overview()
+        overview["note"] = "结果已暂存在 server 上，使用 fetch_result_page 按 handle 分页取回需要的序列"
+        return json_dumps(overview)
+
+    def _output_budget(self, arguments: dict) -> int:
+        """tool 输出预算：调用参数优先，其次配置的默认值"""
+        budget = arguments.get("output_budget")
+        return self.config.output.budget if budget is None else int(budget)
+
+    @staticmethod
+    def _call_timeout(arguments: dict) -> Optional[float]:
+        """解析 tool 参数中的 timeout（秒），未指定时返回 None"""
+        value = arguments.get("timeout")
+        if value in (None, ""):
+            return None
+        seconds = parse_duration(value)
+        if not seconds or seconds <= 0:
+            raise ValueError(f"无法解析的 timeout: {value}")
+        return seconds
+
+    async def _run_call(self, func, timeout: Optional[float] = None, deadline: Optional[float] = None):
+        """
+        在线程池中执行 tool 调用的同步查询
+
+        MCP 客户端取消调用（notifications/cancelled）时协程收到 CancelledError，此时取消令牌，
+        立即中断正在进行的 HTTP 请求并跳过剩余重试，工作线程随即释放；timeout 到期同理。
+
+        Args:
+            func: 同步函数
+            timeout: 调用超时（秒）
+            deadline: 截止时间（monotonic() 时刻），多个分步执行的调用共用同一截止时间时代替 timeout
+        """
+        token = CancelToken()
+        if deadline is None and timeout:
+            deadline = monotonic() + timeout
+
+        def run():
+            with call_scope(token, deadline):
+                return func()
+
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(None, run)
+        except asyncio.CancelledError:
+            token.cancel()
+            self.logger.info("tool 调用已取消，中断进行中的 Prometheus 请求")
+            raise
+
+    async def _run_calls(self, funcs, deadline: Optional[float] = None) -> list:
+        """
+        并发执行多个 _run_call
+
+        任一调用失败时立即取消其余调用（中断其进行中的上游请求）并抛出该异常，
+        避免失败后另一个查询仍在 Prometheus 上执行到结束。
+        """
+        tasks = [asyncio.ensure_future(self._run_call(func, deadline=deadline)) for func in funcs]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for task in tasks:
+            if task in done and task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+
+    def _guard(self, client, query: str, query_time: Optional[str], window: Optional[float] = None,
+               step: Optional[str] = None):
+        """高基数查询保护（未启用时返回 None）"""
+        if self.series_guard is None:
+            return None
+        return self.series_guard.check(client, query, query_time, window, step)
+
+    def _prefetched(self, datasource: str, expr: str) -> Optional[dict]:
+        """当前时间的即时查询：返回仍有效的预计算结果（附带计算时间），没有时返回 None"""
+        entry = self.prefetch_store.get(datasource, expr, self.prefetcher.max_age)
+        if entry is None:
+            return None
+        evaluated_at, result = entry
+        return {**result, "prefetched_at": evaluated_at}
+
+    def _resolve_range(self, start: str, end: str, step: Optional[str],
+                       max_data_points: Optional[int]) -> Tuple[str, str, str]:
+        """
+        确定范围查询的 start/end/step
+
+        显式指定 step 且未指定 max_data_points 时原样使用；否则按点数预算选择整齐步长
+        （显式 step 作为下限），并把 start/end 对齐到步长边界，使相近的查询参数一致、便于缓存。
+        相对时间（"now-6h"）换算为时间戳并对齐到步长边界，使轮询请求的求值时间点保持一致，
+        可以复用滑动窗口缓存。
+        """
+        relative = is_relative(start) or is_relative(end)
+        if step and not max_data_points and not relative:
+            return start, end, step
+        start_ts, end_ts = parse_timestamp(start), parse_timestamp(end)
+        if start_ts is None or end_ts is None or end_ts <= start_ts:
+            # 无法解析的时间交给 Prometheus 报错
+            return start, end, step or "1m"
+        if step and not max_data_points:
+            step_seconds = parse_duration(step)
+            if not step_seconds or step_seconds <= 0:
+                return str(int(start_ts)), str(int(end_ts)), step
+            start_ts, end_ts = align_range(start_ts, end_ts, step_seconds)
+            return str(int(start_ts)), str(int(end_ts)), step
+        min_step = parse_duration(step) if step else self.MIN_AUTO_STEP
+        budget = int(max_data_points or self.DEFAULT_MAX_DATA_POINTS)
+        step_seconds = choose_step(start_ts, end_ts, budget, min_step or 0)
+        start_ts, end_ts = align_range(start_ts, end_ts, step_seconds)
+        self.logger.debug(f"自动步长: {format_duration(step_seconds)}（max_data_points={budget}）")
+        return str(int(start_ts)), str(int(end_ts)), format_duration(step_seconds)
+
     async def _handle_prometheus_range_query(self, arguments: dict) -> Sequence[TextContent]:
         """处理 prometheus_range_query tool 调用"""
         query = arguments.get("query")
         start = arguments.get("start")
         end = arguments.get("end")
-        step = arguments.get("step", "1m")
+        step = arguments.get("step")
+        max_data_points = arguments.get("max_data_points")
         
         if not query or not start or not end:
             self.logger.error("query/start/end 参数缺失")
             raise ValueError("query, start, end 参数是必需的")
         
-        self.logger.info(f"执行 Prometheus 范围查询: {query[:100]}... (start={start}, end={end}, step={step})")
+        start, end, step = self._resolve_range(start, end, step, max_data_points)
+        datasource = self.datasource_router.route(query, arguments.get("datasource"))
+        client = self.datasource_router.clients[datasource]
+        self.logger.info(f"执行 Prometheus 范围查询 (datasource={datasource}): {query[:100]}... (start={start}, end={end}, step={step})")
         
 
         try:
             # 在线程池中执行同步的 Prometheus 查询
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                lambda: self.prometheus_client.range_query(query, start, end, step)
-            )
+            def run_query():
+                self._check_metrics(datasource, query)
+                window = parse_timestamp(end) - parse_timestamp(start) if self.series_guard else None
+                guard = self._guard(client, query, end, window, step)
+                result = client.range_query(guard.query if guard else query, start, end, step, raw=True)
+                if guard:
+                    result = result.with_fields(series_guard=guard.to_dict(self.series_guard.k))
+                return result
+
+            result = await self._run_call(run_query, self._call_timeout(arguments))
             
-            result_count = len(result.get("data", {}).get("result", []))
-            self.logger.info(f"范围查询成功，返回 {result_count} 条时间序列")
+            self.logger.info(f"范围查询成功，响应 {len(result)} bytes")
+            # 告知调用方实际使用的时间范围和步长（直接追加到响应体末尾，不解析响应）
+            result = result.with_fields(range={"start": start, "end": end, "step": step})
+            if self._should_store(arguments, result):
+                return [TextContent(type="text", text=await self._store_result(query, result))]
             
-            import json
             return [TextContent(
                 type="text",
-                text=json.dumps(result, indent=2, ensure_ascii=False)
+                text=await self.offloader.render(result, self._output_budget(arguments))
+            )]
+        except ServerBusyError as e:
+            self.logger.warning(f"范围查询被准入控制拒绝: {e}")
+            return [TextContent(
+                type="text",
+                text=str(e)
+            )]
+        except UnknownMetricError as e:
+            self.logger.info(f"范围查询被指标名索引拒绝: {e}")
+            return [TextContent(
+                type="text",
+                text=f"范围查询失败: {str(e)}"
+            )]
+        except RequestCancelled as e:
+            self.logger.warning(f"范围查询超时: {e}")
+            return [TextContent(
+                type="text",
+                text=f"范围查询失败: {str(e)}"
             )]
         except Exception as e:
             self.logger.error(f"范围查询失败: {e}", exc_info=True)
@@ -419,22 +1154,344 @@ class PrometheusServer:
                 text=f"范围查询失败: {str(e)}"
             )]
     
-    async def run(self):
-        """运行 MCP server"""
-        self.logger.info("启动 MCP Server，等待客户端连接...")
+    async def _handle_prometheus_raw_series(self, arguments: dict) -> Sequence[TextContent]:
+        """处理 prometheus_raw_series tool 调用"""
+        selector = arguments.get("selector")
+        start = parse_timestamp(arguments.get("start"))
+        end = parse_timestamp(arguments.get("end"))
+        max_series = int(arguments.get("max_series", 50))
+        
+        if not selector or start is None or end is None:
+            self.logger.error("selector/start/end 参数缺失或无法解析")
+            raise ValueError("selector, start, end 参数是必需的（时间支持 RFC3339 或 Unix 时间戳）")
+        
+        datasource = self.datasource_router.route(selector, arguments.get("datasource"))
+        client = self.datasource_router.clients[datasource]
+        if not client.remote_read_enabled:
+            return [TextContent(
+                type="text",
+                text=f"datasource {datasource} 未启用 remote-read，请使用 prometheus_range_query"
+            )]
+        self.logger.info(f"remote-read (datasource={datasource}): {selector[:100]} (start={start}, end={end})")
+        
         try:
-            async with stdio_server() as (read_stream, write_stream):
-                await self.server.run(
-                    read_stream,
-                    write_stream,
-                    self.server.create_initialization_options()
-                )
+            def run_read():
+                self._check_metrics(datasource, selector)
+                return client.remote_read(selector, start, end)
+
+            series = await self._run_call(run_read, self._call_timeout(arguments))
+            total_samples = sum(len(item) for item in series)
+            self.logger.info(f"remote-read 成功，{len(series)} 条序列，{total_samples} 个样本")
+            
+            return [TextContent(
+                type="text",
+                text=json_dumps({
+                    "selector": selector,
+                    "datasource": datasource,
+                    "total_series": len(series),
+                    "total_samples": total_samples,
+                    "series": [
+                        {"labels": item.labels, "summary": summarize(item)}
+                        for item in series[:max_series]
+                    ]
+                })
+            )]
+        except (ServerBusyError, UnknownMetricError, RequestCancelled) as e:
+            self.logger.warning(f"remote-read 被拒绝或超时: {e}")
+            return [TextContent(type="text", text=f"remote-read 失败: {str(e)}")]
+        except Exception as e:
+            self.logger.error(f"remote-read 失败: {e}", exc_info=True)
+            return [TextContent(
+                type="text",
+                text=f"remote-read 失败: {str(e)}"
+            )]
+    
+    async def _handle_compare_windows(self, arguments: dict) -> Sequence[TextContent]:
+        """处理 compare_windows tool 调用"""
+        query = arguments.get("query")
+        if not query or not arguments.get("start") or not arguments.get("end"):
+            self.logger.error("query/start/end 参数缺失")
+            raise ValueError("query, start, end 参数是必需的")
+        
+        start, end, step = self._resolve_range(
+            arguments["start"], arguments["end"], arguments.get("step"), None
+        )
+        start_ts, end_ts, step_seconds = parse_timestamp(start), parse_timestamp(end), parse_duration(step)
+        if start_ts is None or end_ts is None or not step_seconds or end_ts <= start_ts:
+            raise ValueError(f"无法解析的时间范围: start={start}, end={end}, step={step}")
+        if arguments.get("baseline_start"):
+            baseline_start = parse_timestamp(arguments["baseline_start"])
+            if baseline_start is None:
+                raise ValueError(f"无法解析的 baseline_start: {arguments['baseline_start']}")
+            # 基线窗口与当前窗口使用相同的网格相位
+            shift = round((start_ts - baseline_start) / step_seconds) * step_seconds
+        else:
+            shift = parse_duration(arguments.get("offset") or "1w")
+            if not shift:
+                raise ValueError(f"无法解析的 offset: {arguments.get('offset')}")
+        top = int(arguments.get("top", 10))
+        
+        datasource = self.datasource_router.route(query, arguments.get("datasource"))
+        client = self.datasource_router.clients[datasource]
+        self.logger.info(
+            f"对比时间窗口 (datasource={datasource}): {query[:100]}... "
+            f"(start={start}, end={end}, step={step}, shift={format_duration(shift)})"
+        )
+        
+        def run_query(window_start: float, window_end: float):
+            return client.range_query(query, str(int(window_start)), str(int(window_end)), step, raw=True)
+        
+        try:
+            timeout = self._call_timeout(arguments)
+            deadline = monotonic() + timeout if timeout else None
+            # 指标名校验可能刷新索引（HTTP 请求），在工作线程中执行
+            await self._run_call(lambda: self._check_metrics(datasource, query), deadline=deadline)
+            current, baseline = await self._run_calls([
+                lambda: run_query(start_ts, end_ts),
+                lambda: run_query(start_ts - shift, end_ts - shift),
+            ], deadline)
+            range_info = {"start": start, "end": end, "step": step, "offset": format_duration(shift)}
+            summary, text = await self.offloader.run(
+                len(current) + len(baseline), render_comparison,
+                current.raw, baseline.raw, start_ts, step_seconds, shift, top, range_info, is_compact()
+            )
+            self.logger.info(f"窗口对比完成: {summary}")
+            return [TextContent(
+                type="text",
+                text=text
+            )]
+        except ServerBusyError as e:
+            self.logger.warning(f"窗口对比被准入控制拒绝: {e}")
+            return [TextContent(
+                type="text",
+                text=str(e)
+            )]
+        except (UnknownMetricError, RequestCancelled) as e:
+            self.logger.info(f"窗口对比被拒绝或超时: {e}")
+            return [TextContent(
+                type="text",
+                text=f"窗口对比失败: {str(e)}"
+            )]
+        except Exception as e:
+            self.logger.error(f"窗口对比失败: {e}", exc_info=True)
+            return [TextContent(
+                type="text",
+                text=f"窗口对比失败: {str(e)}"
+            )]
+    
+    async def _handle_histogram_quantiles(self, arguments: dict) -> Sequence[TextContent]:
+        """处理 histogram_quantiles tool 调用"""
+        query = arguments.get("query")
+        if not query or not arguments.get("start") or not arguments.get("end"):
+            self.logger.error("query/start/end 参数缺失")
+            raise ValueError("query, start, end 参数是必需的")
+        quantiles = [float(q) for q in (arguments.get("quantiles") or self.DEFAULT_QUANTILES)]
+        include_points = bool(arguments.get("include_points", False))
+        
+        start, end, step = self._resolve_range(
+            arguments["start"], arguments["end"], arguments.get("step"), None
+        )
+        datasource = self.datasource_router.route(query, arguments.get("datasource"))
+        client = self.datasource_router.clients[datasource]
+        self.logger.info(
+            f"本地计算直方图分位数 (datasource={datasource}): {query[:100]}... "
+            f"(quantiles={quantiles}, start={start}, end={end}, step={step})"
+        )
+        
+        def run_query():
+            self._check_metrics(datasource, query)
+            return client.range_query(query, start, end, step, raw=True)
+        
+        try:
+            result = await self._run_call(run_query, self._call_timeout(arguments))
+            groups, text = await self.offloader.run(
+                len(result), render_histogram, result.raw, quantiles, include_points,
+                {"start": start, "end": end, "step": step}, is_compact()
+            )
+            self.logger.info(f"直方图分位数计算完成，{groups} 个分组")
+            if not groups:
+                return [TextContent(
+                    type="text",
+                    text="查询结果中没有带 le label 的 bucket 序列，请确认查询保留了 le（如 sum by (le) (...)）"
+                )]
+            return [TextContent(
+                type="text",
+                text=text
+            )]
+        except ServerBusyError as e:
+            self.logger.warning(f"直方图查询被准入控制拒绝: {e}")
+            return [TextContent(
+                type="text",
+                text=str(e)
+            )]
+        except (UnknownMetricError, RequestCancelled) as e:
+            self.logger.info(f"直方图查询被拒绝或超时: {e}")
+            return [TextContent(
+                type="text",
+                text=f"直方图分位数计算失败: {str(e)}"
+            )]
+        except Exception as e:
+            self.logger.error(f"直方图分位数计算失败: {e}", exc_info=True)
+            return [TextContent(
+                type="text",
+                text=f"直方图分位数计算失败: {str(e)}"
+            )]
+    
+    async def _handle_fetch_result_page(self, arguments: dict) -> Sequence[TextContent]:
+        """处理 fetch_result_page tool 调用"""
+        handle = arguments.get("handle")
+        if not handle:
+            raise ValueError("handle 参数是必需的")
+        start = parse_timestamp(arguments.get("start"))
+        end = parse_timestamp(arguments.get("end"))
+        if (arguments.get("start") and start is None) or (arguments.get("end") and end is None):
+            raise ValueError(f"无法解析的时间切片: start={arguments.get('start')}, end={arguments.get('end')}")
+        try:
+            entry = self.result_store.get(handle)
+        except UnknownHandleError as e:
+            self.logger.info(str(e))
+            return [TextContent(type="text", text=str(e))]
+        page = entry.page(
+            cursor=arguments.get("cursor"),
+            limit=int(arguments.get("limit") or 20),
+            match=arguments.get("match"),
+            start=start,
+            end=end
+        )
+        self.logger.info(f"取回暂存结果 {handle}: {len(page['series'])}/{page['total_matched']} 条序列")
+        return [TextContent(type="text", text=json_dumps(page))]
+
+    async def _handle_dashboard_snapshot(self, arguments: dict) -> Sequence[TextContent]:
+        """处理 dashboard_snapshot tool 调用"""
+        dashboard = arguments.get("dashboard")
+        uri = f"prometheus://dashboard/{dashboard}/metrics"
+        if not dashboard or uri not in self.metrics_resources:
+            self.logger.error(f"未知的 dashboard: {dashboard}")
+            raise ValueError(f"未知的 dashboard: {dashboard}")
+        
+        parser = self.metrics_resources[uri].parser
+        query_time = arguments.get("time")
+        max_series = int(arguments.get("max_series", 10))
+        
+        # 变量取值：dashboard 中保存的当前值，再用调用方传入的值覆盖
+        values = dashboard_values(parser, arguments.get("variables"))
+        queries = panel_queries(parser, self.datasource_router, values)
+        self.logger.info(f"生成 dashboard 快照: {dashboard}，共 {len(queries)} 个查询")
+        
+        semaphores = {
+            name: asyncio.Semaphore(self.SNAPSHOT_CONCURRENCY)
+            for name in self.datasource_router.names()
+        }
+        
+        def run_panel_query(client, expr):
+            # 快照的批量查询优先级低于交互式即时查询
+            with request_priority(PRIORITY_RANGE):
+                return client.query(expr, query_time, retry=1)
+        
+        async def evaluate(query) -> dict:
+            datasource = query.datasource
+            entry = {"title": query.title, "datasource": datasource, "expr": query.expr}
+            # 查询当前时间时优先使用后台预计算的结果
+            prefetched = self.prefetch_store.get(datasource, query.expr, self.prefetcher.max_age) \
+                if not query_time else None
+            try:
+                if prefetched is not None:
+                    entry["prefetched_at"], result = prefetched
+                else:
+                    client = self.datasource_router.clients[datasource]
+                    async with semaphores[datasource]:
+                        result = await self._run_call(lambda: run_panel_query(client, query.expr))
+                series = result.get("data", {}).get("result", [])
+                entry["total_series"] = len(series)
+                entry["result"] = series[:max_series]
+            except Exception as e:
+                entry["error"] = str(e)
+            return entry
+        
+        # 不同 datasource 的查询并行执行，每个 datasource 内受并发上限约束
+        panels = await asyncio.gather(*(evaluate(query) for query in queries))
+        failed = sum(1 for panel in panels if "error" in panel)
+        self.logger.info(f"dashboard 快照完成: {dashboard}，成功 {len(panels) - failed}，失败 {failed}")
+        
+        return [TextContent(
+            type="text",
+            text=json_dumps({
+                "dashboard": dashboard,
+                "dashboard_title": parser.get_dashboard_title(),
+                "time": query_time,
+                "variables": values,
+                "panels": panels
+            })
+        )]
+    
+    async def run(self, transport: str = "stdio", host: str = "127.0.0.1", port: int = 8000):
+        """
+        运行 MCP server
+
+        Args:
+            transport: 传输方式，stdio（默认，每个客户端一个进程）或 streamable-http（单进程服务多个客户端）
+            host: streamable-http 模式监听地址
+            port: streamable-http 模式监听端口
+        """
+        try:
+            if transport == "stdio":
+                await self._run_stdio()
+            elif transport == "streamable-http":
+                await self._run_streamable_http(host, port)
+            else:
+                raise ValueError(f"未知的 transport: {transport}")
         except Exception as e:
             self.logger.error(f"Server 运行错误: {e}", exc_info=True)
             raise
         finally:
+            self._rescan_stop.set()
+            self.offloader.shutdown()
             self.logger.info("MCP Server 已停止")
 
+    async def _run_stdio(self):
+        """以 stdio 方式运行"""
+        self.logger.info("启动 MCP Server (stdio)，等待客户端连接...")
+        async with stdio_server() as (read_stream, write_stream):
+            await self.server.run(
+                read_stream,
+                write_stream,
+                self.server.create_initialization_options()
+            )
+
+    async def _run_streamable_http(self, host: str, port: int):
+        """
+        以 Streamable HTTP 方式运行
+
+        所有会话共享同一个 PrometheusServer 实例：dashboard 解析结果、缓存以及
+        Prometheus 连接池在会话之间复用。
+        """
+        # 仅 HTTP 模式需要，延迟导入以免拖慢 stdio 模式启动
+        import contextlib
+        import uvicorn
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+        from starlette.applications import Starlette
+        from starlette.routing import Mount
+
+        session_manager = StreamableHTTPSessionManager(app=self.server)
+
+        async def handle_mcp(scope, receive, send):
+            await session_manager.handle_request(scope, receive, send)
+
+        @contextlib.asynccontextmanager
+        async def lifespan(app):
+            async with session_manager.run():
+                yield
+
+        app = Starlette(routes=[Mount("/mcp", app=handle_mcp)], lifespan=lifespan)
+        self.logger.info(f"启动 MCP Server (streamable-http)，监听 http://{host}:{port}/mcp")
+        uvicorn_config = uvicorn.Config(
+            app,
+            host=host,
+            port=port,
+            log_level=self.config.logging.level.lower(),
+        )
+        await uvicorn.Server(uvicorn_config).serve()
+
 
 def main():
     """主入口函数"""
@@ -450,6 +1507,23 @@ def main():
         default=os.environ.get("DASH2INSIGHT_CONFIG"),
         help="配置文件路径 (默认: 项目根目录下的 config.yaml；也可通过环境变量 DASH2INSIGHT_CONFIG 指定)"
     )
+    parser.add_argument(
+        "-t", "--transport",
+        choices=["stdio", "streamable-http"],
+        default=os.environ.get("DASH2INSIGHT_TRANSPORT", "stdio"),
+        help="传输方式 (默认: stdio；streamable-http 模式下单个进程可同时服务多个客户端，也可通过环境变量 DASH2INSIGHT_TRANSPORT 指定)"
+    )
+    parser.add_argument(
+        "--host",
+        default=os.environ.get("DASH2INSIGHT_HOST", "127.0.0.1"),
+        help="streamable-http 模式监听地址 (默认: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=int(os.environ.get("DASH2INSIGHT_PORT", "8000")),
+        help="streamable-http 模式监听端口 (默认: 8000)"
+    )
     args = parser.parse_args()
 
     if args.config:
@@ -465,7 +1539,7 @@ def main():
 
     try:
         server = PrometheusServer(config_path)
-        asyncio.run(server.run())
+        asyncio.run(server.run(args.transport, args.host, args.port))
     except KeyboardInterrupt:
         print("\n收到中断信号，正在关闭...", file=sys.stderr)
     except Exception as e:
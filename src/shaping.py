@@ -0,0 +1,216 @@
+"""
+按输出预算裁剪查询结果
+
+结果超过预算（字符数）时按以下顺序逐步降级，一旦放得下就停止：
+
+1. 去掉缩进（紧凑 JSON）
+2. 提取所有序列共有的 label 到 data.common_labels
+3. 均匀抽样序列（保留至少 MIN_SERIES 条）
+4. 按固定间隔对每条序列的采样点降采样（保留最后一个点）
+5. 仍然放不下时继续减少序列数
+
+每一步都用各序列的紧凑序列化长度估算总大小，最后只序列化一次完整结果。
+省略的内容记录在结果的 output_shaping 字段中。
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+from . import codec
+
+# 降采样之前抽样保留的最少序列数
+MIN_SERIES = 10
+
+
+def _size(obj: Any) -> int:
+    return len(codec.dumps(obj, compact=True))
+
+
+def _sample(count: int, keep: int) -> List[int]:
+    """在 [0, count) 中均匀选取 keep 个下标"""
+    if keep >= count:
+        return list(range(count))
+    return [int(i * count / keep) for i in range(keep)]
+
+
+def _downsample(values: List[Any], stride: int) -> List[Any]:
+    """每 stride 个点保留一个，并保留最后一个点"""
+    if stride <= 1 or len(values) <= 2:
+        return values
+    kept = values[::stride]
+    if (len(values) - 1) % stride:
+        kept.append(values[-1])
+    return kept
+
+
+class _Shaper:
+    """一次裁剪的状态"""
+
+    def __init__(self, data: Dict[str, Any], budget: int, original_size: int, compact: bool):
+        self.data = data
+        self.budget = budget
+        body = data["data"]
+        self.result_type = body.get("resultType")
+        self.series: List[Dict[str, Any]] = list(body["result"])
+        self.common: Dict[str, str] = {}
+        self.indices = list(range(len(self.series)))
+        self.stride = 1
+        self.report: Dict[str, Any] = {
+            "budget": budget,
+            "original_size": original_size,
+            "steps": [] if compact else ["compact"],
+        }
+
+    # -- 构建结果 ----------------------------------------------------------
+
+    def _series_item(self, index: int) -> Dict[str, Any]:
+        item = self.series[index]
+        if self.common:
+            item = {**item, "metric": {k: v for k, v in item.get("metric", {}).items() if k not in self.common}}
+        if self.stride > 1 and "values" in item:
+            item = {**item, "values": _downsample(item["values"], self.stride)}
+        return item
+
+    def build(self) -> Dict[str, Any]:
+        body = {key: value for key, value in self.data["data"].items() if key != "result"}
+        if self.common:
+            body["common_labels"] = self.common
+        body["result"] = [self._series_item(i) for i in self.indices]
+        self._finish_report()
+        return {**self.data, "data": body, "output_shaping": self.report}
+
+    def _finish_report(self):
+        total = len(self.series)
+        if len(self.indices) < total:
+            self.report["series_total"] = total
+            self.report["series_returned"] = len(self.indices)
+            self.report["series_omitted"] = total - len(self.indices)
+        if self.stride > 1:
+            points = sum(len(self.series[i].get("values", [])) for i in self.indices)
+            kept = sum(len(_downsample(self.series[i].get("values", []), self.stride)) for i in self.indices)
+            self.report["point_stride"] = self.stride
+            self.report["points_total"] = points
+            self.report["points_returned"] = kept
+            self.report["points_omitted"] = points - kept
+
+    # -- 大小估算 ----------------------------------------------------------
+
+    def _envelope(self) -> int:
+        """不含序列的部分（含 output_shaping 报告，报告中的数字按最大位数预留）"""
+        self._finish_report()
+        body = {key: value for key, value in self.data["data"].items() if key != "result"}
+        if self.common:
+            body["common_labels"] = self.common
+        body["result"] = []
+        return _size({**self.data, "data": body, "output_shaping": self.report}) + 64
+
+    def _estimate(self, sizes: List[int]) -> int:
+        picked = [sizes[i] for i in self.indices]
+        return self._envelope() + sum(picked) + max(len(picked) - 1, 0)
+
+    def fits(self, sizes: List[int]) -> bool:
+        return self._estimate(sizes) <= self.budget
+
+    def sizes(self) -> List[int]:
+        """当前 common label、降采样设置下每条序列的紧凑序列化长度"""
+        return [_size(self._series_item(i)) for i in range(len(self.series))]
+
+    # -- 降级步骤 ----------------------------------------------------------
+
+    def hoist_labels(self) -> bool:
+        if len(self.series) < 2:
+            return False
+        common = dict(self.series[0].get("metric", {}))
+        for item in self.series[1:]:
+            metric = item.get("metric", {})
+            common = {k: v for k, v in common.items() if metric.get(k) == v}
+            if not common:
+                return False
+        self.common = common
+        self.report["steps"].append("hoist_common_labels")
+        return True
+
+    def sample_series(self, sizes: List[int], floor: int) -> bool:
+        """抽样到放得下为止，但不少于 floor 条；返回是否减少了序列"""
+        total = len(self.series)
+        floor = min(floor, total)
+        if len(self.indices) <= floor:
+            return False
+        average = sum(sizes) / total if total else 0
+        room = self.budget - self._envelope()
+        keep = int(room / (average + 1)) if average else total
+        keep = max(floor, min(keep, len(self.indices)))
+        self.indices = _sample(total, keep)
+        while keep > floor and not self.fits(sizes):
+            keep = max(floor, int(keep * 0.9))
+            self.indices = _sample(total, keep)
+        if "sample_series" not in self.report["steps"]:
+            self.report["steps"].append("sample_series")
+        return True
+
+    def downsample(self) -> Optional[List[int]]:
+        """增大降采样间隔直到放得下或每条序列只剩两个点；返回新的序列大小"""
+        if self.result_type != "matrix":
+            return None
+        longest = max((len(self.series[i].get("values", [])) for i in self.indices), default=0)
+        if longest <= 2:
+            return None
+        self.report["steps"].append("downsample_points")
+        before = self._estimate(self.sizes())
+        room = self.budget - self._envelope()
+        # 按超出的比例估算初始间隔（偏小，label 部分不随降采样缩小），再逐步增大
+        self.stride = min(max(2, int(before / max(room, 1))), longest - 1)
+        while True:
+            sizes = self.sizes()
+            if self.fits(sizes) or math.ceil(longest / self.stride) <= 2:
+                return sizes
+            # 间隔达到 longest - 1 时每条序列只剩首尾两个点
+            self.stride = min(max(self.stride + 1, int(self.stride * 1.5)), longest - 1)
+
+
+def shape(data: Any, budget: int, compact: bool = False) -> str:
+    """
+    序列化结果，超过预算时逐步降级
+
+    Args:
+        data: Prometheus 响应（或任意可序列化的对象）
+        budget: 输出预算（字符数），<= 0 表示不限制
+        compact: 是否默认紧凑输出
+
+    Returns:
+        序列化后的文本；无法裁剪的结果（非 vector/matrix）在去掉缩进后原样返回
+    """
+    text = codec.dumps(data, compact=compact)
+    if budget <= 0 or len(text) <= budget:
+        return text
+    original_size = len(text)
+    if not compact:
+        text = codec.dumps(data, compact=True)
+        if len(text) <= budget:
+            return text
+    body = data.get("data") if isinstance(data, dict) else None
+    if not isinstance(body, dict) or body.get("resultType") not in ("vector", "matrix") \
+            or not isinstance(body.get("result"), list):
+        return text
+
+    shaper = _Shaper(data, budget, original_size, compact)
+    sizes = shaper.sizes()
+    if not shaper.fits(sizes) and shaper.hoist_labels():
+        sizes = shaper.sizes()
+    if not shaper.fits(sizes):
+        shaper.sample_series(sizes, MIN_SERIES if shaper.result_type == "matrix" else 1)
+    if not shaper.fits(sizes):
+        sizes = shaper.downsample() or sizes
+    if not shaper.fits(sizes):
+        shaper.sample_series(sizes, 1)
+    if not shaper.fits(sizes):
+        shaper.report["note"] = "即使只保留一条序列仍超过预算"
+    elif "sample_series" in shaper.report["steps"]:
+        shaper.report["note"] = "省略的序列可以通过增加 label 过滤或聚合后重新查询"
+    return codec.dumps(shaper.build(), compact=True)
+
+
+def shape_raw(raw: bytes, budget: int, compact: bool) -> str:
+    """按预算序列化未解析的响应体（在子进程中执行）"""
+    if compact and len(raw) <= budget:
+        return raw.decode("utf-8")
+    return shape(codec.loads(raw), budget, compact)
@@ -0,0 +1,101 @@
+"""Grafana 模板变量替换"""
+import re
+from typing import Dict, List, Mapping, Optional, Set, Union
+
+# $var、${var}、${var:format}、[[var]]、[[var:format]]
+_VAR_PATTERN = re.compile(
+    r"\$\{(?P<braced>\w+)(?::(?P<braced_fmt>\w+))?\}"
+    r"|\[\[(?P<bracket>\w+)(?::(?P<bracket_fmt>\w+))?\]\]"
+    r"|\$(?P<plain>\w+)"
+)
+
+# Grafana 内置变量的默认取值（没有面板上下文时使用）
+BUILTIN_VARIABLES: Dict[str, str] = {
+    "__interval": "1m",
+    "__interval_ms": "60000",
+    "__rate_interval": "5m",
+    "__range": "1h",
+    "__range_s": "3600",
+    "__range_ms": "3600000",
+    "__auto_interval": "1m",
+}
+
+# Grafana 中 "All" 选项的占位值
+ALL_VALUE = "$__all"
+
+VariableValue = Union[str, List[str]]
+
+
+def find_references(expr: str) -> Set[str]:
+    """
+    找出表达式中引用的变量名（不含 Grafana 内置变量）
+
+    Args:
+        expr: PromQL 表达式或变量查询
+
+    Returns:
+        变量名集合
+    """
+    names = set()
+    for match in _VAR_PATTERN.finditer(expr or ""):
+        name = match.group("braced") or match.group("bracket") or match.group("plain")
+        if not name.startswith("__"):
+            names.add(name)
+    return names
+
+
+def format_value(value: VariableValue, fmt: Optional[str] = None, all_value: Optional[str] = None) -> str:
+    """
+    按 Grafana 规则把变量值格式化为可嵌入 PromQL 的字符串
+
+    Args:
+        value: 单值或多值列表
+        fmt: 格式（regex、pipe、csv、raw），默认多值按 regex 格式
+        all_value: 选中 All 时使用的值（默认 .*）
+
+    Returns:
+        格式化后的字符串
+    """
+    values = list(value) if isinstance(value, (list, tuple)) else [value]
+    values = [str(v) for v in values if v is not None]
+    if ALL_VALUE in values:
+        return all_value if all_value is not None else ".*"
+    if fmt == "csv":
+        return ",".join(values)
+    if fmt == "pipe":
+        return "|".join(values)
+    if fmt == "raw" or (fmt is None and len(values) == 1):
+        return values[0] if len(values) == 1 else ",".join(values)
+    escaped = [re.sub(r"([\\.+*?()|\[\]{}^$])", r"\\\1", v) for v in values]
+    if len(escaped) == 1:
+        return escaped[0]
+    return "(" + "|".join(escaped) + ")"
+
+
+def substitute(expr: str, values: Mapping[str, VariableValue],
+               all_values: Optional[Mapping[str, Optional[str]]] = None) -> str:
+    """
+    把表达式中的变量引用替换为取值，未知变量保持原样
+
+    Args:
+        expr: PromQL 表达式
+        values: 变量名 -> 取值
+        all_values: 变量名 -> 选中 All 时使用的值（可选）
+
+    Returns:
+        替换后的表达式
+    """
+    if not expr or ("$" not in expr and "[[" not in expr):
+        return expr
+    all_values = all_values or {}
+
+    def replace(match: re.Match) -> str:
+        name = match.group("braced") or match.group("bracket") or match.group("plain")
+        fmt = match.group("braced_fmt") or match.group("bracket_fmt")
+        if name in values and values[name] is not None:
+            return format_value(values[name], fmt, all_values.get(name))
+        if name in BUILTIN_VARIABLES:
+            return BUILTIN_VARIABLES[name]
+        return match.group(0)
+
+    return _VAR_PATTERN.sub(replace, expr)
@@ -0,0 +1,133 @@
+"""时间与时长解析工具"""
+import math
+import re
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)")
+_RELATIVE_PATTERN = re.compile(r"now\s*(?:([+-])\s*(\S+))?$")
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """
+    解析 Unix 时间戳、RFC3339 时间或相对时间（"now"、"now-6h"）
+
+    Args:
+        value: 时间字符串或数字
+
+    Returns:
+        Unix 时间戳（秒）；无法解析时返回 None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    relative = _RELATIVE_PATTERN.match(text)
+    if relative:
+        sign, offset = relative.groups()
+        seconds = parse_duration(offset) if offset else 0.0
+        if seconds is None:
+            return None
+        return time.time() + (-seconds if sign == "-" else seconds)
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def is_relative(value) -> bool:
+    """是否为相对当前时间的表达式（"now"、"now-6h"）"""
+    return isinstance(value, str) and _RELATIVE_PATTERN.match(value.strip()) is not None
+
+
+def parse_duration(value) -> Optional[float]:
+    """
+    解析 Prometheus 时长（如 "30s"、"1m"、"1h30m" 或纯秒数）
+
+    Args:
+        value: 时长字符串或数字
+
+    Returns:
+        秒数；无法解析时返回 None
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    if not text or _DURATION_PATTERN.sub("", text):
+        return None
+    return sum(float(num) * _DURATION_UNITS[unit] for num, unit in _DURATION_PATTERN.findall(text))
+
+
+# Grafana 风格的"整齐"步长（秒）
+NICE_STEPS = [
+    1, 2, 5, 10, 15, 30,
+    60, 120, 300, 600, 900, 1800,
+    3600, 7200, 10800, 21600, 43200,
+    86400, 172800, 604800, 2592000,
+]
+
+
+def format_duration(seconds: float) -> str:
+    """
+    把秒数格式化为 Prometheus 时长（如 300 -> "5m"）
+
+    Args:
+        seconds: 秒数
+
+    Returns:
+        时长字符串；无法用整数单位表示时返回秒数
+    """
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60), ("s", 1)):
+        if seconds >= size and seconds % size == 0:
+            return f"{int(seconds // size)}{unit}"
+    return f"{seconds:g}s"
+
+
+def align_range(start: float, end: float, step: float) -> Tuple[float, float]:
+    """
+    把起止时间对齐到步长边界（start 向下取整，end 向上取整）
+
+    相同时间窗口的查询对齐后参数一致，便于缓存命中。
+    """
+    aligned_start = math.floor(start / step) * step
+    aligned_end = math.ceil(end / step) * step
+    return aligned_start, aligned_end
+
+
+def choose_step(start: float, end: float, max_data_points: int, min_step: float = 0) -> float:
+    """
+    选择使每条序列的点数不超过预算的最小"整齐"步长
+
+    Args:
+        start: 起始时间（Unix 秒）
+        end: 结束时间（Unix 秒）
+        max_data_points: 每条序列的最大点数
+        min_step: 步长下限（秒）
+
+    Returns:
+        步长（秒）
+    """
+    max_data_points = max(int(max_data_points), 2)
+    span = max(end - start, 0)
+    for step in NICE_STEPS:
+        if step < min_step:
+            continue
+        aligned_start, aligned_end = align_range(start, end, step)
+        if (aligned_end - aligned_start) / step + 1 <= max_data_points:
+            return float(step)
+    # 超出预设步长（如多年的时间范围）时按比例计算，取整到天
+    step = max(min_step, span / (max_data_points - 2))
+    return float(math.ceil(step / 86400) * 86400)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""准入控制测试（不需要 Prometheus 连接）"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.admission import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_RANGE, AdmissionController, RequestCancelled,
+    ServerBusyError,
+)
+from src.prometheus_client import CancelToken
+
+
+def test_priority_order():
+    """名额空出时优先分配给交互式请求"""
+    admission = AdmissionController(max_concurrency=1)
+    admission.acquire("/api/v1/query", PRIORITY_INTERACTIVE)
+    order = []
+
+    def worker(priority, endpoint):
+        with admission.admit(endpoint, priority):
+            order.append(priority)
+
+    threads = []
+    for priority, endpoint in [(PRIORITY_BACKGROUND, "/api/v1/series"),
+                               (PRIORITY_RANGE, "/api/v1/query_range"),
+                               (PRIORITY_INTERACTIVE, "/api/v1/query")]:
+        thread = threading.Thread(target=worker, args=(priority, endpoint))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+    admission.release("/api/v1/query")
+    for thread in threads:
+        thread.join(2)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_RANGE, PRIORITY_BACKGROUND]
+    assert admission.stats()["active"] == 0
+
+
+def test_endpoint_limit_and_queue_timeout():
+    """路径并发上限不影响其他路径；排队超时返回 ServerBusyError"""
+    admission = AdmissionController(max_concurrency=4, endpoint_limits={"/api/v1/query_range": 1},
+                                    queue_timeout=0.1)
+    admission.acquire("/api/v1/query_range", PRIORITY_RANGE)
+    admission.acquire("/api/v1/query", PRIORITY_INTERACTIVE)
+    try:
+        admission.acquire("/api/v1/query_range", PRIORITY_RANGE)
+    except ServerBusyError as e:
+        assert e.retry_after == 0.1
+    else:
+        raise AssertionError("超过路径并发上限应排队超时")
+    assert admission.stats()["active"] == 2
+
+
+def test_cancelled_call_leaves_queue():
+    """排队中的调用被取消或超过截止时间时立即放弃排队，不占用空出的名额"""
+    admission = AdmissionController(max_concurrency=1, queue_timeout=10)
+    admission.acquire("/api/v1/query", PRIORITY_INTERACTIVE)
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+    started = time.monotonic()
+    try:
+        admission.acquire("/api/v1/query", PRIORITY_INTERACTIVE, token=token)
+    except RequestCancelled:
+        pass
+    else:
+        raise AssertionError("被取消的调用应抛出 RequestCancelled")
+    assert time.monotonic() - started < 0.5
+
+    started = time.monotonic()
+    try:
+        admission.acquire("/api/v1/query", PRIORITY_INTERACTIVE, deadline=time.monotonic() + 0.1)
+    except RequestCancelled:
+        pass
+    else:
+        raise AssertionError("超过截止时间应抛出 RequestCancelled")
+    assert time.monotonic() - started < 0.5
+    assert admission.stats()["queued"] == 0
+
+    # 放弃排队的调用不会拿走空出的名额
+    admission.release("/api/v1/query")
+    assert admission.stats()["active"] == 0
+    admission.acquire("/api/v1/query", PRIORITY_INTERACTIVE, timeout=0)
+    assert admission.stats()["active"] == 1
+
+
+def test_session_rate_limit():
+    """每个会话独立的令牌桶"""
+    admission = AdmissionController(session_rate=1, session_burst=2)
+    admission.check_session("a")
+    admission.check_session("a")
+    try:
+        admission.check_session("a")
+    except ServerBusyError:
+        pass
+    else:
+        raise AssertionError("超过会话限速应被拒绝")
+    admission.check_session("b")
+
+
+def main():
+    """主函数"""
+    test_priority_order()
+    test_endpoint_limit_and_queue_timeout()
+    test_cancelled_call_leaves_queue()
+    test_session_rate_limit()
+    print("✓ admission")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""基准测试组件的冒烟测试（不需要 Prometheus 连接）"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.dashboard_generator import generate_dashboard, write_dashboards
+from benchmarks.mock_prometheus import MockPrometheus, MockPrometheusConfig
+from src.dashboard_parser import DashboardParser
+from src.prometheus_client import PrometheusClient
+
+
+def test_dashboard_generator():
+    """合成 dashboard 可被 DashboardParser 正确解析"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_dashboards(tmp, count=2, rows=4, panels_per_row=3, variables=3, targets_per_panel=2)
+        assert len(paths) == 2
+        parser = DashboardParser(str(paths[0]))
+        assert len(parser.parse_variables()) == 3
+        # collapsed 与展开的 row 中的 panel 都应被提取
+        assert len(parser.parse_metrics()) == 4 * 3 * 2
+
+    dashboard = generate_dashboard(rows=1, panels_per_row=1, variables=2, uid="abc")
+    assert dashboard["uid"] == "abc"
+    assert "$var_0" in dashboard["templating"]["list"][1]["query"]
+
+
+def test_mock_prometheus():
+    """Mock Prometheus 返回符合 Prometheus HTTP API 格式的结果"""
+    config = MockPrometheusConfig(series_count=3, label_values_count=4)
+    with MockPrometheus(config) as mock:
+        client = PrometheusClient(mock.url)
+
+        result = client.query("rate(bench_metric_1_total[5m])")
+        assert result["data"]["resultType"] == "vector"
+        assert len(result["data"]["result"]) == 3
+        assert result["data"]["result"][0]["metric"]["__name__"] == "bench_metric_1_total"
+
+        now = int(time.time())
+        result = client.range_query("bench_metric_1_total", str(now - 600), str(now), "1m")
+        assert result["data"]["resultType"] == "matrix"
+        assert len(result["data"]["result"][0]["values"]) == 11
+
+        assert client.query_label_values("cluster") == [f"cluster-{i}" for i in range(4)]
+        assert len(client.series("bench_metric_1_total")) == 3
+        assert mock.request_counts["/api/v1/query"] == 1
+        json.dumps(result)
+
+
+def main():
+    """主函数"""
+    test_dashboard_generator()
+    print("✓ dashboard generator")
+    test_mock_prometheus()
+    print("✓ mock prometheus")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""JSON 编解码测试"""
+import json
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import codec
+from src.codec import RawJSON
+
+
+def test_dumps_backends():
+    """orjson 与标准库两种实现的输出语义一致，非 ASCII 字符原样输出"""
+    value = {"status": "success", "data": {"名称": "集群", "values": [[1.5, "2"]], "n": None}}
+    outputs = [codec.dumps(value, compact=True), codec.dumps(value, compact=False)]
+    saved = codec._orjson
+    codec._orjson = None
+    try:
+        outputs += [codec.dumps(value, compact=True), codec.dumps(value, compact=False)]
+    finally:
+        codec._orjson = saved
+    for text in outputs:
+        assert json.loads(text) == value
+        assert "集群" in text
+    assert "\n" not in outputs[0] and "\n" in outputs[1]
+
+
+def test_raw_passthrough():
+    """RawJSON 透传、追加字段时不解析响应体"""
+    raw = RawJSON(b'{"status":"success","data":{"result":[]}}\n')
+    assert raw.status() == "success"
+    extended = raw.with_fields(range={"step": "5m"})
+    assert raw._data is None and extended._data is None
+    assert codec.dumps(extended, compact=True) == extended.text
+    assert json.loads(extended.text)["range"] == {"step": "5m"}
+    assert json.loads(codec.dumps(extended, compact=False))["data"] == {"result": []}
+    assert RawJSON(b'{"data": 1, "status": "error", "error": "x"}').status() == "error"
+
+
+def main():
+    """主函数"""
+    test_dumps_backends()
+    test_raw_passthrough()
+    print("✓ codec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""时间窗口对比测试（不需要 Prometheus 连接）"""
+import asyncio
+import math
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus, MockPrometheusConfig
+from src import compare
+from src.compare import compare_matrices
+from src.prometheus_client import PrometheusClient
+from src.server import PrometheusServer
+
+START = 1700000000
+STEP = 60
+WEEK = 7 * 86400
+
+
+def make_series(labels, start, values):
+    return {"metric": labels, "values": [[start + i * STEP, str(v)] for i, v in enumerate(values) if v is not None]}
+
+
+def test_ranks_by_relative_change():
+    """按序列对齐后计算差值和比值，变化最大的排在前面"""
+    current = [
+        make_series({"instance": "a"}, START, [10, 10, 10, 10]),
+        make_series({"instance": "b"}, START, [30, 30, None, 30]),
+        make_series({"instance": "new"}, START, [1, 1, 1, 1]),
+    ]
+    baseline = [
+        make_series({"instance": "a"}, START - WEEK, [10, 10, 10, 12]),
+        make_series({"instance": "b"}, START - WEEK, [10, 10, 10, 10]),
+        make_series({"instance": "gone"}, START - WEEK, [5, 5]),
+    ]
+    result = compare_matrices(current, baseline, START, STEP, WEEK, top=5)
+    summary = result["summary"]
+    assert (summary["matched_series"], summary["only_current"], summary["only_baseline"]) == (2, 1, 1)
+    first, second = result["series"]
+    assert first["metric"] == {"instance": "b"}
+    assert (first["points"], first["diff"], first["ratio"]) == (3, 20, 3)
+    assert second["max_point_diff"] == -2
+    assert result["only_current"] == [{"instance": "new"}]
+    assert result["only_baseline"] == [{"instance": "gone"}]
+    assert len(compare_matrices(current, baseline, START, STEP, WEEK, top=1)["series"]) == 1
+
+
+def test_numpy_and_array_alignment_agree():
+    """numpy 批量对齐与 array 逐条对齐的结果一致（缺点、NaN、两窗口长度不同）"""
+    rng = random.Random(7)
+    current, baseline = [], []
+    for i in range(30):
+        values = [rng.choice([None, math.nan, rng.uniform(0, 100)]) for _ in range(rng.randint(0, 50))]
+        current.append(make_series({"instance": str(i)}, START + STEP * rng.randint(0, 5), values))
+        values = [rng.choice([None, rng.uniform(0, 100)]) for _ in range(rng.randint(0, 50))]
+        baseline.append(make_series({"instance": str(i)}, START - WEEK, values))
+
+    original = compare._numpy
+    try:
+        compare._numpy = None
+        expected = compare_matrices(current, baseline, START, STEP, WEEK, top=30)
+    finally:
+        compare._numpy = original
+    assert expected["summary"]["matched_series"] > 0
+    if original is not None:
+        assert compare_matrices(current, baseline, START, STEP, WEEK, top=30) == expected
+
+
+def test_failed_window_cancels_sibling():
+    """一个窗口的查询失败时，另一个窗口进行中的上游请求被立即中断"""
+    with MockPrometheus(MockPrometheusConfig(latency=1.0)) as slow, tempfile.TemporaryDirectory() as tmp:
+        config = Path(tmp) / "config.yaml"
+        config.write_text(f"prometheus:\n  url: {slow.url}\ndashboards: []\nlogging:\n  file: null\n")
+        server = PrometheusServer(str(config))
+        client = PrometheusClient(slow.url)
+
+        def failing():
+            time.sleep(0.1)
+            raise ValueError("window failed")
+
+        started = time.monotonic()
+        try:
+            asyncio.run(server._run_calls([lambda: client.query("up", retry=1), failing]))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("失败的窗口应抛出异常")
+        assert time.monotonic() - started < 0.5
+        assert slow.request_counts.get("/api/v1/query") == 1
+
+
+def main():
+    """主函数"""
+    test_ranks_by_relative_change()
+    test_numpy_and_array_alignment_agree()
+    test_failed_window_cancels_sibling()
+    print("✓ compare windows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""dashboard 发现与并行解析测试"""
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.dashboard_generator import generate_dashboard, write_dashboards
+from src.config import DashboardConfig
+from src.dashboard_catalog import DashboardCatalog
+from src.dashboard_parser import DashboardParser
+from src.disk_cache import DiskCache
+
+
+def test_glob_discovery_names_and_parsing():
+    """glob/目录配置项自动发现 dashboard，名称取自 uid 或 title，解析结果与直接读文件一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_dashboards(str(Path(tmp) / "exported"), count=3)
+        untitled = generate_dashboard(title="Node Exporter / Full")
+        (Path(tmp) / "exported" / "node.json").write_text(json.dumps(untitled))
+        explicit = Path(tmp) / "single.json"
+        explicit.write_text(json.dumps(generate_dashboard(uid="single-uid")))
+
+        catalog = DashboardCatalog(
+            [DashboardConfig(path="./exported/*.json"), DashboardConfig(name="main", path="single.json")],
+            Path(tmp), processes=0
+        )
+        dashboards = catalog.scan()
+        assert list(dashboards) == ["bench-0", "bench-1", "bench-2", "node-exporter-full", "main"]
+
+        parser = DashboardParser(str(paths[0]), dashboards["bench-0"].data)
+        original = DashboardParser(str(paths[0]))
+        assert parser.parse_metrics() == original.parse_metrics()
+        assert parser.parse_variables() == original.parse_variables()
+        assert parser.get_dashboard_title() == original.get_dashboard_title()
+
+
+def test_rescan_only_parses_changed_files():
+    """未变化的文件不重新解析；内容变化后重新解析"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_dashboards(tmp, count=3)
+        catalog = DashboardCatalog([DashboardConfig(path=tmp)], Path(tmp), processes=0)
+        first = catalog.scan()
+        assert len(first) == 3 and len(catalog._parsed) == 3
+
+        second = catalog.scan()
+        assert {name: d.digest for name, d in second.items()} == {name: d.digest for name, d in first.items()}
+        assert len(catalog._parsed) == 3
+
+        paths[1].write_text(json.dumps(generate_dashboard(title="Changed", uid="bench-1")))
+        stat = paths[1].stat()
+        os.utime(paths[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        third = catalog.scan()
+        assert third["bench-1"].digest != first["bench-1"].digest
+        assert third["bench-1"].data["title"] == "Changed"
+        assert third["bench-0"].digest == first["bench-0"].digest
+
+
+def test_rescan_prunes_caches_and_skips_missing_files():
+    """修改、删除文件后缓存不保留旧内容；单个文件配置项被删除时其余 dashboard 照常更新"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_dashboards(str(Path(tmp) / "d"), count=3)
+        single = Path(tmp) / "single.json"
+        single.write_text(json.dumps(generate_dashboard(uid="single-uid")))
+        catalog = DashboardCatalog(
+            [DashboardConfig(path="d"), DashboardConfig(name="main", path="single.json")],
+            Path(tmp), processes=0
+        )
+        assert len(catalog.scan()) == 4
+
+        for i in range(3):
+            paths[0].write_text(json.dumps(generate_dashboard(title=f"Edit {i}", uid="bench-0")))
+            stat = paths[0].stat()
+            os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + (i + 1) * 1_000_000_000))
+            catalog.scan()
+        assert len(catalog._parsed) == 4
+
+        paths[2].unlink()
+        single.unlink()
+        dashboards = catalog.scan()
+        assert list(dashboards) == ["bench-0", "bench-1"]
+        assert dashboards["bench-0"].data["title"] == "Edit 2"
+        assert len(catalog._parsed) == 2 and len(catalog._stats) == 2
+
+
+def test_parallel_parsing_and_disk_cache():
+    """进程池并行解析；新的 catalog 从磁盘缓存复用解析结果"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_dashboards(str(Path(tmp) / "d"), count=6, rows=2, panels_per_row=3)
+        cache = DiskCache(str(Path(tmp) / "cache"))
+        entries = [DashboardConfig(path="d/**/*.json")]
+
+        catalog = DashboardCatalog(entries, Path(tmp), processes=2, disk_cache=cache)
+        catalog.PARALLEL_THRESHOLD = 2
+        parallel = catalog.scan()
+        inline = DashboardCatalog(entries, Path(tmp), processes=0).scan()
+        assert {n: d.data for n, d in parallel.items()} == {n: d.data for n, d in inline.items()}
+
+        restarted = DashboardCatalog(entries, Path(tmp), processes=0, disk_cache=cache)
+        parsed = []
+        restarted._parse_all = parsed.extend
+        assert list(restarted.scan()) == list(parallel)
+        assert parsed == []
+        cache.close()
+
+
+def main():
+    """主函数"""
+    test_glob_discovery_names_and_parsing()
+    test_rescan_only_parses_changed_files()
+    test_rescan_prunes_caches_and_skips_missing_files()
+    test_parallel_parsing_and_disk_cache()
+    print("✓ dashboard catalog")
+
+
+if __name__ == "__main__":
+    main()
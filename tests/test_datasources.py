@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""多 datasource 路由与模板变量替换测试（不需要 Prometheus 连接）"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import Config
+from src.dashboard_parser import DashboardParser
+from src.datasources import DatasourceRouter
+from src.templating import find_references, substitute
+
+
+def make_config() -> Config:
+    return Config(**{
+        "prometheus": {"url": "http://prom:9090"},
+        "datasources": [
+            {"name": "vm", "uid": "vm-uid", "url": "http://vm:8428"},
+        ],
+    })
+
+
+def test_config_requires_datasource():
+    """prometheus 与 datasources 至少配置一个"""
+    try:
+        Config(**{"dashboards": []})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("缺少 datasource 配置时应报错")
+    config = Config(**{"datasources": [{"name": "a", "url": "http://a"}]})
+    assert DatasourceRouter.from_config(config).default == "a"
+
+
+def test_router_resolve_and_route():
+    """按名称/uid 解析，未知引用回退默认；按指标名自动路由"""
+    router = DatasourceRouter.from_config(make_config())
+    assert router.names() == ["default", "vm"]
+    assert router.resolve("vm-uid") == "vm"
+    assert router.resolve("${DS_PROMETHEUS}") == "default"
+    assert router.get_client("vm").base_url == "http://vm:8428"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dashboard = {
+            "panels": [
+                {"title": "A", "datasource": {"uid": "vm-uid"},
+                 "targets": [{"expr": "sum(rate(vm_only_total[5m])) by (instance)"}]},
+                {"title": "B", "datasource": {"uid": "-- Mixed --"},
+                 "targets": [{"expr": "prom_only", "datasource": "default"}]},
+            ]
+        }
+        path = Path(tmp) / "d.json"
+        path.write_text(json.dumps(dashboard))
+        metrics = DashboardParser(str(path)).parse_metrics()
+    assert [m.datasource for m in metrics] == ["vm-uid", "default"]
+
+    router.replace_metrics(metrics)
+    assert router.route("rate(vm_only_total[1m])") == "vm"
+    assert "instance" not in router.metric_datasources
+    # 指标分属不同 datasource 时回退默认
+    assert router.route("vm_only_total / prom_only") == "default"
+    assert router.route("vm_only_total", datasource="default") == "default"
+    # 重新扫描后按全部 dashboard 重建映射：已删除 dashboard 的指标不再路由
+    router.replace_metrics(metrics[1:])
+    assert router.route("rate(vm_only_total[1m])") == "default"
+    assert router.metric_datasources == {"prom_only": "default"}
+    try:
+        router.route("up", datasource="nope")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知 datasource 应报错")
+
+
+def test_substitute():
+    """Grafana 变量替换"""
+    expr = 'rate(x{cluster="$cluster", ns=~"${ns}", pod=~"[[pod]]"}[$__rate_interval])'
+    assert find_references(expr) == {"cluster", "ns", "pod"}
+    result = substitute(expr, {"cluster": "c1", "ns": ["a.b", "c"], "pod": "$__all"})
+    assert result == 'rate(x{cluster="c1", ns=~"(a\\.b|c)", pod=~".*"}[5m])'
+    # 未知变量保持原样
+    assert substitute("up{job=\"$job\"}", {}) == "up{job=\"$job\"}"
+    assert substitute("${a:csv}", {"a": ["1", "2"]}) == "1,2"
+
+
+def main():
+    """主函数"""
+    test_config_requires_datasource()
+    test_router_resolve_and_route()
+    test_substitute()
+    print("✓ datasources")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""磁盘缓存测试（不需要 Prometheus 连接）"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus
+from src.disk_cache import DiskCache
+from src.prometheus_client import PrometheusClient
+
+
+def test_get_set_ttl():
+    """读写、TTL 过期，以及两个实例（模拟两个进程）共享同一目录"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = DiskCache(tmp)
+        other = DiskCache(tmp)
+        key = DiskCache.make_key("label_values", "cluster", None)
+        cache.set(key, ["a", "b"])
+        assert other.get(key) == ["a", "b"]
+        cache.set("expiring", {"x": 1}, ttl=-1)
+        assert cache.get("expiring") is None
+        assert cache.get("missing") is None
+
+
+def test_size_eviction():
+    """超过容量时淘汰最久未访问的条目"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = DiskCache(tmp, max_bytes=256 * 1024)
+        for i in range(40):
+            # 随机内容，避免压缩后体积过小
+            cache.set(f"k{i}", os.urandom(16 * 1024).hex())
+        assert cache._used_bytes() <= 256 * 1024
+        assert cache.get("k0") is None
+        assert cache.get("k39") is not None
+
+
+def test_client_warm_restart():
+    """新建的客户端（模拟重启后的进程）直接从磁盘缓存获取结果"""
+    with MockPrometheus() as mock, tempfile.TemporaryDirectory() as tmp:
+        end = int(time.time()) - 3600
+        first = PrometheusClient(mock.url, cache=DiskCache(tmp))
+        values = first.query_label_values("cluster")
+        first.range_query("up", str(end - 600), str(end), "1m")
+        # 结束时间为当前的范围查询不应被缓存
+        first.range_query("up", str(end), str(int(time.time())), "1m")
+
+        restarted = PrometheusClient(mock.url, cache=DiskCache(tmp))
+        assert restarted.query_label_values("cluster") == values
+        restarted.range_query("up", str(end - 600), str(end), "1m")
+        restarted.range_query("up", str(end), str(int(time.time())), "1m")
+        counts = mock.request_counts
+        assert counts["/api/v1/label/cluster/values"] == 1
+        assert counts["/api/v1/query_range"] == 3
+
+
+def main():
+    """主函数"""
+    test_get_set_ttl()
+    test_size_eviction()
+    test_client_warm_restart()
+    print("✓ disk cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""本地直方图分位数测试（不需要 Prometheus 连接）"""
+import math
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.histogram import analyze, bucket_quantile
+
+BUCKETS = [(0.1, 10.0), (0.5, 60.0), (1.0, 90.0), (math.inf, 100.0)]
+
+
+def test_bucket_quantile_matches_prometheus():
+    """与 histogram_quantile 的插值规则一致"""
+    assert math.isclose(bucket_quantile(0.5, BUCKETS), 0.42)
+    assert math.isclose(bucket_quantile(0.05, BUCKETS), 0.05)
+    assert bucket_quantile(0.99, BUCKETS) == 1.0  # 落在 +Inf bucket 时取次高上界
+    assert bucket_quantile(1.5, BUCKETS) == math.inf
+    assert math.isnan(bucket_quantile(0.5, [(0.1, 0.0), (math.inf, 0.0)]))
+    assert math.isnan(bucket_quantile(0.5, BUCKETS[:-1]))
+    # 累计计数不单调时向上修正
+    assert math.isclose(bucket_quantile(0.99, [(0.1, 10.0), (0.5, 8.0), (1.0, 20.0), (math.inf, 20.0)]), 0.99)
+
+
+def test_analyze_groups_and_buckets():
+    """按去掉 le 的 label 分组，一次计算多个分位数和 bucket 分布"""
+    matrix = []
+    for instance, scale in (("a", 1), ("b", 2)):
+        for le, count in (("0.1", 10), ("0.5", 60), ("1", 90), ("+Inf", 100)):
+            matrix.append({
+                "metric": {"instance": instance, "le": le},
+                "values": [[1700000000, str(count * scale)], [1700000060, str(count * scale)]],
+            })
+    groups = analyze(matrix, [0.5, 0.99], include_points=True)
+    assert [g["labels"] for g in groups] == [{"instance": "a"}, {"instance": "b"}]
+    p50 = groups[0]["quantiles"]["0.5"]
+    assert p50["last"] == 0.42
+    assert [ts for ts, _ in p50["values"]] == [1700000000, 1700000060]
+    assert all(math.isclose(float(value), 0.42) for _, value in p50["values"])
+    assert groups[1]["quantiles"]["0.99"]["max"] == 1.0
+    assert [b["share"] for b in groups[0]["buckets"]] == [0.1, 0.5, 0.3, 0.1]
+    assert groups[0]["buckets"][-1]["le"] == "+Inf"
+
+    missing_inf = analyze([{"metric": {"le": "1"}, "values": [[1, "1"]]}], [0.5])
+    assert "error" in missing_inf[0]
+
+
+def main():
+    """主函数"""
+    test_bucket_quantile_matches_prometheus()
+    test_analyze_groups_and_buckets()
+    print("✓ histogram")
+
+
+if __name__ == "__main__":
+    main()
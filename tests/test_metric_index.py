@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""指标名索引测试（使用本地 Mock Prometheus）"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus, MockPrometheusConfig
+from src.metric_index import MetricIndex, UnknownMetricError
+from src.prometheus_client import PrometheusClient
+
+
+def test_rejects_unknown_metric_locally():
+    """未知指标在本地被拒绝并给出建议，不访问 Prometheus 查询接口"""
+    config = MockPrometheusConfig(metric_names=["node_cpu_seconds_total", "node_memory_MemFree_bytes", "up"])
+    with MockPrometheus(config) as mock:
+        index = MetricIndex(PrometheusClient(mock.url), label_names=True)
+        index.validate("does_not_matter")  # 索引未加载时不校验
+        assert index.refresh()
+
+        index.validate('sum(rate(node_cpu_seconds_total{cluster="$cluster"}[5m])) by (instance)')
+        try:
+            index.validate("rate(node_cpu_second_total[5m])")
+        except UnknownMetricError as e:
+            assert "node_cpu_seconds_total" in str(e)
+        else:
+            raise AssertionError("未知指标应被拒绝")
+        try:
+            index.validate('up{clustr="a"}')
+        except UnknownMetricError as e:
+            assert "cluster" in str(e)
+        else:
+            raise AssertionError("未知 label 应被拒绝")
+        assert mock.request_counts.get("/api/v1/query", 0) == 0
+
+
+def test_refreshes_before_rejecting():
+    """索引过期时先刷新再判断，新出现的指标不会被误杀"""
+    config = MockPrometheusConfig(metric_names=["up"])
+    with MockPrometheus(config) as mock:
+        index = MetricIndex(PrometheusClient(mock.url))
+        index.MIN_REFRESH_INTERVAL = 0
+        assert index.refresh()
+        config.metric_names.append("new_metric")
+        index.validate("new_metric")
+        assert mock.request_counts["/api/v1/label/__name__/values"] == 2
+
+
+def main():
+    """主函数"""
+    test_rejects_unknown_metric_locally()
+    test_refreshes_before_rejecting()
+    print("✓ metric index")
+
+
+if __name__ == "__main__":
+    main()
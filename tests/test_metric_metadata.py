@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""指标元数据缓存与 metrics resource 元数据附加测试（使用本地 Mock Prometheus）"""
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus
+from src.datasources import DatasourceRouter
+from src.metric_metadata import MetadataCache, lookup
+from src.prometheus_client import PrometheusClient
+from src.resources import MetricsResource
+
+METADATA = {
+    "http_request_duration_seconds": [{"type": "histogram", "unit": "seconds", "help": "Request latency."}],
+    "node_cpu_seconds": [{"type": "counter", "unit": "", "help": "CPU time."}],
+    "up": [{"type": "gauge", "unit": "", "help": ""}],
+}
+
+
+def test_lookup_strips_family_suffixes():
+    """histogram/counter 的子序列名按指标族名查找"""
+    assert lookup(METADATA, "http_request_duration_seconds_bucket") == {
+        "type": "histogram", "unit": "seconds", "help": "Request latency."
+    }
+    assert lookup(METADATA, "node_cpu_seconds_total") == {"type": "counter", "help": "CPU time."}
+    assert lookup(METADATA, "up") == {"type": "gauge"}
+    assert lookup(METADATA, "missing_metric") is None
+
+
+def test_metrics_resource_enriched_with_one_bulk_call():
+    """metrics resource 附加 expr 中各指标的元数据，多次读取只请求一次 /api/v1/metadata"""
+    dashboard = {"title": "D", "panels": [
+        {"title": "A", "targets": [{"expr": "sum(rate(bench_metric_0_total[5m]))"}]},
+        {"title": "B", "targets": [{"expr": "rate(bench_metric_0_total[1m]) / rate(bench_metric_1_total[1m])"}]},
+        {"title": "C", "targets": [{"expr": "unknown_metric"}]},
+    ]}
+    with MockPrometheus() as mock, tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "d.json"
+        path.write_text(json.dumps(dashboard))
+        router = DatasourceRouter({"default": PrometheusClient(mock.url)})
+        resource = MetricsResource("d", str(path), datasource_router=router, metadata=MetadataCache(ttl=60))
+
+        content = json.loads(resource.get_content())
+        assert list(content["metric_metadata"]) == ["bench_metric_0_total", "bench_metric_1_total"]
+        assert content["metric_metadata"]["bench_metric_0_total"]["type"] == "counter"
+        resource.get_content()
+        assert mock.request_counts["/api/v1/metadata"] == 1
+
+        plain = json.loads(MetricsResource("d", str(path)).get_content())
+        assert "metric_metadata" not in plain
+
+
+def main():
+    """主函数"""
+    test_lookup_strips_family_suffixes()
+    test_metrics_resource_enriched_with_one_bulk_call()
+    print("✓ metric metadata")
+
+
+if __name__ == "__main__":
+    main()
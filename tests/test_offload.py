@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""结果处理进程池测试"""
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.codec import RawJSON
+from src.offload import Offloader, decode_result, render_histogram, render_json
+from src.result_store import ResultStore
+
+RESPONSE = {"status": "success", "data": {"resultType": "vector", "result": [
+    {"metric": {"instance": f"host-{i}"}, "value": [1700000000, str(i)]} for i in range(100)
+]}}
+
+
+def test_small_results_stay_inline():
+    """低于阈值时在当前进程内执行，不创建进程池"""
+    offloader = Offloader(processes=1, threshold=1 << 30)
+    text = asyncio.run(offloader.render(RawJSON.from_data(RESPONSE)))
+    assert json.loads(text) == RESPONSE and "\n" in text
+    assert asyncio.run(offloader.run(0, os.getpid)) == os.getpid()
+    assert offloader._pool is None
+
+
+def test_large_results_use_process_pool():
+    """超过阈值时在子进程中解析、计算和序列化"""
+    offloader = Offloader(processes=1, threshold=1)
+    try:
+        assert asyncio.run(offloader.run(10, os.getpid)) != os.getpid()
+        raw = RawJSON.from_data(RESPONSE)
+        assert asyncio.run(offloader.run(len(raw), render_json, raw.raw, False)) == \
+            render_json(raw.raw, False)
+
+        buckets = {"status": "success", "data": {"resultType": "matrix", "result": [
+            {"metric": {"le": le}, "values": [[1700000000, count]]}
+            for le, count in (("0.1", "1"), ("1", "3"), ("+Inf", "4"))
+        ]}}
+        raw = RawJSON.from_data(buckets)
+        groups, text = asyncio.run(offloader.run(len(raw), render_histogram, raw.raw, [0.5], False, {}, True))
+        assert groups == 1 and json.loads(text)["groups"][0]["quantiles"]["0.5"]["last"] == 0.55
+    finally:
+        offloader.shutdown()
+
+
+def test_stored_results_decode_in_process_pool():
+    """暂存结果在子进程中解码，label 集合在当前进程驻留，与直接 put 的结果一致"""
+    matrix = {"status": "success", "warnings": ["w"], "data": {"resultType": "matrix", "result": [
+        {"metric": {"__name__": "x", "instance": f"host-{i}"}, "values": [[1700000000 + 15 * j, str(j)] for j in range(5)]}
+        for i in range(3)
+    ]}}
+    raw = RawJSON.from_data(matrix)
+    offloader = Offloader(processes=1, threshold=1)
+    store = ResultStore()
+    try:
+        entry = store.add("x", *asyncio.run(offloader.run(len(raw), decode_result, raw.raw)))
+    finally:
+        offloader.shutdown()
+    expected = ResultStore().put("x", matrix)
+    assert entry.overview() == {**expected.overview(), "handle": entry.handle}
+    assert entry.page()["series"] == expected.page()["series"]
+    assert len(store._labels) == 3
+    assert entry.series[0].labels is store._labels.intern(matrix["data"]["result"][0]["metric"])
+
+
+def main():
+    """主函数"""
+    test_small_results_stay_inline()
+    test_large_results_use_process_pool()
+    test_stored_results_decode_in_process_pool()
+    print("✓ offload")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""panel 预计算测试（使用本地 Mock Prometheus）"""
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus
+from src.dashboard_parser import DashboardParser
+from src.datasources import DatasourceRouter
+from src.prefetch import PanelPrefetcher, PrefetchStore, dashboard_values, panel_queries
+from src.prometheus_client import PrometheusClient
+
+DASHBOARD = {
+    "templating": {"list": [
+        {"name": "cluster", "type": "custom", "current": {"value": "c1"}, "options": []},
+    ]},
+    "panels": [
+        {"title": "CPU", "targets": [{"expr": 'sum(rate(cpu_total{cluster="$cluster"}[5m]))'}]},
+        {"title": "CPU (copy)", "targets": [{"expr": 'sum(rate(cpu_total{cluster="$cluster"}[5m]))'}]},
+        {"title": "Memory", "targets": [{"expr": 'mem_bytes{cluster="$cluster"}'}]},
+    ],
+}
+
+
+def test_prefetch_fills_store():
+    """按变量当前值计算 panel 查询，相同查询只计算一次"""
+    with MockPrometheus() as mock, tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "d.json"
+        path.write_text(json.dumps(DASHBOARD))
+        parser = DashboardParser(str(path))
+        router = DatasourceRouter({"default": PrometheusClient(mock.url)})
+        store = PrefetchStore(max_entries=10)
+        prefetcher = PanelPrefetcher(router, {"d": parser}, store, interval=60)
+
+        assert prefetcher.run_once("d") == 2
+        assert mock.request_counts["/api/v1/query"] == 2
+
+        queries = panel_queries(parser, router, dashboard_values(parser))
+        assert queries[0].expr == 'sum(rate(cpu_total{cluster="c1"}[5m]))'
+        for query in queries:
+            evaluated_at, result = store.get(query.datasource, query.expr, prefetcher.max_age)
+            assert result["status"] == "success"
+        # 覆盖变量后查询不同，不使用预计算结果
+        other = panel_queries(parser, router, dashboard_values(parser, {"cluster": "c2"}))
+        assert store.get(other[0].datasource, other[0].expr, prefetcher.max_age) is None
+
+
+def test_store_expiry_and_bound():
+    """过期结果不返回，超出上限淘汰最久未写入的结果"""
+    store = PrefetchStore(max_entries=2)
+    store.put("ds", "a", {"status": "success"}, evaluated_at=time.time() - 120)
+    assert store.get("ds", "a", max_age=60) is None
+    store.put("ds", "b", {})
+    store.put("ds", "c", {})
+    assert len(store) == 2 and store.get("ds", "a", max_age=600) is None
+
+
+def main():
+    """主函数"""
+    test_prefetch_fills_store()
+    test_store_expiry_and_bound()
+    print("✓ prefetch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""PrometheusClient 测试（使用本地 Mock Prometheus，不需要真实 Prometheus）"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus, MockPrometheusConfig
+from src.admission import AdmissionController
+from src.prometheus_client import CancelToken, PrometheusClient, RequestCancelled, call_scope
+
+
+def test_hedged_request_prefers_fast_replica():
+    """慢副本超过对冲延迟后向快副本发送对冲请求，之后优先使用快副本"""
+    with MockPrometheus(MockPrometheusConfig(latency=1.0)) as slow, \
+            MockPrometheus(MockPrometheusConfig(latency=0.01)) as fast:
+        client = PrometheusClient([slow.url, fast.url])
+        client.HEDGE_COLD_DELAY = 0.2
+
+        started = time.monotonic()
+        client.query("up")
+        assert time.monotonic() - started < 0.8, "对冲请求应先于慢副本返回"
+        assert fast.request_counts["/api/v1/query"] == 1
+
+        assert client._replica_order()[0] == fast.url
+        client.query("up")
+        assert fast.request_counts["/api/v1/query"] == 2
+        assert slow.request_counts["/api/v1/query"] == 1
+
+
+def test_hedged_requests_take_admission_slots():
+    """每个对冲请求各占一个准入名额；没有空闲名额时不发出对冲请求"""
+    with MockPrometheus(MockPrometheusConfig(latency=0.6)) as slow, \
+            MockPrometheus(MockPrometheusConfig(latency=0.6)) as other:
+        for limit, hedged in [(1, False), (2, True)]:
+            admission = AdmissionController(max_concurrency=limit)
+            client = PrometheusClient([slow.url, other.url], admission=admission)
+            client.HEDGE_COLD_DELAY = 0.1
+            peak = []
+            timer = threading.Timer(0.4, lambda: peak.append(admission.stats()["active"]))
+            timer.start()
+            before = slow.request_counts.get("/api/v1/query", 0) + other.request_counts.get("/api/v1/query", 0)
+            client.query("up")
+            timer.join()
+            sent = slow.request_counts.get("/api/v1/query", 0) + other.request_counts.get("/api/v1/query", 0) - before
+            assert peak == [limit]
+            assert sent == (2 if hedged else 1)
+            # 被中断的对冲请求在线程池中异步归还名额
+            deadline = time.monotonic() + 1
+            while admission.stats()["active"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert admission.stats()["active"] == 0
+
+
+def test_queued_hedge_releases_admission_slot():
+    """对冲请求还在线程池中排队时首选副本已返回：取消该请求并归还其名额"""
+    with MockPrometheus(MockPrometheusConfig(latency=0.5)) as primary, MockPrometheus() as other:
+        admission = AdmissionController(max_concurrency=4)
+        client = PrometheusClient([primary.url, other.url], pool_size=1, admission=admission)
+        client.HEDGE_COLD_DELAY = 0.2
+        # 线程池只有两个工作线程：一个被占用，另一个执行首选请求；对冲请求发出前再排入一个阻塞任务，
+        # 首选请求返回后空出的线程先执行该任务，对冲请求一直留在队列中
+        blocker = threading.Event()
+        client._hedge_executor.submit(blocker.wait, 5)
+        threading.Timer(0.05, lambda: client._hedge_executor.submit(blocker.wait, 5)).start()
+        try:
+            client.query("up", retry=1)
+        finally:
+            blocker.set()
+        assert other.request_counts.get("/api/v1/query", 0) == 0
+        assert admission.stats()["active"] == 0
+        assert client._stats[other.url].ewma is None
+
+
+def test_failover_to_next_replica():
+    """首选副本不可用时立即故障转移"""
+    with MockPrometheus() as healthy:
+        client = PrometheusClient(["http://127.0.0.1:9", healthy.url], timeout=2)
+        assert client.query("up")["status"] == "success"
+
+
+def test_cancel_token_aborts_request():
+    """CancelToken 可中断正在等待响应的请求"""
+    with MockPrometheus(MockPrometheusConfig(latency=1.0)) as slow:
+        client = PrometheusClient(slow.url)
+        token = CancelToken()
+        threading.Timer(0.1, token.cancel).start()
+        started = time.monotonic()
+        try:
+            client._attempt(client.base_url, "POST", "/api/v1/query", data={"query": "up"}, token=token)
+        except Exception:
+            pass
+        else:
+            raise AssertionError("被取消的请求应抛出异常")
+        assert time.monotonic() - started < 0.5
+
+
+def test_deadline_passed_to_prometheus():
+    """调用截止时间限制 HTTP 超时，并作为 timeout 参数传给 Prometheus"""
+    with MockPrometheus() as prom:
+        client = PrometheusClient(prom.url)
+        sent = []
+        request = client.session.request
+
+        def recording_request(method, url, **kwargs):
+            sent.append(kwargs)
+            return request(method, url, **kwargs)
+
+        client.session.request = recording_request
+        with call_scope(deadline=time.monotonic() + 5):
+            client.query("up")
+        assert 0 < float(sent[-1]["params"]["timeout"]) <= 5
+        assert sent[-1]["timeout"] <= 5
+
+        client.query("up")
+        assert "timeout" not in (sent[-1]["params"] or {})
+
+
+def test_call_deadline_aborts_without_retry():
+    """超过截止时间后中断请求，且不再重试"""
+    with MockPrometheus(MockPrometheusConfig(latency=1.0)) as slow:
+        client = PrometheusClient(slow.url)
+        started = time.monotonic()
+        try:
+            with call_scope(deadline=time.monotonic() + 0.2):
+                client.query("up", retry=3)
+        except RequestCancelled:
+            pass
+        else:
+            raise AssertionError("超过截止时间应抛出 RequestCancelled")
+        assert time.monotonic() - started < 0.6
+        assert slow.request_counts["/api/v1/query"] == 1
+
+
+def test_call_token_cancels_inflight_request():
+    """取消调用令牌会中断作用域内正在进行的请求"""
+    with MockPrometheus(MockPrometheusConfig(latency=1.0)) as slow:
+        client = PrometheusClient(slow.url)
+        token = CancelToken()
+        threading.Timer(0.1, token.cancel).start()
+        started = time.monotonic()
+        try:
+            with call_scope(token):
+                client.query("up", retry=3)
+        except RequestCancelled:
+            pass
+        else:
+            raise AssertionError("被取消的调用应抛出 RequestCancelled")
+        assert time.monotonic() - started < 0.5
+
+
+def main():
+    """主函数"""
+    test_hedged_request_prefers_fast_replica()
+    test_hedged_requests_take_admission_slots()
+    test_queued_hedge_releases_admission_slot()
+    test_failover_to_next_replica()
+    test_cancel_token_aborts_request()
+    test_deadline_passed_to_prometheus()
+    test_call_deadline_aborts_without_retry()
+    test_call_token_cancels_inflight_request()
+    print("✓ prometheus client")
+
+
+if __name__ == "__main__":
+    main()
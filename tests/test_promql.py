@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""PromQL 解析器测试（不需要 Prometheus 连接）"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.promql import (
+    Aggregation, BinaryOp, PromQLSyntaxError, Subquery, UnaryOp,
+    classify_variable_query, metric_names, parse, to_promql,
+)
+
+
+def test_parse_grafana_expressions():
+    """解析 dashboard 中常见的表达式，并能序列化回等价的 PromQL"""
+    exprs = [
+        'sum by (job) (rate(http_requests_total{job=~"$job", code!="500"}[$__rate_interval]))',
+        'histogram_quantile(0.99, sum(rate(h_bucket{cluster="$cluster"}[5m])) by (le))',
+        'max_over_time(rate(x[5m])[1h:1m] offset 1d)',
+        'a / on(instance) group_left(node) b',
+        'up == bool 1 unless absent(up)',
+        'topk(5, {__name__="up", job="x"})',
+        'rate(x[5m] @ end() offset 1h)',
+        'count_values("version", build_info) > 0',
+    ]
+    for expr in exprs:
+        node = parse(expr)
+        assert parse(to_promql(node)) == node, expr
+
+    node = parse('sum(rate(x[5m])) by (pod)')
+    assert isinstance(node, Aggregation) and node.grouping == ("pod",)
+    assert isinstance(parse('max_over_time(rate(x[5m])[1h:])').args[0], Subquery)
+    # 运算优先级：-a^b*c == (-(a^b))*c，a^b^c 右结合
+    node = parse("-a ^ b * c")
+    assert isinstance(node, BinaryOp) and node.op == "*" and isinstance(node.lhs, UnaryOp)
+    node = parse("a ^ b ^ c")
+    assert isinstance(node.rhs, BinaryOp)
+    assert parse("rate(x[5m])") is parse("rate(x[5m])"), "解析结果应被缓存"
+
+    try:
+        parse("sum(rate(x[5m])")
+    except PromQLSyntaxError:
+        pass
+    else:
+        raise AssertionError("括号不匹配应报语法错误")
+
+
+def test_metric_names():
+    """提取指标名时忽略函数名、分组 label 和字符串"""
+    expr = 'sum by (instance) (rate(node_cpu{mode!="idle"}[5m])) / on(instance) node_count + {__name__="up"}'
+    assert metric_names(expr) == ["node_cpu", "node_count", "up"]
+    assert metric_names("sum(rate(") == []
+
+
+def test_template_variables_in_label_lists_and_durations():
+    """分组/匹配 label 列表与区间时长中的模板变量可以解析，指标名照常提取"""
+    cases = {
+        "sum(rate(x[5m])) by ($group)": ["x"],
+        "sum by (${groupby:csv}, job) (x)": ["x"],
+        "a and on ($lbl) b": ["a", "b"],
+        "a * ignoring([[skip]]) group_left($extra) b": ["a", "b"],
+        "increase(requests_total[${__range_s}s])": ["requests_total"],
+        "max_over_time(rate(x[5m])[${window}s:${step}s])": ["x"],
+        "y offset ${shift}m": ["y"],
+    }
+    for expr, names in cases.items():
+        node = parse(expr)
+        assert parse(to_promql(node)) == node, expr
+        assert metric_names(expr) == names, expr
+    assert parse("sum(x) by ($group)").grouping == ("$group",)
+    assert parse("increase(requests_total[${__range_s}s])").args[0].range == "${__range_s}s"
+
+
+def test_classify_variable_query():
+    """识别 Grafana 变量查询的类型"""
+    parsed = classify_variable_query('label_values(up{job="$job", path=~"a,b"}, instance)')
+    assert parsed.kind == "label_values" and parsed.label == "instance"
+    assert parsed.match == 'up{job="$job", path=~"a,b"}'
+    assert classify_variable_query("label_values(namespace)").label == "namespace"
+    parsed = classify_variable_query("query_result(topk(5, sum(rate(x[5m])) by (pod)))")
+    assert parsed.kind == "promql" and parsed.expr.startswith("topk(5,")
+    parsed = classify_variable_query("metrics(node_.*)")
+    assert parsed.kind == "metrics" and parsed.regex == "node_.*"
+    assert classify_variable_query("label_names()").kind == "label_names"
+    assert classify_variable_query("up").expr == "up"
+
+
+def main():
+    """主函数"""
+    test_parse_grafana_expressions()
+    test_metric_names()
+    test_template_variables_in_label_lists_and_durations()
+    test_classify_variable_query()
+    print("✓ promql")
+
+
+if __name__ == "__main__":
+    main()
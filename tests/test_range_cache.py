@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""滑动窗口范围查询缓存测试（使用本地 Mock Prometheus）"""
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus, MockPrometheusConfig
+from src.prometheus_client import PrometheusClient
+from src.range_cache import SlidingWindowCache
+
+QUERY = 'rate(http_requests_total{job="api"}[5m])'
+
+
+def test_polling_fetches_only_tail():
+    """窗口向后滑动时只请求增量部分，合并结果与完整查询一致"""
+    with MockPrometheus(MockPrometheusConfig(series_count=3)) as mock:
+        client = PrometheusClient(mock.url, window_cache=SlidingWindowCache(overlap_steps=2))
+        plain = PrometheusClient(mock.url)
+        fetched = []
+        fetch = client._range_query
+        client._range_query = lambda q, s, e, *args, **kw: fetched.append((float(s), float(e))) or fetch(q, s, e, *args, **kw)
+
+        end = int(time.time()) // 60 * 60
+        start = end - 6 * 3600
+        client.range_query(QUERY, str(start), str(end), "60s")
+        for shift in (60, 180, 180, 600):
+            result = client.range_query(QUERY, str(start + shift), str(end + shift), "60s")
+            assert result == plain.range_query(QUERY, str(start + shift), str(end + shift), "60s")
+
+        assert fetched[0] == (start, end)
+        # 第一次滑动只请求最后 2 个 step 的重叠加上新增的 1 分钟
+        assert fetched[1] == (end - 120, end + 60)
+        assert all(e - s <= 720 for s, e in fetched[1:])
+
+
+def test_unaligned_or_backward_window_refetches():
+    """求值时间点不对齐或窗口向前移动时完整请求"""
+    calls = []
+
+    def fetch(start, end):
+        calls.append((start, end))
+        values = [[start + i * 10, "1"] for i in range(int((end - start) // 10) + 1)]
+        return {"status": "success", "data": {"resultType": "matrix", "result": [{"metric": {}, "values": values}]}}
+
+    cache = SlidingWindowCache()
+    cache.get("up", 1000, 2000, 10, fetch)
+    cache.get("up", 1005, 2005, 10, fetch)
+    cache.get("up", 900, 1900, 10, fetch)
+    assert calls == [(1000, 2000), (1005, 2005), (900, 1900)]
+
+    result = cache.get("up", 950, 1950, 10, fetch)
+    assert calls[-1] == (1880, 1950)
+    values = result["data"]["result"][0]["values"]
+    assert [v[0] for v in values] == list(range(950, 1951, 10))
+
+
+def main():
+    """主函数"""
+    test_polling_fetches_only_tail()
+    test_unaligned_or_backward_window_refetches()
+    print("✓ range cache")
+
+
+if __name__ == "__main__":
+    main()
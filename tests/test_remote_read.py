@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""remote-read 编解码测试（使用本地 Mock Prometheus）"""
+import io
+import random
+import sys
+import time
+from array import array
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus
+from src.prometheus_client import PrometheusClient
+from src.remote_read import (
+    RawSeries, crc32c, decode_xor_chunk, encode_chunked_frame, encode_xor_chunk,
+    iter_chunked_series, snappy_decompress, summarize,
+)
+
+
+def test_xor_chunk_roundtrip():
+    """XOR chunk 编解码：覆盖各个 delta-of-delta 分桶和值窗口复用"""
+    rng = random.Random(1)
+    timestamps = [1700000000000]
+    for _ in range(119):
+        timestamps.append(timestamps[-1] + 15000 + rng.choice([0, 0, 3, -7, 9000, -200000, 2 ** 40]))
+    values = [rng.choice([1.0, rng.random() * 100, -3.5, 1e300, 0.0]) for _ in range(120)]
+    decoded_ts, decoded_values = array("q"), array("d")
+    decode_xor_chunk(encode_xor_chunk(timestamps, values), decoded_ts, decoded_values)
+    assert list(decoded_ts) == timestamps
+    assert list(decoded_values) == values
+
+
+def test_stream_frames_and_codecs():
+    """同一序列拆分到多帧时合并；snappy 复制指令与 CRC32C"""
+    series = RawSeries({"__name__": "up"}, array("q", range(0, 300000, 1000)), array("d", [1.0] * 300))
+    stream = io.BytesIO(encode_chunked_frame([series]) * 2)
+    decoded = list(iter_chunked_series(stream))
+    assert len(decoded) == 1 and len(decoded[0]) == 600
+    # "abc" literal + 长度 9、偏移 3 的重叠复制
+    assert snappy_decompress(bytes([12, 0x08]) + b"abc" + bytes([0x15, 0x03])) == b"abcabcabcabc"
+    assert crc32c(b"123456789") == 0xE3069283
+
+
+def test_client_remote_read():
+    """客户端通过 remote-read 获取原始样本"""
+    with MockPrometheus() as mock:
+        client = PrometheusClient(mock.url, remote_read=True)
+        end = time.time()
+        series = client.remote_read('bench_metric_1_total{cluster="cluster-0"}', end - 3600, end)
+        assert len(series) == 10
+        assert series[0].labels["__name__"] == "bench_metric_1_total"
+        assert abs(len(series[0]) - 240) <= 1
+        summary = summarize(series[0])
+        assert summary["min"] <= summary["avg"] <= summary["max"]
+
+
+def main():
+    """主函数"""
+    test_xor_chunk_roundtrip()
+    test_stream_frames_and_codecs()
+    test_client_remote_read()
+    print("✓ remote read")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""list_resources 分页与 resource 模板测试（不需要真实 Prometheus）"""
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from mcp.shared.exceptions import McpError
+from mcp.types import ListResourcesRequest, ListResourceTemplatesRequest, PaginatedRequestParams
+
+from benchmarks.dashboard_generator import write_dashboards
+from src.server import PrometheusServer
+
+CONFIG = """
+prometheus:
+  url: http://127.0.0.1:9
+dashboards:
+  - path: ./dashboards
+metric_index:
+  enabled: false
+logging:
+  file: null
+output:
+  resource_page_size: 4
+"""
+
+
+def _server(tmp: str, count: int) -> PrometheusServer:
+    write_dashboards(str(Path(tmp) / "dashboards"), count=count, rows=1, panels_per_row=1)
+    config = Path(tmp) / "config.yaml"
+    config.write_text(CONFIG)
+    return PrometheusServer(str(config))
+
+
+def _list(server: PrometheusServer, cursor=None):
+    handler = server.server.request_handlers[ListResourcesRequest]
+    request = ListResourcesRequest(method="resources/list", params=PaginatedRequestParams(cursor=cursor))
+    return asyncio.run(handler(request)).root
+
+
+def test_cursor_pagination():
+    """按页返回全部 resources，同一 dashboard 的 metrics 与 variables 相邻"""
+    with tempfile.TemporaryDirectory() as tmp:
+        server = _server(tmp, count=5)
+        uris, cursor = [], None
+        while True:
+            page = _list(server, cursor)
+            assert len(page.resources) <= 4
+            uris.extend(str(resource.uri) for resource in page.resources)
+            cursor = page.nextCursor
+            if cursor is None:
+                break
+        assert len(uris) == 10 and len(set(uris)) == 10
+        assert uris[:2] == ["prometheus://dashboard/bench-0/metrics", "prometheus://dashboard/bench-0/variables"]
+
+        # 列表只在 dashboard 集合变化后重建
+        listing = server._resource_listing()
+        assert server._resource_listing()[1] is listing[1]
+
+        try:
+            _list(server, "!!not-a-cursor")
+        except McpError:
+            pass
+        else:
+            raise AssertionError("无效的 cursor 应返回错误")
+
+
+def test_resource_templates():
+    """resource 模板覆盖 variables 与 metrics 两类 URI"""
+    with tempfile.TemporaryDirectory() as tmp:
+        server = _server(tmp, count=1)
+        handler = server.server.request_handlers[ListResourceTemplatesRequest]
+        result = asyncio.run(handler(ListResourceTemplatesRequest(method="resources/templates/list"))).root
+        templates = {template.uriTemplate for template in result.resourceTemplates}
+        assert templates == {
+            "prometheus://dashboard/{dashboard_name}/variables",
+            "prometheus://dashboard/{dashboard_name}/metrics",
+        }
+
+
+def main():
+    """主函数"""
+    test_cursor_pagination()
+    test_resource_templates()
+    print("✓ resource listing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""大查询结果暂存与分页取回测试"""
+import gc
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.result_store import MAX_PAGE_SIZE, ResultStore, UnknownHandleError
+
+MATRIX = {"status": "success", "range": {"step": "15s"}, "data": {"resultType": "matrix", "result": [
+    {
+        "metric": {"__name__": "x", "instance": f"host-{i}", "zone": f"z{i % 2}"},
+        "values": [[1700000000 + 15 * j, str(j)] for j in range(10)],
+    }
+    for i in range(5)
+]}}
+
+
+def test_overview_and_pages():
+    """概要包含序列数、label 键与时间范围；分页、过滤、时间切片"""
+    store = ResultStore()
+    entry = store.put("x", MATRIX)
+    overview = entry.overview()
+    assert overview["series_count"] == 5 and overview["points"] == 50
+    assert overview["label_keys"]["zone"] == {"distinct": 2, "values": ["z0", "z1"]}
+    assert overview["time_range"] == {"start": 1700000000, "end": 1700000135}
+    assert overview["range"] == {"step": "15s"}
+
+    first = store.get(entry.handle).page(limit=2)
+    assert [s["metric"]["instance"] for s in first["series"]] == ["host-0", "host-1"]
+    assert first["series"][0]["values"] == MATRIX["data"]["result"][0]["values"]
+    second = entry.page(cursor=first["next_cursor"], limit=2)
+    assert [s["metric"]["instance"] for s in second["series"]] == ["host-2", "host-3"]
+
+    filtered = entry.page(match={"zone": "z1"}, limit=1, start=1700000030, end=1700000060)
+    assert filtered["total_matched"] == 2
+    assert filtered["series"][0]["metric"]["instance"] == "host-1"
+    assert filtered["series"][0]["values"] == [[1700000030, "2"], [1700000045, "3"], [1700000060, "4"]]
+    rest = entry.page(match={"zone": "z1"}, cursor=filtered["next_cursor"], limit=1)
+    assert rest["series"][0]["metric"]["instance"] == "host-3" and rest["next_cursor"] is None
+
+
+def test_page_limit_and_cursor_validation():
+    """limit 限制在 1..MAX_PAGE_SIZE 之间；负数或无法解析的 cursor 被拒绝"""
+    response = {"status": "success", "data": {"resultType": "vector", "result": [
+        {"metric": {"instance": f"host-{i}"}, "value": [1700000000, "1"]} for i in range(MAX_PAGE_SIZE + 5)
+    ]}}
+    entry = ResultStore().put("x", response)
+    page = entry.page(limit=-1)
+    assert len(page["series"]) == 1 and page["next_cursor"] == "1"
+    assert len(entry.page(limit=0)["series"]) == 1
+    page = entry.page(limit=10 ** 6)
+    assert len(page["series"]) == MAX_PAGE_SIZE and page["next_cursor"] == str(MAX_PAGE_SIZE)
+    for cursor in ("-1", "abc"):
+        try:
+            entry.page(cursor=cursor)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"无效的 cursor 应被拒绝: {cursor}")
+
+
+def test_ttl_and_memory_cap():
+    """过期或超过内存上限的结果被淘汰"""
+    store = ResultStore(ttl=0.05)
+    handle = store.put("x", MATRIX).handle
+    time.sleep(0.1)
+    try:
+        store.get(handle)
+    except UnknownHandleError:
+        pass
+    else:
+        raise AssertionError("过期的 handle 应不可用")
+
+    store = ResultStore(max_bytes=1)
+    first = store.put("x", MATRIX).handle
+    second = store.put("y", MATRIX).handle
+    assert len(store) == 1 and store.get(second)
+    try:
+        store.get(first)
+    except UnknownHandleError:
+        pass
+    else:
+        raise AssertionError("超过内存上限时应淘汰最久未访问的结果")
+
+
+def test_evicted_label_sets_are_released():
+    """淘汰结果后，只被该结果引用的驻留 label 集合随之释放"""
+    other = {"status": "success", "data": {"resultType": "matrix", "result": [
+        {"metric": {"__name__": "y", "pod": f"pod-{i}"}, "values": [[1700000000, "1"]]} for i in range(3)
+    ]}}
+    store = ResultStore(max_bytes=1)
+    store.put("x", MATRIX)
+    assert len(store._labels) == 5
+    store.put("y", other)
+    gc.collect()
+    assert len(store) == 1 and len(store._labels) == 3
+
+
+def main():
+    """主函数"""
+    test_overview_and_pages()
+    test_page_limit_and_cursor_validation()
+    test_ttl_and_memory_cap()
+    test_evicted_label_sets_are_released()
+    print("✓ result store")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""高基数查询保护测试（不需要 Prometheus 连接）"""
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.mock_prometheus import MockPrometheus
+from src import promql
+from src.series_guard import SeriesGuard, may_fan_out, probe_query
+from src.server import PrometheusServer
+
+
+class CountingClient:
+    """对 count(...) 探测返回固定序列数"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.queries = []
+
+    def query(self, query, query_time=None, retry=3):
+        self.queries.append(query)
+        return {"status": "success", "data": {"resultType": "vector",
+                                              "result": [{"metric": {}, "value": [0, str(self.total)]}]}}
+
+
+def test_detects_unaggregated():
+    """只有结果可能按原始序列展开的查询需要探测"""
+    fan_out = ["rate(pulsar_in_bytes_total[5m])", "a / on(instance) b", "-up", "abs(x) > 1",
+               "rate(x[5m])[30m:1m]"]
+    aggregated = ["sum(rate(x[5m]))", "topk(5, x)", "scalar(x) * 2", "1 + 1", "count(x) by (job)",
+                  "sum(a) / sum(b)", "(sum(x))"]
+    for query in fan_out:
+        assert may_fan_out(promql.parse(query)), query
+    for query in aggregated:
+        assert not may_fan_out(promql.parse(query)), query
+
+
+def test_rewrites_over_limit():
+    """超过上限改写为 topk，探测结果缓存"""
+    guard = SeriesGuard(max_series=100, k=10)
+    client = CountingClient(25000)
+    decision = guard.check(client, "rate(pulsar_in_bytes_total[5m])")
+    assert decision.rewritten and decision.total_series == 25000
+    assert decision.query == "topk(10, rate(pulsar_in_bytes_total[5m]))"
+    assert decision.to_dict(guard.k)["query"] == decision.query
+    guard.check(client, "rate(pulsar_in_bytes_total[5m])")
+    assert client.queries == ["count(rate(pulsar_in_bytes_total[5m]))"]
+
+    small = CountingClient(5)
+    decision = guard.check(small, "up")
+    assert not decision.rewritten and decision.query == "up"
+    assert guard.check(small, "sum(up)") is None
+    assert small.queries == ["count(up)"]
+
+
+def test_range_probe_covers_window():
+    """范围查询统计整个窗口内出现过的序列，并注明 topk 按步长选取"""
+    assert probe_query("up") == "count(up)"
+    assert probe_query('up{job="a"}', 3600, "60s") == 'count(last_over_time(up{job="a"}[1h]))'
+    assert probe_query("rate(x[5m])", 3600, "60s") == "count(last_over_time((rate(x[5m]))[1h:60s]))"
+
+    guard = SeriesGuard(max_series=100, k=10)
+    client = CountingClient(25000)
+    decision = guard.check(client, "rate(x[5m])", "1700003600", window=3600, step="60s")
+    assert client.queries == ["count(last_over_time((rate(x[5m]))[1h:60s]))"]
+    assert decision.rewritten and decision.per_step
+    assert "每个步长" in decision.to_dict(guard.k)["note"]
+    assert "每个步长" not in guard.check(client, "rate(x[5m])").to_dict(guard.k)["note"]
+
+
+def test_range_query_accepts_rfc3339_with_explicit_step():
+    """显式 step 时 start/end 原样传递：RFC3339 与小数时间戳在启用/未启用保护时都可用"""
+    with MockPrometheus() as prom, tempfile.TemporaryDirectory() as tmp:
+        for enabled in ("false", "true"):
+            config = Path(tmp) / "config.yaml"
+            config.write_text(
+                f"prometheus:\n  url: {prom.url}\ndashboards: []\nlogging:\n  file: null\n"
+                f"series_guard:\n  enabled: {enabled}\n"
+            )
+            server = PrometheusServer(str(config))
+            for start, end in [("2026-10-19T00:00:00Z", "2026-10-19T01:00:00Z"), ("1700000000.5", "1700003600.5")]:
+                content = asyncio.run(server._handle_prometheus_range_query(
+                    {"query": "bench_metric_0_total", "start": start, "end": end, "step": "1m"}
+                ))
+                result = json.loads(content[0].text)
+                assert result["status"] == "success", content[0].text
+                assert result["range"] == {"start": start, "end": end, "step": "1m"}
+
+
+def main():
+    """主函数"""
+    test_detects_unaggregated()
+    test_rewrites_over_limit()
+    test_range_probe_covers_window()
+    test_range_query_accepts_rfc3339_with_explicit_step()
+    print("✓ series guard")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""紧凑时间序列存储测试"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.series_store import CompactSeries, LabelInterner, format_value, from_matrix, to_matrix
+
+
+def test_roundtrip_and_format():
+    """转换回 Prometheus 格式后与原结果一致"""
+    matrix = [
+        {"metric": {"__name__": "up", "job": "api"},
+         "values": [[1700000000, "1"], [1700000015.5, "0.25"], [1700000030, "NaN"], [1700000045, "+Inf"]]},
+        {"metric": {}, "values": [[1700000000, "-3.5"]]},
+    ]
+    series = from_matrix(matrix)
+    assert to_matrix(series) == matrix
+    assert format_value(1e21) == "1000000000000000000000"
+    assert format_value(1.5e-7) == "0.00000015"
+    assert format_value(-0.0) == "-0"
+
+
+def test_slice_drop_and_size():
+    """按时间切片不复制数据，删除头尾采样点，占用远小于 Python 对象"""
+    pairs = [[1700000000 + i * 15, format_value(i * 0.5)] for i in range(1000)]
+    interner = LabelInterner()
+    series = CompactSeries.from_pairs({"job": "api", "instance": "a"}, pairs, interner)
+    other = CompactSeries.from_pairs({"instance": "a", "job": "api"}, pairs[:1], interner)
+    assert series.labels is other.labels and len(interner) == 1
+
+    view = series.slice(1700000150, 1700000300)
+    assert isinstance(view.values, memoryview)
+    assert view.pairs() == pairs[10:21]
+    del view
+
+    series.drop_before(1700000015)
+    series.drop_from(1700000000 + 998 * 15)
+    assert series.pairs() == pairs[1:998]
+    assert series.nbytes == 997 * 12
+    # 与 Python 对象表示（列表 + int + str）相比
+    python_size = sum(sys.getsizeof(p) + sys.getsizeof(p[0]) + sys.getsizeof(p[1]) for p in pairs[1:998])
+    assert series.nbytes * 10 < python_size
+
+    # 跨度超过 int32 毫秒时自动使用 64 位偏移
+    wide = CompactSeries.from_pairs({}, [[0, "1"], [40 * 86400, "2"]])
+    assert wide.offsets.typecode == "q" and list(wide.timestamps()) == [0, 40 * 86400]
+
+
+def main():
+    """主函数"""
+    test_roundtrip_and_format()
+    test_slice_drop_and_size()
+    print("✓ series store")
+
+
+if __name__ == "__main__":
+    main()
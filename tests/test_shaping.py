@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""按输出预算裁剪查询结果的测试"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.codec import RawJSON
+from src.offload import Offloader
+from src.shaping import MIN_SERIES, shape
+
+
+def _matrix(series: int, points: int) -> dict:
+    return {"status": "success", "data": {"resultType": "matrix", "result": [
+        {
+            "metric": {"__name__": "x", "job": "node", "instance": f"host-{i}"},
+            "values": [[1700000000 + 15 * j, str(j)] for j in range(points)],
+        }
+        for i in range(series)
+    ]}}
+
+
+def test_within_budget_is_unchanged():
+    """放得下时原样输出；只需去掉缩进时不附加报告"""
+    data = _matrix(3, 5)
+    assert shape(data, 0) == shape(data, 10 ** 9)
+    compact = json.dumps(data, separators=(",", ":"))
+    text = shape(data, len(compact))
+    assert "\n" not in text and json.loads(text) == data
+
+
+def test_degrades_in_order_and_reports():
+    """依次提取公共 label、抽样序列、降采样，并报告省略的数量"""
+    data = _matrix(200, 240)
+    compact_size = len(json.dumps(data, separators=(",", ":")))
+
+    text = shape(data, compact_size // 2)
+    result = json.loads(text)
+    report = result["output_shaping"]
+    assert len(text) <= compact_size // 2
+    assert report["steps"] == ["compact", "hoist_common_labels", "sample_series"]
+    assert result["data"]["common_labels"] == {"__name__": "x", "job": "node"}
+    assert result["data"]["result"][0]["metric"] == {"instance": "host-0"}
+    assert report["series_returned"] + report["series_omitted"] == 200
+    assert report["series_returned"] == len(result["data"]["result"])
+    assert "point_stride" not in report
+
+    text = shape(data, 20000)
+    result = json.loads(text)
+    report = result["output_shaping"]
+    assert len(text) <= 20000
+    assert report["steps"][-1] == "downsample_points"
+    assert report["series_returned"] == MIN_SERIES
+    returned = sum(len(item["values"]) for item in result["data"]["result"])
+    assert report["points_returned"] == returned
+    assert report["points_total"] - report["points_omitted"] == returned
+    # 降采样保留最后一个点
+    assert result["data"]["result"][0]["values"][-1] == data["data"]["result"][0]["values"][-1]
+
+
+def test_offloader_render_with_budget():
+    """render 按预算裁剪；保留响应中的附加字段"""
+    data = {**_matrix(50, 100), "range": {"step": "15s"}}
+    offloader = Offloader(processes=0, threshold=1 << 30)
+    text = asyncio.run(offloader.render(RawJSON.from_data(data), budget=5000))
+    result = json.loads(text)
+    assert len(text) <= 5000
+    assert result["range"] == {"step": "15s"}
+    assert "output_shaping" in result
+
+
+def main():
+    """主函数"""
+    test_within_budget_is_unchanged()
+    test_degrades_in_order_and_reports()
+    test_offloader_render_with_budget()
+    print("✓ shaping")
+
+
+if __name__ == "__main__":
+    main()
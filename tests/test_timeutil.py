@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""时间工具测试"""
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.timeutil import align_range, choose_step, format_duration, is_relative, parse_duration, parse_timestamp
+
+
+def test_choose_step():
+    """选择满足点数预算的最小整齐步长"""
+    day = 86400
+    assert choose_step(0, 30 * day, 1000) == 3600
+    assert choose_step(0, 3600, 1000) == 5
+    assert choose_step(0, 3600, 1000, min_step=15) == 15
+    assert choose_step(0, 6 * 3600, 100) == 300
+    # 超出预设步长时仍满足预算
+    start, end = 0, 20 * 365 * day
+    step = choose_step(start, end, 100)
+    assert (end - start) / step + 1 <= 100
+
+
+def test_align_and_format():
+    """对齐到步长边界，时长格式化可被再次解析"""
+    assert align_range(1001, 1999, 300) == (900, 2100)
+    for seconds in (15, 60, 300, 3600, 86400, 90):
+        assert parse_duration(format_duration(seconds)) == seconds
+    assert format_duration(300) == "5m"
+
+
+def test_relative_timestamps():
+    """相对时间按当前时间换算"""
+    now = time.time()
+    assert abs(parse_timestamp("now") - now) < 5
+    assert abs(parse_timestamp("now-6h") - (now - 6 * 3600)) < 5
+    assert abs(parse_timestamp("now - 1h30m") - (now - 5400)) < 5
+    assert parse_timestamp("now-bogus") is None
+    assert is_relative("now-6h") and not is_relative("1700000000")
+
+
+def main():
+    """主函数"""
+    test_choose_step()
+    test_align_and_format()
+    test_relative_timestamps()
+    print("✓ timeutil")
+
+
+if __name__ == "__main__":
+    main()
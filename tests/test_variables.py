@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""链式变量解析测试（不需要 Prometheus 连接）"""
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.resources import VariablesResource
+
+
+class RecordingClient:
+    """记录 label values 请求的客户端替身"""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def query_label_values(self, label, match=None):
+        with self.lock:
+            self.calls.append((label, match))
+        return [f"{label}-a", f"{label}-b"]
+
+
+DASHBOARD = {
+    "title": "Chained",
+    "templating": {"list": [
+        {"name": "cluster", "type": "query", "query": "label_values(up, cluster)",
+         "current": {"value": "cluster-a"}},
+        {"name": "namespace", "type": "query",
+         "query": 'label_values(pulsar_topics_count{cluster="$cluster"}, namespace)',
+         "current": {"value": ["ns-1", "ns.2"]}},
+        {"name": "topic", "type": "query",
+         "query": 'label_values(pulsar_rate_in{cluster="$cluster", namespace=~"$namespace"}, topic)',
+         "current": {}},
+        {"name": "interval", "type": "custom", "query": "1m,5m", "current": {"value": "5m"}},
+    ]},
+}
+
+
+def make_resource(tmp: str) -> VariablesResource:
+    path = Path(tmp) / "d.json"
+    path.write_text(json.dumps(DASHBOARD))
+    return VariablesResource("chained", str(path), prometheus_client=RecordingClient())
+
+
+def test_chained_resolution():
+    """父变量取值替换进子变量查询，多值按正则格式展开"""
+    with tempfile.TemporaryDirectory() as tmp:
+        resource = make_resource(tmp)
+        data = json.loads(resource.get_content())
+        calls = dict(resource.prometheus_client.calls)
+        assert calls["cluster"] == "up"
+        assert calls["namespace"] == 'pulsar_topics_count{cluster="cluster-a"}'
+        assert calls["topic"] == 'pulsar_rate_in{cluster="cluster-a", namespace=~"(ns-1|ns\\.2)"}'
+        by_name = {var["name"]: var for var in data["variables"]}
+        assert by_name["topic"]["depends_on"] == ["cluster", "namespace"]
+        assert by_name["topic"]["values"] == ["topic-a", "topic-b"]
+
+
+def test_drill_down_reuses_cache():
+    """下钻时按父变量取值组合缓存，重复读取不再查询"""
+    with tempfile.TemporaryDirectory() as tmp:
+        resource = make_resource(tmp)
+        resource.get_content()
+        first = len(resource.prometheus_client.calls)
+        resource.get_content()
+        assert len(resource.prometheus_client.calls) == first
+
+        data = json.loads(resource.get_content({"cluster": "cluster-b"}))
+        new_calls = resource.prometheus_client.calls[first:]
+        # 只有依赖 cluster 的子变量需要重新查询
+        assert sorted(label for label, _ in new_calls) == ["namespace", "topic"]
+        assert ("namespace", 'pulsar_topics_count{cluster="cluster-b"}') in new_calls
+        assert data["variables"][0]["selected_value"] == "cluster-b"
+
+
+def main():
+    """主函数"""
+    test_chained_resolution()
+    test_drill_down_reuses_cache()
+    print("✓ variables")
+
+
+if __name__ == "__main__":
+    main()